@@ -3,6 +3,7 @@ using StardewModdingAPI.Events;
 using StardewValley;
 using Microsoft.Xna.Framework;
 using Newtonsoft.Json;
+using Newtonsoft.Json.Linq;
 using System.Collections.Generic;
 using System.IO;
 using System.Linq;
@@ -28,6 +29,7 @@ using InitTask;
 using Microsoft.Xna.Framework.Input;
 using System.IO.MemoryMappedFiles;
 using System.Runtime.InteropServices;
+using System.Buffers.Binary;
 
 namespace observeSpaceTest
 {
@@ -44,6 +46,7 @@ namespace observeSpaceTest
         private IModHelper? _helper;
 
         private static string mmapFilePath = Path.Combine(AppDomain.CurrentDomain.BaseDirectory, $"shared_memory_{port}.bin");
+        private static string frameMmapFilePath = Path.Combine(AppDomain.CurrentDomain.BaseDirectory, $"shared_memory_{port}_frame.bin");
 
         public override void Entry(IModHelper helper)
         {
@@ -82,6 +85,7 @@ namespace observeSpaceTest
             }
 
             mmapFilePath = Path.Combine(AppDomain.CurrentDomain.BaseDirectory, $"shared_memory_{port}.bin");
+            frameMmapFilePath = Path.Combine(AppDomain.CurrentDomain.BaseDirectory, $"shared_memory_{port}_frame.bin");
 
             Task.Run(() => StartServer(port));
 
@@ -177,58 +181,134 @@ namespace observeSpaceTest
         private static MemoryMappedFile mmf;
         private static MemoryMappedViewAccessor accessor;
 
+        // Shared memory layout (little endian):
+        // [0] magic "SDJM" [4] version: int32 [8] sequence: int64 [16] slot: int32 [20] length: int32
+        // [32] slot size: int32, slots start at mmapHeaderSize.
+        // Messages alternate between two slots and the sequence is published last, so a reader
+        // still decoding the previous message is never overwritten by the next one.
+        static readonly byte[] mmapMagic = Encoding.ASCII.GetBytes("SDJM");
+        const int mmapVersion = 2;
+        const int mmapHeaderSize = 64;
+        static int mmapSlotSize = (mmapSize - mmapHeaderSize) / 2;
+        static long mmapSequence = 0;
+        static int mmapSlot = 1;
+        static readonly object mmapLock = new object();
+
+        // Sidecar segment for the screenshot of observe_binary:
+        // [width: int32][height: int32][length: int32][format: int32][pixels]
+        // format is Actions.FrameFormatRgba (4 bytes per pixel), FrameFormatGray (1 byte) or FrameFormatJpeg
+        static int frameHeaderSize = 16;
+        static int frameMmapSize = frameHeaderSize + 16 * 1024 * 1024; // up to 2048x2048 RGBA
+        private static MemoryMappedFile frameMmf;
+        private static MemoryMappedViewAccessor frameAccessor;
+
         public static void InitMemoryMappedFile()
         {
             var fs = new FileStream(mmapFilePath, FileMode.OpenOrCreate, FileAccess.ReadWrite, FileShare.ReadWrite);
             fs.SetLength(mmapSize);
             mmf = MemoryMappedFile.CreateFromFile(fs, null, mmapSize, MemoryMappedFileAccess.ReadWrite, HandleInheritability.None, false);
             accessor = mmf.CreateViewAccessor();
-            
+            accessor.WriteArray(0, mmapMagic, 0, mmapMagic.Length);
+            accessor.Write(4, mmapVersion);
+            accessor.Write(8, mmapSequence);
+            accessor.Write(16, 0);
+            accessor.Write(20, 0);
+            accessor.Write(32, mmapSlotSize);
+
+            var frameFs = new FileStream(frameMmapFilePath, FileMode.OpenOrCreate, FileAccess.ReadWrite, FileShare.ReadWrite);
+            frameFs.SetLength(frameMmapSize);
+            frameMmf = MemoryMappedFile.CreateFromFile(frameFs, null, frameMmapSize, MemoryMappedFileAccess.ReadWrite, HandleInheritability.None, false);
+            frameAccessor = frameMmf.CreateViewAccessor();
+        }
+
+        static void WriteFrameToMemoryMappedFile(byte[]? pixels, int width, int height, int format)
+        {
+            // a frame that does not match the reported viewport is dropped rather than sent torn
+            int length = format switch
+            {
+                Actions.FrameFormatGray => width * height,
+                Actions.FrameFormatJpeg => pixels?.Length ?? 0,
+                _ => width * height * 4
+            };
+            if (pixels is null || pixels.Length != length || length > frameMmapSize - frameHeaderSize)
+            {
+                width = 0;
+                height = 0;
+                length = 0;
+            }
+            frameAccessor.Write(0, width);
+            frameAccessor.Write(4, height);
+            frameAccessor.Write(8, length);
+            frameAccessor.Write(12, format);
+            if (length > 0)
+            {
+                frameAccessor.WriteArray(frameHeaderSize, pixels!, 0, length);
+            }
         }
 
         static async Task WriteToMemoryMappedFile(byte[] bytes)
         {
-            accessor.Write(0, 0); 
-            accessor.Write(4, bytes.Length); 
-            accessor.WriteArray(8, bytes, 0, bytes.Length);
-            accessor.Write(0, 1); 
+            if (bytes.Length > mmapSlotSize)
+            {
+                Global.mainMod?.Monitor.Log($"shared memory message of {bytes.Length} bytes exceeds the slot size {mmapSlotSize}", LogLevel.Error);
+                return;
+            }
+            lock (mmapLock)
+            {
+                int slot = 1 - mmapSlot;
+                accessor.WriteArray(mmapHeaderSize + (long)slot * mmapSlotSize, bytes, 0, bytes.Length);
+                accessor.Write(16, slot);
+                accessor.Write(20, bytes.Length);
+                Thread.MemoryBarrier();
+                mmapSequence += 1;
+                accessor.Write(8, mmapSequence);
+                mmapSlot = slot;
+            }
         }
 
+        // Session clients open with this preamble and then exchange framed messages:
+        // request  = [request id: uint32][length: uint32][utf-8 command]
+        // response = [request id: uint32][status: byte][length: uint32][payload]
+        private static readonly byte[] SessionMagic = { (byte)'S', (byte)'D', (byte)'J', (byte)'S', 1 };
+        private const byte SessionStatusOk = 0;
+        private const byte SessionStatusSharedMemory = 1;
+        private const byte SessionStatusError = 2;
+
         private async Task HandleClientAsync(TcpClient client)
         {
 
             using (client)
             {
                 NetworkStream stream = client.GetStream();
-                byte[] bytes = new byte[256];
+                // large enough for a batch message to arrive in a single read
+                byte[] bytes = new byte[64 * 1024];
                 int i;
                 while ((i = await stream.ReadAsync(bytes, 0, bytes.Length)) != 0)
                 {
+                    if (IsSessionPreamble(bytes, i))
+                    {
+                        // a preamble split across reads is completed here before switching protocols
+                        while (i < SessionMagic.Length)
+                        {
+                            int n = await stream.ReadAsync(bytes, i, SessionMagic.Length - i);
+                            if (n == 0 || !IsSessionPreamble(bytes, i + n))
+                            {
+                                return;
+                            }
+                            i += n;
+                        }
+                        LogToFile("session client connected");
+                        var pending = new byte[i - SessionMagic.Length];
+                        Array.Copy(bytes, SessionMagic.Length, pending, 0, pending.Length);
+                        await HandleSessionAsync(stream, pending);
+                        return;
+                    }
+
                     LogToFile("start reading from stream");
                     string data = Encoding.ASCII.GetString(bytes, 0, i);
-                    Monitor.Log($"Received: {data}", LogLevel.Debug);
-                    LogToFile($"Received: {data}");
-
-                    var usingTool = Game1.player.UsingTool;
-                    var isEating = Game1.player.isEating;
-                    var paused = Game1.paused;
-                    var animating = Game1.player.FarmerSprite.IsPlayingBasicAnimation(Game1.player.facingDirection.Value, true) ||
-                        Game1.player.FarmerSprite.IsPlayingBasicAnimation(Game1.player.facingDirection.Value, false);
-                    var usingWeapon = Game1.player.FarmerSprite.isUsingWeapon();
-                    var toolAnimation = Game1.player.FarmerSprite.isOnToolAnimation();
-                    var passingOut = Game1.player.FarmerSprite.isPassingOut();
-                    var activeClickableMenu = Game1.activeClickableMenu;
-                    Monitor.Log($"waiting resaon before executing: usingTool '{usingTool}'; isEating {isEating}; paused {paused}; animating {animating}; usingWeapon {usingWeapon}; toolAnimation {toolAnimation}; passingOut {passingOut}; activeClickableMenu {activeClickableMenu} ", LogLevel.Debug);
-                    LogToFile($"waiting resaon before executing: usingTool '{usingTool}'; isEating {isEating}; paused {paused}; animating {animating}; usingWeapon {usingWeapon}; toolAnimation {toolAnimation}; passingOut {passingOut}; activeClickableMenu {activeClickableMenu} ");
-                    object? returnValue = await HandleMessage(data);
+                    object? returnValue = await ProcessMessageAsync(data);
                     if (returnValue is Byte[] returnedBytes)
                     {
-                        Monitor.Log($"Processed From Main: {data}", LogLevel.Debug);
-                        LogToFile($"Processed From Main: {data}");
-                        Monitor.Log($"return length：{returnedBytes.Length} bytes", LogLevel.Debug);
-                        LogToFile($"return length：{returnedBytes.Length} bytes");
-                        //byte[] sentSignal = Encoding.ASCII.GetBytes("sent");
-                        //byte[] eofBytes = Encoding.ASCII.GetBytes("<EOF>");
                         Console.WriteLine("time_point_13: " + DateTime.Now.ToString("HH:mm:ss.fff"));
                         await WriteToMemoryMappedFile(returnedBytes);
                         //await stream.WriteAsync(sentSignal, 0, sentSignal.Length);
@@ -238,8 +318,6 @@ namespace observeSpaceTest
                     }
                     else
                     {
-                        Monitor.Log($"Processed From Main: {data}", LogLevel.Debug);
-                        LogToFile($"Processed From Main: {data}");
                         string? returnValueS = returnValue?.ToString();
                         byte[] msg = Encoding.ASCII.GetBytes((returnValueS ?? "Message received") + "<EOF>");
                         Monitor.Log($"return length：{msg.Length} bytes", LogLevel.Debug);
@@ -251,9 +329,150 @@ namespace observeSpaceTest
             }
         }
 
+        private static bool IsSessionPreamble(byte[] bytes, int length)
+        {
+            int count = Math.Min(length, SessionMagic.Length);
+            for (int k = 0; k < count; k++)
+            {
+                if (bytes[k] != SessionMagic[k])
+                {
+                    return false;
+                }
+            }
+            return count > 0;
+        }
+
+        private async Task<object?> ProcessMessageAsync(string data)
+        {
+            Monitor.Log($"Received: {data}", LogLevel.Debug);
+            LogToFile($"Received: {data}");
+
+            var usingTool = Game1.player.UsingTool;
+            var isEating = Game1.player.isEating;
+            var paused = Game1.paused;
+            var animating = Game1.player.FarmerSprite.IsPlayingBasicAnimation(Game1.player.facingDirection.Value, true) ||
+                Game1.player.FarmerSprite.IsPlayingBasicAnimation(Game1.player.facingDirection.Value, false);
+            var usingWeapon = Game1.player.FarmerSprite.isUsingWeapon();
+            var toolAnimation = Game1.player.FarmerSprite.isOnToolAnimation();
+            var passingOut = Game1.player.FarmerSprite.isPassingOut();
+            var activeClickableMenu = Game1.activeClickableMenu;
+            Monitor.Log($"waiting resaon before executing: usingTool '{usingTool}'; isEating {isEating}; paused {paused}; animating {animating}; usingWeapon {usingWeapon}; toolAnimation {toolAnimation}; passingOut {passingOut}; activeClickableMenu {activeClickableMenu} ", LogLevel.Debug);
+            LogToFile($"waiting resaon before executing: usingTool '{usingTool}'; isEating {isEating}; paused {paused}; animating {animating}; usingWeapon {usingWeapon}; toolAnimation {toolAnimation}; passingOut {passingOut}; activeClickableMenu {activeClickableMenu} ");
+            object? returnValue = await HandleMessage(data);
+            Monitor.Log($"Processed From Main: {data}", LogLevel.Debug);
+            LogToFile($"Processed From Main: {data}");
+            if (returnValue is Actions.BinaryObservation observation)
+            {
+                // the frame must land before the fields raise the shared memory flag
+                WriteFrameToMemoryMappedFile(observation.Pixels, observation.Width, observation.Height, observation.Format);
+                returnValue = observation.Fields;
+            }
+            if (returnValue is Actions.DeltaObservation deltaObservation)
+            {
+                // written before the reply, so the client finds the frame once it has the delta
+                WriteFrameToMemoryMappedFile(deltaObservation.Pixels, deltaObservation.Width, deltaObservation.Height, deltaObservation.Format);
+                returnValue = deltaObservation.Delta;
+            }
+            if (returnValue is Byte[] returnedBytes)
+            {
+                Monitor.Log($"return length：{returnedBytes.Length} bytes", LogLevel.Debug);
+                LogToFile($"return length：{returnedBytes.Length} bytes");
+            }
+            return returnValue;
+        }
+
+        private static async Task<bool> ReadExactlyAsync(NetworkStream stream, byte[] pending, int pendingOffset, byte[] buffer, int count)
+        {
+            int filled = Math.Min(count, pending.Length - pendingOffset);
+            if (filled > 0)
+            {
+                Array.Copy(pending, pendingOffset, buffer, 0, filled);
+            }
+            while (filled < count)
+            {
+                int n = await stream.ReadAsync(buffer, filled, count - filled);
+                if (n == 0)
+                {
+                    return false;
+                }
+                filled += n;
+            }
+            return true;
+        }
+
+        private async Task HandleSessionAsync(NetworkStream stream, byte[] pending)
+        {
+            int pendingOffset = 0;
+            byte[] header = new byte[8];
+            try
+            {
+                while (true)
+                {
+                    if (!await ReadExactlyAsync(stream, pending, pendingOffset, header, header.Length))
+                    {
+                        break;
+                    }
+                    pendingOffset = Math.Min(pending.Length, pendingOffset + header.Length);
+                    uint requestId = BinaryPrimitives.ReadUInt32BigEndian(header.AsSpan(0, 4));
+                    int length = (int)BinaryPrimitives.ReadUInt32BigEndian(header.AsSpan(4, 4));
+
+                    byte[] payload = new byte[length];
+                    if (!await ReadExactlyAsync(stream, pending, pendingOffset, payload, length))
+                    {
+                        break;
+                    }
+                    pendingOffset = Math.Min(pending.Length, pendingOffset + length);
+                    string data = Encoding.UTF8.GetString(payload);
+
+                    byte status = SessionStatusOk;
+                    byte[] body;
+                    try
+                    {
+                        object? returnValue = await ProcessMessageAsync(data);
+                        if (returnValue is Byte[] returnedBytes)
+                        {
+                            await WriteToMemoryMappedFile(returnedBytes);
+                            status = SessionStatusSharedMemory;
+                            body = Array.Empty<byte>();
+                        }
+                        else
+                        {
+                            body = Encoding.UTF8.GetBytes(returnValue?.ToString() ?? "Message received");
+                        }
+                    }
+                    catch (Exception ex)
+                    {
+                        Monitor.Log($"Error handling session message '{data}': {ex.Message}", LogLevel.Error);
+                        status = SessionStatusError;
+                        body = Encoding.UTF8.GetBytes(ex.Message);
+                    }
+
+                    byte[] frame = new byte[9 + body.Length];
+                    BinaryPrimitives.WriteUInt32BigEndian(frame.AsSpan(0, 4), requestId);
+                    frame[4] = status;
+                    BinaryPrimitives.WriteUInt32BigEndian(frame.AsSpan(5, 4), (uint)body.Length);
+                    Array.Copy(body, 0, frame, 9, body.Length);
+                    await stream.WriteAsync(frame, 0, frame.Length);
+                    LogToFile($"session response {requestId} written, length：{frame.Length} bytes");
+                }
+            }
+            catch (IOException ex)
+            {
+                LogToFile($"session closed: {ex.Message}");
+            }
+            LogToFile("session client disconnected");
+        }
+
+        // methods that run without waiting for the player to be ready and do not count as pending actions
+        private static readonly HashSet<string> PassiveMethods = new HashSet<string>
+        {
+            "resume", "pause", "observe", "get_surroundings", "load_game_record", "observe_v2", "observe_binary",
+            "observe_delta", "set_image_mode", "wait_day_started", "wait_settled",
+        };
+
         private async Task waitForReady(string methodName)
         {
-            if (methodName == "resume" || methodName == "pause" || methodName == "observe" || methodName == "get_surroundings" || methodName == "load_game_record" || methodName == "observe_v2")
+            if (PassiveMethods.Contains(methodName))
             {
                 return;
             }
@@ -313,11 +532,98 @@ namespace observeSpaceTest
             this.Helper.Events.GameLoop.UpdateTicked += updateTickedHandler;
             return await tcs.Task;
         }
+        // batch%{"commands": [...], "observe": "observe_v2%3" | null}
+        // A command entry is either a message or a list of alternative messages that are tried
+        // in order until one returns true (e.g. move retries to adjacent tiles).
+        private const string BatchPrefix = "batch%";
+
+        private static bool IsSuccess(object? res)
+        {
+            return res is bool b ? b : string.Equals(res?.ToString(), "true", StringComparison.OrdinalIgnoreCase);
+        }
+
+        private static object? ToBatchResult(object? res)
+        {
+            if (res is null || res is bool || res is string)
+            {
+                return res;
+            }
+            if (res is Byte[] || res is Actions.BinaryObservation || res is Actions.DeltaObservation)
+            {
+                // shared memory results are only delivered for the observe step
+                return null;
+            }
+            return res.ToString();
+        }
+
+        private async Task<object?> HandleBatchInMain(string payload)
+        {
+            var request = JObject.Parse(payload);
+            var commands = request["commands"] as JArray ?? new JArray();
+            var observe = request["observe"]?.Type == JTokenType.String ? request["observe"]!.ToString() : null;
+            LogToFile($"batch of {commands.Count} commands, observe: {observe}");
+
+            var results = new List<object?>(commands.Count);
+            foreach (var entry in commands)
+            {
+                object? res = null;
+                if (entry is JArray alternatives)
+                {
+                    foreach (var alternative in alternatives)
+                    {
+                        res = await HandleMessageInMain(alternative.ToString());
+                        if (IsSuccess(res))
+                        {
+                            break;
+                        }
+                    }
+                }
+                else
+                {
+                    res = await HandleMessageInMain(entry.ToString());
+                }
+                results.Add(ToBatchResult(res));
+            }
+
+            object? observation = null;
+            bool sharedMemory = false;
+            if (observe != null)
+            {
+                observation = await HandleMessageInMain(observe);
+                if (observation is Actions.BinaryObservation binaryObservation)
+                {
+                    WriteFrameToMemoryMappedFile(binaryObservation.Pixels, binaryObservation.Width, binaryObservation.Height, binaryObservation.Format);
+                    observation = binaryObservation.Fields;
+                }
+                if (observation is Actions.DeltaObservation deltaObservation)
+                {
+                    WriteFrameToMemoryMappedFile(deltaObservation.Pixels, deltaObservation.Width, deltaObservation.Height, deltaObservation.Format);
+                    observation = deltaObservation.Delta;
+                }
+                if (observation is Byte[] observationBytes)
+                {
+                    await WriteToMemoryMappedFile(observationBytes);
+                    observation = null;
+                    sharedMemory = true;
+                }
+            }
+
+            return JsonConvert.SerializeObject(new Dictionary<string, object?>
+            {
+                { "results", results },
+                { "observation", observation?.ToString() },
+                { "shared_memory", sharedMemory },
+            });
+        }
+
         private async Task<object?> HandleMessageInMain(string message)
         {
+            if (message.StartsWith(BatchPrefix))
+            {
+                return await HandleBatchInMain(message.Substring(BatchPrefix.Length));
+            }
             Monitor.Log("Doing something on the main thread...", LogLevel.Info);
             LogToFile($"Doing something on the main thread... message：{message}");
-            object? res = null;
             var parts = message.Split('%');
             // TODO CheckValid
             string methodName = parts[0]; 
@@ -331,6 +637,27 @@ namespace observeSpaceTest
             {
                 method = typeof(InitTaskAPI).GetMethod(methodName);
             }
+            var isAction = !PassiveMethods.Contains(methodName);
+            if (isAction)
+            {
+                Interlocked.Increment(ref ActionsAPI.pendingActions);
+            }
+            try
+            {
+                return await InvokeInMain(methodName, method, args);
+            }
+            finally
+            {
+                if (isAction)
+                {
+                    Interlocked.Decrement(ref ActionsAPI.pendingActions);
+                }
+            }
+        }
+
+        private async Task<object?> InvokeInMain(string methodName, MethodInfo? method, string[]? args)
+        {
+            object? res = null;
             LogToFile($"waiting for ready, method name：{methodName}");
 
             await waitForReady(methodName);
@@ -21,6 +21,7 @@ using StardewValley.Minigames;
 
 using StardewValley.Pathfinding;
 using Newtonsoft.Json;
+using Newtonsoft.Json.Linq;
 using System.Collections.Generic;
 using System.Linq;
 using System.IO;
@@ -83,6 +84,16 @@ namespace ActionSpace.actions
         static byte[]? pixelData;
         static int[] currentViewport = new int[] {Game1.viewport.X, Game1.viewport.Y };
         static int sampleRate = 100; //percentage
+
+        // Screenshot attached to observations, chosen per environment with set_image_mode.
+        // mode: rgba (raw back buffer), gray, jpeg or none; only every imageScale-th pixel of the
+        // crop rectangle (viewport pixels, zero width/height for the full viewport) is kept
+        static string imageMode = "rgba";
+        static int imageScale = 1;
+        static int[] imageCrop = new int[] { 0, 0, 0, 0 };
+        public const int FrameFormatRgba = 0;
+        public const int FrameFormatGray = 1;
+        public const int FrameFormatJpeg = 2;
         static int dayStartTimes = 0;
 
         private static void LogToFile(string message, Mod mod)
@@ -1971,6 +1982,16 @@ namespace ActionSpace.actions
         public class GameMetaData
         {
             public int[] ViewportSize { get; set; }
+            public int[]? ScreenShotSize { get; set; }
+            public int ScreenShotFormat { get; set; }
+        }
+
+        public class ScreenShotData
+        {
+            public byte[]? Bytes { get; set; }
+            public int Width { get; set; }
+            public int Height { get; set; }
+            public int Format { get; set; }
         }
 
 
@@ -2051,6 +2072,36 @@ namespace ActionSpace.actions
             return serializedData;
         }
 
+        public class BinaryObservation
+        {
+            public byte[] Fields { get; set; }
+            public byte[]? Pixels { get; set; }
+            public int Width { get; set; }
+            public int Height { get; set; }
+            public int Format { get; set; }
+        }
+
+        // Export game data as CBOR without the screenshot; the raw RGBA frame is handed over
+        // separately so it can be written straight into shared memory instead of base64 text
+        public static BinaryObservation ExportGameData_binary(int size, Mod mod)
+        {
+            var gameData = GatherGameData(size, mod);
+            var pixels = gameData.ScreenShot;
+            gameData.ScreenShot = null;
+
+            var mapper = new CBORTypeMapper();
+            byte[] serializedData = CBORObject.FromObject(gameData, mapper).EncodeToBytes();
+
+            return new BinaryObservation
+            {
+                Fields = serializedData,
+                Pixels = pixels,
+                Width = gameData.MetaData.ScreenShotSize?[0] ?? 0,
+                Height = gameData.MetaData.ScreenShotSize?[1] ?? 0,
+                Format = gameData.MetaData.ScreenShotFormat
+            };
+        }
+
         public static string ExportGameData_v2(int size, Mod mod)
         {
             var gameData = GatherGameData(size, mod);
@@ -2063,6 +2114,189 @@ namespace ActionSpace.actions
             return j_info;
         }
 
+        // Delta of ExportGameData_delta; the screenshot is not part of the diffed state and goes
+        // through the frame sidecar segment, like the one of observe_binary
+        public class DeltaObservation
+        {
+            public string Delta { get; set; }
+            public byte[]? Pixels { get; set; }
+            public int Width { get; set; }
+            public int Height { get; set; }
+            public int Format { get; set; }
+        }
+
+        // State last sent by ExportGameData_delta and the version the client holds once it applied it
+        private static JObject? lastDeltaState;
+        private static long deltaVersion = 0;
+
+        // Top-level lists diffed per element, with the field identifying an element
+        private static readonly Dictionary<string, string> DeltaListKeys = new Dictionary<string, string>
+        {
+            { "SurroundingsData", "position" },
+            { "Crops", "position" },
+            { "NPCs", "Name" },
+        };
+
+        // Export only the subtrees that changed since the state the client holds (baseVersion).
+        // Changes are reported per top-level field, or per child of a top-level object, as
+        // {"Path": [...], "Value": ...}. The lists of DeltaListKeys are reported per element as
+        // {"Path": [...], "Key": field, "Set": [elements], "Unset": [keys], "Order": [keys]}, see
+        // DiffDeltaList. A keyframe carrying the whole state is sent whenever the client's version
+        // does not match ours, e.g. on the first call or when it asks for a resync.
+        public static DeltaObservation ExportGameData_delta(int size, long baseVersion, Mod mod)
+        {
+            var gameData = GatherGameData(size, mod);
+            var pixels = gameData.ScreenShot;
+            gameData.ScreenShot = null;
+            var serializer = JsonSerializer.Create(new JsonSerializerSettings
+            {
+                ReferenceLoopHandling = ReferenceLoopHandling.Ignore
+            });
+            var state = JObject.FromObject(gameData, serializer);
+
+            var delta = new JObject();
+            bool keyframe = lastDeltaState == null || baseVersion != deltaVersion;
+            if (keyframe)
+            {
+                delta["State"] = state;
+            }
+            else
+            {
+                var changed = new JArray();
+                var removed = new JArray();
+                DiffDeltaState(lastDeltaState!, state, changed, removed);
+                delta["Changed"] = changed;
+                delta["Removed"] = removed;
+            }
+            deltaVersion += 1;
+            lastDeltaState = state;
+            delta["Version"] = deltaVersion;
+            delta["BaseVersion"] = keyframe ? 0 : baseVersion;
+            delta["Keyframe"] = keyframe;
+            return new DeltaObservation
+            {
+                Delta = delta.ToString(Formatting.None),
+                Pixels = pixels,
+                Width = gameData.MetaData.ScreenShotSize?[0] ?? 0,
+                Height = gameData.MetaData.ScreenShotSize?[1] ?? 0,
+                Format = gameData.MetaData.ScreenShotFormat
+            };
+        }
+
+        private static void DiffDeltaState(JObject previous, JObject current, JArray changed, JArray removed)
+        {
+            foreach (var property in current.Properties())
+            {
+                var before = previous[property.Name];
+                if (before != null && JToken.DeepEquals(before, property.Value))
+                {
+                    continue;
+                }
+                if (before is JObject beforeObject && property.Value is JObject currentObject)
+                {
+                    foreach (var child in currentObject.Properties())
+                    {
+                        if (!JToken.DeepEquals(beforeObject[child.Name], child.Value))
+                        {
+                            changed.Add(new JObject { ["Path"] = new JArray(property.Name, child.Name), ["Value"] = child.Value });
+                        }
+                    }
+                    foreach (var child in beforeObject.Properties())
+                    {
+                        if (currentObject[child.Name] == null)
+                        {
+                            removed.Add(new JArray(property.Name, child.Name));
+                        }
+                    }
+                }
+                else if (before is JArray beforeList && property.Value is JArray currentList
+                    && DeltaListKeys.TryGetValue(property.Name, out var key)
+                    && DiffDeltaList(property.Name, key, beforeList, currentList) is JObject listChange)
+                {
+                    changed.Add(listChange);
+                }
+                else
+                {
+                    changed.Add(new JObject { ["Path"] = new JArray(property.Name), ["Value"] = property.Value });
+                }
+            }
+            foreach (var property in previous.Properties())
+            {
+                if (current[property.Name] == null)
+                {
+                    removed.Add(new JArray(property.Name));
+                }
+            }
+        }
+
+        // Elements keyed by the text of their key field, null if an element has no key or a key repeats
+        private static Dictionary<string, JToken>? IndexDeltaList(JArray list, string key)
+        {
+            var index = new Dictionary<string, JToken>(list.Count);
+            foreach (var element in list)
+            {
+                var keyValue = (element as JObject)?[key];
+                if (keyValue == null || !index.TryAdd(keyValue.ToString(Formatting.None), element))
+                {
+                    return null;
+                }
+            }
+            return index;
+        }
+
+        // "Set" holds the elements that are new or differ, "Unset" the keys of removed elements.
+        // The client keeps the remaining elements in their previous order and appends new ones in
+        // the order of "Set"; "Order" lists every key only when the current order differs from that
+        // (e.g. the surroundings grid shifting under a moving player). Returns null when the list
+        // cannot be keyed, in which case the whole list is sent.
+        private static JObject? DiffDeltaList(string name, string key, JArray previous, JArray current)
+        {
+            var previousIndex = IndexDeltaList(previous, key);
+            var currentIndex = IndexDeltaList(current, key);
+            if (previousIndex == null || currentIndex == null)
+            {
+                return null;
+            }
+
+            var set = new JArray();
+            var unset = new JArray();
+            var derivedOrder = new List<string>(current.Count);
+            var added = new List<string>();
+            foreach (var element in previous)
+            {
+                var keyText = element[key]!.ToString(Formatting.None);
+                if (currentIndex.ContainsKey(keyText))
+                {
+                    derivedOrder.Add(keyText);
+                }
+                else
+                {
+                    unset.Add(element[key]!);
+                }
+            }
+            foreach (var element in current)
+            {
+                var keyText = element[key]!.ToString(Formatting.None);
+                if (!previousIndex.TryGetValue(keyText, out var before))
+                {
+                    set.Add(element);
+                    added.Add(keyText);
+                }
+                else if (!JToken.DeepEquals(before, element))
+                {
+                    set.Add(element);
+                }
+            }
+            derivedOrder.AddRange(added);
+
+            var change = new JObject { ["Path"] = new JArray(name), ["Key"] = key, ["Set"] = set, ["Unset"] = unset };
+            if (!derivedOrder.SequenceEqual(current.Select(element => element[key]!.ToString(Formatting.None))))
+            {
+                change["Order"] = new JArray(current.Select(element => element[key]!));
+            }
+            return change;
+        }
+
         private static GameData GatherGameData(int size, Mod mod)
         {
             Console.WriteLine("time_point_0: "+ DateTime.Now.ToString("HH:mm:ss.fff"));
@@ -2079,6 +2313,9 @@ namespace ActionSpace.actions
             var currentMenuData = GetCurrentMenuData();
             Console.WriteLine("time_point_6: " + DateTime.Now.ToString("HH:mm:ss.fff"));
             var gameMetaData = GetGameMetaData();
+            var screenShot = EncodeScreenShot();
+            gameMetaData.ScreenShotSize = new[] { screenShot.Width, screenShot.Height };
+            gameMetaData.ScreenShotFormat = screenShot.Format;
             Console.WriteLine("time_point_7: " + DateTime.Now.ToString("HH:mm:ss.fff"));
             var surroundingsData = GetSurroundings(size);
             Console.WriteLine("time_point_8: " + DateTime.Now.ToString("HH:mm:ss.fff"));
@@ -2246,7 +2483,7 @@ namespace ActionSpace.actions
                 Farm = farmData,
                 // Progression = progressionData,
                 CurrentMenuData = currentMenuData ?? new CurrentMenuData { type = "No Menu" },
-                ScreenShot = pixelData,
+                ScreenShot = screenShot.Bytes,
                 // Doors = doorCoordinates,
                 Buildings = buildingsData,
                 Crops = cropCoordinates,
@@ -3040,6 +3277,89 @@ namespace ActionSpace.actions
             pixelData = new byte[Game1.viewport.Width * Game1.viewport.Height * 4];
         }
 
+        public static void setImageMode(string mode, int scale, int cropX, int cropY, int cropWidth, int cropHeight)
+        {
+            if (mode != "rgba" && mode != "gray" && mode != "jpeg" && mode != "none")
+            {
+                throw new ArgumentException($"unknown image mode '{mode}'");
+            }
+            imageMode = mode;
+            imageScale = Math.Max(1, scale);
+            imageCrop = new[] { cropX, cropY, cropWidth, cropHeight };
+        }
+
+        private static ScreenShotData EncodeScreenShot()
+        {
+            int srcWidth = Game1.viewport.Width;
+            int srcHeight = Game1.viewport.Height;
+            if (imageMode == "none" || pixelData == null)
+            {
+                return new ScreenShotData { Bytes = null, Width = 0, Height = 0, Format = FrameFormatRgba };
+            }
+            bool fullFrame = imageScale == 1 && imageCrop[2] <= 0 && imageCrop[3] <= 0 && imageCrop[0] <= 0 && imageCrop[1] <= 0;
+            if (imageMode == "rgba" && fullFrame)
+            {
+                return new ScreenShotData { Bytes = pixelData, Width = srcWidth, Height = srcHeight, Format = FrameFormatRgba };
+            }
+            if (pixelData.Length != srcWidth * srcHeight * 4)
+            {
+                // the viewport changed since the last capture
+                return new ScreenShotData { Bytes = null, Width = 0, Height = 0, Format = FrameFormatRgba };
+            }
+
+            int x0 = Math.Clamp(imageCrop[0], 0, srcWidth);
+            int y0 = Math.Clamp(imageCrop[1], 0, srcHeight);
+            int cropWidth = imageCrop[2] > 0 ? Math.Min(imageCrop[2], srcWidth - x0) : srcWidth - x0;
+            int cropHeight = imageCrop[3] > 0 ? Math.Min(imageCrop[3], srcHeight - y0) : srcHeight - y0;
+            int width = (cropWidth + imageScale - 1) / imageScale;
+            int height = (cropHeight + imageScale - 1) / imageScale;
+
+            if (imageMode == "gray")
+            {
+                var gray = new byte[width * height];
+                for (int y = 0; y < height; y++)
+                {
+                    int srcRow = (y0 + y * imageScale) * srcWidth;
+                    for (int x = 0; x < width; x++)
+                    {
+                        int src = (srcRow + x0 + x * imageScale) * 4;
+                        gray[y * width + x] = (byte)((pixelData[src] * 299 + pixelData[src + 1] * 587 + pixelData[src + 2] * 114) / 1000);
+                    }
+                }
+                return new ScreenShotData { Bytes = gray, Width = width, Height = height, Format = FrameFormatGray };
+            }
+
+            var rgba = new byte[width * height * 4];
+            for (int y = 0; y < height; y++)
+            {
+                int srcRow = (y0 + y * imageScale) * srcWidth;
+                if (imageScale == 1)
+                {
+                    Buffer.BlockCopy(pixelData, (srcRow + x0) * 4, rgba, y * width * 4, width * 4);
+                    continue;
+                }
+                for (int x = 0; x < width; x++)
+                {
+                    int src = (srcRow + x0 + x * imageScale) * 4;
+                    int dst = (y * width + x) * 4;
+                    rgba[dst] = pixelData[src];
+                    rgba[dst + 1] = pixelData[src + 1];
+                    rgba[dst + 2] = pixelData[src + 2];
+                    rgba[dst + 3] = pixelData[src + 3];
+                }
+            }
+            if (imageMode == "rgba")
+            {
+                return new ScreenShotData { Bytes = rgba, Width = width, Height = height, Format = FrameFormatRgba };
+            }
+
+            using var texture = new Texture2D(Game1.graphics.GraphicsDevice, width, height);
+            texture.SetData(rgba);
+            using var stream = new MemoryStream();
+            texture.SaveAsJpeg(stream, width, height);
+            return new ScreenShotData { Bytes = stream.ToArray(), Width = width, Height = height, Format = FrameFormatJpeg };
+        }
+
         public static void initSampleRate(int rate)
         {
             sampleRate = rate;
@@ -3056,7 +3376,7 @@ namespace ActionSpace.actions
                     mod.Monitor.Log("pixel data is empty");
                     return;
                 }
-                if (f >= sampleRate)
+                if (f >= sampleRate || imageMode == "none")
                 {
                     return;
                 }
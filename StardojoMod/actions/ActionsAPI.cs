@@ -4,6 +4,7 @@ using StardewValley;
 using Microsoft.Xna.Framework;
 using StardewValley.Menus;
 using System.Text;
+using System.Threading;
 using System.Threading.Tasks;
 using StardewModdingAPI.Events;
 using StardewValley.Buildings;
@@ -257,6 +258,29 @@ namespace ActionSpace.actions
             return data;
         }
 
+        public static void set_image_mode(string mode, string scaleS, string cropXS, string cropYS, string cropWidthS, string cropHeightS, Mod mod)
+        {
+            Actions.setImageMode(mode, int.Parse(scaleS), int.Parse(cropXS), int.Parse(cropYS), int.Parse(cropWidthS), int.Parse(cropHeightS));
+            mod.Monitor.Log($"image mode: {mode}, scale {scaleS}, crop {cropXS},{cropYS},{cropWidthS},{cropHeightS}");
+        }
+
+        public static DeltaObservation observe_delta(string sizeS, string baseVersionS, Mod mod)
+        {
+            var size = int.Parse(sizeS);
+            var baseVersion = long.Parse(baseVersionS);
+            var data = Actions.ExportGameData_delta(size, baseVersion, mod);
+            mod.Monitor.Log("data received");
+            return data;
+        }
+
+        public static BinaryObservation observe_binary(string sizeS, Mod mod)
+        {
+            var size = int.Parse(sizeS);
+            var data = Actions.ExportGameData_binary(size, mod);
+            mod.Monitor.Log("data received");
+            return data;
+        }
+
         public static byte[]? observe(string sizeS, Mod mod)
         {
             var size = int.Parse(sizeS);
@@ -300,6 +324,83 @@ namespace ActionSpace.actions
             return true;
         }
 
+        // Completes ticksS ticks after the next DayStarted, or with false if no day starts
+        // within a minute (e.g. the save failed to load). Sent right after load_game_record.
+        public async static Task<bool> wait_day_started(string ticksS, Mod mod)
+        {
+            var ticks = int.Parse(ticksS);
+            var taskCompletionSource = new TaskCompletionSource<bool>();
+            EventHandler<DayStartedEventArgs>? dayStarted = null;
+            EventHandler<UpdateTickedEventArgs>? counterUpdate = null;
+            var started = false;
+            var count = 0;
+            counterUpdate = (object? sender, UpdateTickedEventArgs e) =>
+            {
+                count += 1;
+                if (started ? count < ticks : count < 3600)
+                {
+                    return;
+                }
+                mod.Helper.Events.GameLoop.UpdateTicked -= counterUpdate;
+                mod.Helper.Events.GameLoop.DayStarted -= dayStarted;
+                taskCompletionSource.TrySetResult(started);
+            };
+            dayStarted = (object? sender, DayStartedEventArgs e) =>
+            {
+                mod.Helper.Events.GameLoop.DayStarted -= dayStarted;
+                started = true;
+                count = 0;
+            };
+            mod.Helper.Events.GameLoop.DayStarted += dayStarted;
+            mod.Helper.Events.GameLoop.UpdateTicked += counterUpdate;
+            return await taskCompletionSource.Task;
+        }
+
+        // actions received by the mod that have not returned yet, maintained by ModEntry
+        public static int pendingActions;
+
+        public async static Task<bool> wait_settled(string stableTicksS, string timeoutTicksS, Mod mod)
+        {
+            var stableTicks = int.Parse(stableTicksS);
+            var timeoutTicks = int.Parse(timeoutTicksS);
+            var taskCompletionSource = new TaskCompletionSource<bool>();
+            EventHandler<UpdateTickedEventArgs>? counterUpdate = null;
+            var stable = 0;
+            var count = 0;
+            var menu = Game1.activeClickableMenu;
+            counterUpdate = (object? sender, UpdateTickedEventArgs e) =>
+            {
+                count += 1;
+                // a menu that opened, closed or was replaced restarts the count
+                var menuChanged = !ReferenceEquals(menu, Game1.activeClickableMenu);
+                menu = Game1.activeClickableMenu;
+                stable = isSettled() && !menuChanged ? stable + 1 : 0;
+                if (stable < stableTicks && count < timeoutTicks)
+                {
+                    return;
+                }
+                mod.Helper.Events.GameLoop.UpdateTicked -= counterUpdate;
+                taskCompletionSource.TrySetResult(stable >= stableTicks);
+            };
+            mod.Helper.Events.GameLoop.UpdateTicked += counterUpdate;
+            return await taskCompletionSource.Task;
+        }
+
+        private static bool isSettled()
+        {
+            var player = Game1.player;
+            var playerSettled = !player.isMoving() && player.controller == null && !player.UsingTool && !player.isEating
+                && !player.FarmerSprite.isUsingWeapon() && !player.FarmerSprite.isOnToolAnimation()
+                && !player.FarmerSprite.isPassingOut() && player.freezePause <= 0;
+            var screenSettled = !Game1.fadeToBlack && !Game1.globalFade && !Game1.isWarping;
+            // festivals keep an event up for the whole day, cutscenes are waited out
+            var eventSettled = !Game1.eventUp || Game1.CurrentEvent == null || Game1.CurrentEvent.isFestival;
+            var menuSettled = !Game1.dialogueTyping && !(Game1.activeClickableMenu is DialogueBox dialogue && dialogue.transitioning)
+                && !(Game1.activeClickableMenu is SaveGameMenu);
+            return playerSettled && screenSettled && eventSettled && menuSettled
+                && Volatile.Read(ref pendingActions) == 0;
+        }
+
         public async static Task<bool> enter_load_menu(Mod mod)
         {
             var taskCompletionSource = new TaskCompletionSource<bool>();
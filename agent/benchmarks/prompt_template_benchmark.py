@@ -0,0 +1,133 @@
+'''
+Per-call cost of prompt assembly over the shipped templates, before and after compiling them.
+
+    python agent/benchmarks/prompt_template_benchmark.py
+    python agent/benchmarks/prompt_template_benchmark.py --templates ./res/stardew/prompts/templates --repeat 2000
+
+Images are left out: encoding is cached separately (see EncodedImageCache), this only measures
+the template handling.
+'''
+import argparse
+import importlib.util
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+AGENT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(AGENT_ROOT)
+from stardojo import constants
+
+# loaded by path so the benchmark does not need the LLM client libraries imported by stardojo.provider
+_spec = importlib.util.spec_from_file_location(
+    "prompt_template", os.path.join(AGENT_ROOT, "stardojo", "provider", "base", "prompt_template.py"))
+prompt_template = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(prompt_template)
+
+
+def legacy_assemble(template_str: str, params: dict) -> list:
+    # the text part of OpenAIProvider.assemble_prompt_tripartite before templates were compiled
+    pattern = re.compile(r"(.+?)(?=\n\n|$)", re.DOTALL)
+    paragraphs = re.findall(pattern, template_str)
+    filtered_paragraphs = [p for p in paragraphs if p.strip() != '']
+    system_content = filtered_paragraphs[0]
+
+    image_introduction_paragraph_index = None
+    for i, paragraph in enumerate(filtered_paragraphs):
+        if constants.IMAGES_INPUT_TAG in paragraph:
+            image_introduction_paragraph_index = i
+            break
+
+    parts = []
+    for part in (filtered_paragraphs[1:image_introduction_paragraph_index],
+                 filtered_paragraphs[image_introduction_paragraph_index + 1:]):
+        contents = []
+        for paragraph in part:
+            search_placeholder_pattern = re.compile(r"<\$[^\$]+\$>")
+            placeholder = re.search(search_placeholder_pattern, paragraph)
+            if not placeholder:
+                contents.append(paragraph)
+                continue
+            placeholder = placeholder.group()
+            placeholder_name = placeholder.replace("<$", "").replace("$>", "")
+            paragraph_input = params.get(placeholder_name, None)
+            if paragraph_input is None or paragraph_input == "" or paragraph_input == []:
+                continue
+            if isinstance(paragraph_input, str):
+                contents.append(paragraph.replace(placeholder, paragraph_input))
+            else:
+                contents.append(paragraph.replace(placeholder, json.dumps(paragraph_input)))
+        parts.append("\n\n".join(contents))
+    return [system_content] + parts
+
+
+def compiled_assemble(template, params: dict) -> list:
+    return [template.system_content, template.fill_part1(params), template.fill_part2(params)]
+
+
+def sample_params(template_str: str) -> dict:
+    params = {}
+    for i, name in enumerate(re.findall(r"<\$(.*?)\$>", template_str)):
+        if name == constants.IMAGES_INPUT_TAG_NAME:
+            continue
+        # a mix of present, list-valued and missing inputs, like a real step
+        if i % 5 == 4:
+            continue
+        params[name] = [{"name": f"{name} {k}", "position": [k, k + 1]} for k in range(5)] if i % 3 == 0 else f"value of {name}"
+    return params
+
+
+def measure(assemble, template, params, repeat: int) -> list:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        assemble(template, params)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt template assembly")
+    parser.add_argument("--templates", type=str, default=os.path.join(AGENT_ROOT, "res", "stardew", "prompts", "templates"))
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5,
+                        help="measure every template this many times and report the spread of the speedup")
+    args = parser.parse_args()
+
+    templates = []
+    for file_name in sorted(os.listdir(args.templates)):
+        if not file_name.endswith(".prompt"):
+            continue
+        with open(os.path.join(args.templates, file_name), "r", encoding="utf-8") as fd:
+            template_str = fd.read()
+        if constants.IMAGES_INPUT_TAG not in template_str:
+            continue
+        template = prompt_template.PromptTemplate(template_str)
+        params = sample_params(template_str)
+
+        assert legacy_assemble(template_str, params) == compiled_assemble(template, params), \
+            f"compiled template output differs for {file_name}"
+        templates.append((file_name, template_str, template, params))
+
+    # one round is a noisy figure (6.97x to 8.59x across identical runs), so report the spread
+    speedups = []
+    for round_index in range(args.rounds):
+        totals = {"legacy": [], "compiled": []}
+        for file_name, template_str, template, params in templates:
+            legacy = measure(legacy_assemble, template_str, params, args.repeat)
+            compiled = measure(compiled_assemble, template, params, args.repeat)
+            totals["legacy"] += legacy
+            totals["compiled"] += compiled
+            if round_index == 0:
+                print(f"{file_name:<50} legacy {statistics.mean(legacy) * 1e6:7.1f} us  "
+                      f"compiled {statistics.mean(compiled) * 1e6:7.1f} us")
+        speedups.append(statistics.mean(totals["legacy"]) / statistics.mean(totals["compiled"]))
+
+    print(f"overall speedup: median {statistics.median(speedups):.2f}x, "
+          f"{min(speedups):.2f}x to {max(speedups):.2f}x over {len(speedups)} rounds")
+
+
+if __name__ == '__main__':
+    main()
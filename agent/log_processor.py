@@ -9,6 +9,7 @@ from pathlib import PureWindowsPath
 from stardojo.utils.encoding_utils import decode_base64
 from stardojo.utils.string_utils import hash_text_sha256
 from stardojo.config import Config
+from stardojo.log.logger import IMAGE_REF_PREFIX, IMAGE_DIR
 from stardojo.utils.file_utils import get_latest_directories_in_path
 
 config = Config()
@@ -84,6 +85,14 @@ def _extract_image_hashes(text):
     return (map, text)
 
 
+def _replace_image_refs(line):
+    # images of logged prompts are already files in logs/images, named by content hash
+    for file_name in re.findall(rf'{re.escape(IMAGE_REF_PREFIX)}([0-9a-f]+\.\w+)', line):
+        link = "\n````\n" + f'![{file_name}]({IMAGE_DIR}/{file_name})' + "\n````text\n"
+        line = line.replace(IMAGE_REF_PREFIX + file_name, link)
+    return line
+
+
 def process_string(input_str):
 
     processed_str = input_str.replace("\\", "\\\\")
@@ -125,9 +134,11 @@ def process_log_messages(work_dir):
         log_lines.append(line)
     log = '\n'.join(log_lines)
 
-    hash_file_maps, log = _extract_image_hashes(log)
-    encoded_images = _extract_text_between_tokens(log)
-    log = _replacer(log, encoded_images, hash_file_maps, work_dir)
+    # logs written before prompts used image references carry the images inline
+    if ';base64,' in log:
+        hash_file_maps, log = _extract_image_hashes(log)
+        encoded_images = _extract_text_between_tokens(log)
+        log = _replacer(log, encoded_images, hash_file_maps, work_dir)
 
     md_log = []
     img_start_token = ';base64,'
@@ -146,7 +157,9 @@ def process_log_messages(work_dir):
                 obj_str = json.dumps(obj, indent=4, ensure_ascii=False)
                 line = "\n````text\n" + obj_str + "\n````\n\n"
 
-        if img_start_token in line:
+        if IMAGE_REF_PREFIX in line:
+            line = _replace_image_refs(line)
+        elif img_start_token in line:
             candidates = _extract_text_between_tokens(line, img_start_token, img_end_token)
             for candidate in candidates:
                 norm_path = os.path.normpath(candidate+'g')
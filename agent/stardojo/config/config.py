@@ -22,6 +22,9 @@ class Config(metaclass=Singleton):
     Configuration class.
     """
 
+    # one configuration per EnvContext
+    context_local = True
+
     DEFAULT_ENV_RESOLUTION = (1920, 1080)
     DEFAULT_ENV_SCREEN_RATIO = (16, 9)
 
@@ -44,6 +47,12 @@ class Config(metaclass=Singleton):
     env_sub_path = "-"
     env_short_name = "-"
     env_shared_runner = None
+    post_action_wait = {}
+    pipeline_async = False
+    pipeline_stages = {
+        "task_inference": ["self_reflection"],
+        "action_planning": ["self_reflection", "task_inference"],
+    }
     is_game = False
 
     # Dev parameters
@@ -99,6 +108,9 @@ class Config(metaclass=Singleton):
         self.event_count = 5
         self.memory_load_path = None
 
+        # Embeddings are cached on disk across runs, set EMBEDDING_CACHE_PATH empty to keep them in memory only
+        self.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", "./runs/embedding_cache.sqlite")
+
         # Parallel request to LLM parameters
         self.parallel_request_gather_information = True
 
@@ -191,6 +203,9 @@ class Config(metaclass=Singleton):
         self.env_short_name = kget(self.env_config, constants.ENVIRONMENT_SUB_PATH, default='')
         self.is_game = kget(self.env_config, constants.ENVIRONMENT_IS_GAME, default=self.is_game)
         self.env_shared_runner = kget(self.env_config, constants.ENVIRONMENT_SHARED_RUNNER, default=self.env_shared_runner)
+        self.post_action_wait = kget(self.env_config, constants.POST_ACTION_WAIT_KEY, default=self.post_action_wait)
+        self.pipeline_async = kget(self.env_config, constants.PIPELINE_KEY, constants.PIPELINE_ASYNC_KEY, default=self.pipeline_async)
+        self.pipeline_stages = kget(self.env_config, constants.PIPELINE_KEY, constants.PIPELINE_STAGES_KEY, default=self.pipeline_stages)
 
         # Base resolution and region for the game in 4k, used for angle scaling
         self.base_resolution = (3840, 2160)
@@ -95,6 +95,14 @@ SKILL_CONFIG_NAMES_TRADE = "skill_names_trade"
 # Provider-related keys
 PROVIDER_CONFIGS_KEY = 'provider_configs'
 
+# Per-skill post-action wait policies
+POST_ACTION_WAIT_KEY = 'post_action_wait'
+
+# Reasoning stage pipeline
+PIPELINE_KEY = 'pipeline'
+PIPELINE_ASYNC_KEY = 'async'
+PIPELINE_STAGES_KEY = 'stages'
+
 # Target environment SAM2SOM parameters
 SAM2SOM_CONFIG = 'sam2som_config'
 SAM2SOM_MODE = 'sam2som_mode'
@@ -0,0 +1,65 @@
+import importlib
+import types
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+SKILL_MODULE = "stardojo.environment.stardew.atomic_skills.basic_skills"
+
+
+@lru_cache(maxsize=None)
+def _module_functions(module_name: str) -> Tuple[types.ModuleType, List[Tuple[str, Any]]]:
+    module = importlib.import_module(module_name)
+    functions = []
+    for name, value in vars(module).items():
+        if name.startswith("__"):
+            continue
+        # registered skills are Skill objects wrapping the function
+        function = getattr(value, "skill_function", value)
+        if isinstance(function, types.FunctionType) and function.__module__ == module.__name__:
+            functions.append((name, function))
+    return module, functions
+
+
+def bind_module_functions(module_name: str, **overrides) -> Dict[str, Any]:
+    """
+    The callables of module_name, with the functions defined there rebound to a copy of the
+    module globals updated with overrides. The module is imported once; binding only copies
+    its namespace and creates new function objects around the same code.
+    """
+    module, functions = _module_functions(module_name)
+
+    namespace = dict(vars(module))
+    namespace.update(overrides)
+    for name, function in functions:
+        bound = types.FunctionType(function.__code__, namespace, function.__name__,
+                                   function.__defaults__, function.__closure__)
+        bound.__kwdefaults__ = function.__kwdefaults__
+        bound.__doc__ = function.__doc__
+        # skills calling each other resolve to the bound versions
+        namespace[name] = bound
+
+    return {name: value for name, value in namespace.items()
+            if callable(value) and not name.startswith("__")}
+
+
+class SkillExecutor:
+    """
+    The skills of a skill module bound to one action proxy.
+
+    Every executor sees its own `actionproxy` while sharing the imported module, so creating
+    one per environment reset neither re-executes the module and its register_skill
+    decorators nor adds an entry to sys.modules.
+    """
+
+    def __init__(
+        self,
+        actionproxy: Any,
+        module_name: str = SKILL_MODULE,
+    ) -> None:
+        self.actionproxy = actionproxy
+        self.module_name = module_name
+        self._load_skills()
+
+    def _load_skills(self):
+        for func_name, func in bind_module_functions(self.module_name, actionproxy=self.actionproxy).items():
+            setattr(self, func_name, func)
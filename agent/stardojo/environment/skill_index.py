@@ -0,0 +1,116 @@
+"""Embedding matrix for skill retrieval."""
+import os
+import hashlib
+from typing import Dict, List, Any
+
+import numpy as np
+
+from stardojo.log import Logger
+from stardojo.environment.skill import Skill
+from stardojo.utils.check import is_valid_value
+
+
+logger = Logger()
+
+
+def embedding_model_key(embedding_provider) -> str:
+    """Name and, when the provider reports it, dimension of the model behind an embedding provider."""
+    name = getattr(embedding_provider, "model_name", None) or getattr(embedding_provider, "embedding_model", "") \
+        or type(embedding_provider).__name__
+    try:
+        dim = embedding_provider.get_embedding_dim()
+    except Exception:
+        dim = None
+    return f"{name}:{dim}" if dim else name
+
+
+def skill_code_hash(skill_code: str, model: str = "") -> str:
+    return hashlib.sha1(f"{model}\0{skill_code}".encode('utf-8')).hexdigest()
+
+
+class SkillEmbeddingIndex():
+    """
+    Skill embeddings normalized and stacked into one matrix, so a query is scored against
+    every skill with a single matrix-vector product and only the top k are sorted.
+
+    Embeddings are also kept by the hash of the embedding model and the skill code and persisted
+    next to the skill library file, so skills whose code did not change are never embedded again
+    by the same model.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.embeddings_by_hash: Dict[str, np.ndarray] = {}
+
+        self.names: List[str] = []
+        self.matrix = None
+        self.key = None
+
+        if path is not None:
+            self.load()
+
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                self.embeddings_by_hash = dict(zip(data['hashes'].tolist(), data['embeddings']))
+            logger.write(f"Loaded {len(self.embeddings_by_hash)} skill embeddings from {self.path}")
+        except Exception as e:
+            logger.warn(f"Could not load skill embeddings from {self.path}: {e}")
+            self.embeddings_by_hash = {}
+
+
+    def save(self, skills: Dict[str, Skill], model: str = "") -> None:
+        embeddings = {}
+        for skill in skills.values():
+            if is_valid_value(skill.skill_embedding):
+                embeddings[skill_code_hash(skill.skill_code, model)] = np.asarray(skill.skill_embedding, dtype=np.float64)
+        if len(embeddings) == 0 or len({e.shape for e in embeddings.values()}) > 1:
+            return
+
+        self.embeddings_by_hash.update(embeddings)
+        with open(self.path, 'wb') as fd:
+            np.savez(fd, hashes=np.array(list(embeddings.keys())), embeddings=np.stack(list(embeddings.values())))
+
+
+    def get(self, skill_code: str, model: str = "") -> Any:
+        return self.embeddings_by_hash.get(skill_code_hash(skill_code, model), None)
+
+
+    def build(self, skills: Dict[str, Skill]) -> None:
+        """(Re)build the matrix if the set of skills changed since the last call."""
+        key = tuple((name, id(skill)) for name, skill in skills.items())
+        if key == self.key:
+            return
+
+        self.names = list(skills.keys())
+        rows = [np.asarray(skill.skill_embedding, dtype=np.float32) if is_valid_value(skill.skill_embedding) else None
+                for skill in skills.values()]
+        dim = next((row.shape[0] for row in rows if row is not None), 0)
+        matrix = np.zeros((len(rows), dim), dtype=np.float32)
+        for i, row in enumerate(rows):
+            if row is not None:
+                matrix[i] = row
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.matrix = matrix / norms
+        self.key = key
+
+
+    def top_k(self, query_embedding: np.ndarray, k: int) -> List[str]:
+        """Names of the k skills most similar to the query, best first."""
+        k = min(k, len(self.names))
+        if k <= 0:
+            return []
+
+        scores = self.matrix @ np.asarray(query_embedding, dtype=np.float32)
+        if k < len(scores):
+            candidates = np.sort(np.argpartition(-scores, k - 1)[:k])  # keep ties in skill order
+            order = candidates[np.argsort(-scores[candidates], kind='stable')]
+        else:
+            order = np.argsort(-scores, kind='stable')
+
+        return [self.names[i] for i in order]
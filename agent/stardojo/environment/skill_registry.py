@@ -5,8 +5,10 @@ import base64
 import re
 import ast
 import time
+from collections import OrderedDict
 from copy import deepcopy
-from typing import Type, AnyStr, List, Any, Dict, Tuple
+from functools import lru_cache
+from typing import Type, AnyStr, List, Any, Dict, Tuple, NamedTuple, Optional
 
 import numpy as np
 
@@ -16,6 +18,7 @@ from stardojo.log import Logger
 from stardojo.utils.json_utils import load_json, save_json
 from stardojo.utils.dict_utils import kget
 from stardojo.environment.skill import Skill
+from stardojo.environment.skill_index import SkillEmbeddingIndex, embedding_model_key
 from stardojo.environment.utils import serialize_skills, deserialize_skills
 from stardojo.utils.check import is_valid_value
 from stardojo.gameio.io_env import IOEnvironment
@@ -26,6 +29,9 @@ config = Config()
 logger = Logger()
 io_env = IOEnvironment()
 
+QUERY_EMBEDDING_CACHE_SIZE = 256
+PARSED_EXPRESSION_CACHE_SIZE = 1024
+
 
 SKILLS = {}
 def register_skill(name):
@@ -53,6 +59,95 @@ def register_skill(name):
     return decorator
 
 
+class SkillSpec(NamedTuple):
+    """What the registry needs to know about a skill, worked out once per skill."""
+    skill: Skill
+    signature: Optional[inspect.Signature]
+    library_entry: Optional[Dict]
+
+
+@lru_cache(maxsize=PARSED_EXPRESSION_CACHE_SIZE)
+def _extract_function_info(input_string: str):
+    pattern = re.compile(r'(\w+)\((.*?)\)')
+
+    match = pattern.match(input_string)
+
+    if match:
+        function_name = match.group(1)
+        raw_arguments = match.group(2)
+
+        # To avoid simple errors based on faulty model output
+        if raw_arguments is not None and len(raw_arguments) > 0:
+            raw_arguments = raw_arguments.replace("=false", "=False").replace("=true", "=True")
+
+        try:
+            parsed_arguments = ast.parse(f"fake_func({raw_arguments})", mode='eval')
+        except SyntaxError:
+            raise ValueError("Invalid function call/arg format to parse.")
+
+        arguments = {}
+        positional = []
+        # triverse ast
+        call_node = parsed_arguments.body
+        if not isinstance(call_node, ast.Call):
+            raise ValueError("Parsed arguments do not form a function call.")
+
+        for arg in call_node.args:
+            try:
+                positional.append(ast.literal_eval(arg))
+            except ValueError:
+                raise ValueError(f"Unable to evaluate positional argument: {ast.dump(arg)}")
+
+
+        for keyword in call_node.keywords:
+            try:
+                arguments[keyword.arg] = ast.literal_eval(keyword.value)
+            except ValueError:
+                raise ValueError(f"Unable to evaluate keyword argument '{keyword.arg}': {ast.dump(keyword.value)}")
+
+        arguments["other_params"] = positional
+
+        if len(raw_arguments) > 0 and len(arguments.keys()) == 0 and not positional:
+            raise ValueError("Call arguments not properly parsed!")
+
+        return function_name, arguments
+
+    else:
+        raise ValueError("Invalid function call format string.")
+
+
+@lru_cache(maxsize=PARSED_EXPRESSION_CACHE_SIZE)
+def _convert_expression_to_skill(expression: str):
+    try:
+        parsed = ast.parse(expression, mode='eval')
+
+        if isinstance(parsed.body, ast.Call):
+            skill_name, skill_params = _extract_function_info(expression)
+            return skill_name, skill_params
+        elif isinstance(parsed.body, ast.List):
+
+            skills_list = []
+            for call in parsed.body.elts:
+                if isinstance(call, ast.Call):
+                    call_str = ast.unparse(call).strip()
+                    skill_name, skill_params = _extract_function_info(call_str)
+                    skills_list.append((skill_name, skill_params))
+                else:
+                    raise ValueError("Input must be a list of function calls")
+            return skills_list
+        else:
+            raise ValueError("Input must be a function call or a list of function calls")
+
+    except SyntaxError as e:
+        raise ValueError(f"Error parsing input: {e}")
+
+
+def _copy_call(call):
+    # the cached parse is shared, callers like execute_skill pop from their params
+    skill_name, skill_params = call
+    return skill_name, {**skill_params, "other_params": list(skill_params["other_params"])}
+
+
 class SkillRegistry():
     """Base class for Skill Registry."""
 
@@ -88,10 +183,14 @@ class SkillRegistry():
             self.skill_from_default = True
 
         self.embedding_provider = embedding_provider
+        self.query_embeddings = OrderedDict()
 
         self.skills = {}
+        self.skill_specs: Dict[str, SkillSpec] = {}
 
         os.makedirs(config.skill_local_path, exist_ok=True)
+        self.skill_index = SkillEmbeddingIndex(os.path.join(config.skill_local_path,
+                                                            os.path.splitext(self.skill_library_filename)[0] + "_embeddings.npz"))
         if self.skill_from_default and os.path.exists(os.path.join(config.skill_local_path, self.skill_library_filename)):
             self.skills = self.load_skills_from_file(os.path.join(config.skill_local_path, self.skill_library_filename))
         else:
@@ -102,12 +201,49 @@ class SkillRegistry():
 
     def set_embedding_provider(self, embedding_provider):
         self.embedding_provider = embedding_provider
+        self.query_embeddings.clear()
 
 
     def get_embedding(self, skill_name, skill_doc):
         return np.array(self.embedding_provider.embed_query('{}: {}'.format(skill_name, skill_doc)))
 
 
+    def embed_skills(self, skills: List[Skill]) -> None:
+        """Fill in missing skill embeddings: reuse the persisted ones of unchanged code, embed the rest in one call."""
+        missing = []
+        model = None
+        for skill in skills:
+            if is_valid_value(skill.skill_embedding):
+                continue
+            model = model or embedding_model_key(self.embedding_provider)
+            embedding = self.skill_index.get(skill.skill_code, model)
+            if embedding is not None:
+                skill.skill_embedding = embedding
+            else:
+                missing.append(skill)
+
+        if len(missing) == 0:
+            return
+
+        logger.write(f"Embedding {len(missing)} skills")
+        embeddings = self.embedding_provider.embed_documents(
+            ['{}: {}'.format(skill.skill_name, inspect.getdoc(skill.skill_function)) for skill in missing])
+        for skill, embedding in zip(missing, embeddings):
+            skill.skill_embedding = np.array(embedding)
+
+
+    def get_query_embedding(self, query_task: str) -> np.ndarray:
+        if query_task in self.query_embeddings:
+            self.query_embeddings.move_to_end(query_task)
+            return self.query_embeddings[query_task]
+
+        task_emb = np.array(self.embedding_provider.embed_query(query_task))
+        self.query_embeddings[query_task] = task_emb
+        if len(self.query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+            self.query_embeddings.popitem(last=False)
+        return task_emb
+
+
     def load_skills_from_file(self, file_path) -> Dict[str, Skill]:
 
         logger.write(f"Loading skills from {file_path}")
@@ -142,8 +278,9 @@ class SkillRegistry():
                                            skill_code_base64)
             else: # skill_code has been modified, we should recompute embedding
                 logger.write(f"Regenerate skill {skill_name}")
-                self.register_skill_from_code(skill_local[skill_name].skill_code)
+                self.register_skill_from_code(skill_local[skill_name].skill_code, embed=False)
 
+        self.embed_skills(list(self.skills.values()))
         self.store_skills_to_file(file_path, skills)
 
         return skills
@@ -178,10 +315,11 @@ class SkillRegistry():
                 logger.write(f"Regenerate skill {skill_name}")
                 skills[skill_name] = Skill(skill_name,
                                            self.skill_registered[skill_name].skill_function,
-                                           self.get_embedding(skill_name, inspect.getdoc(self.skill_registered[skill_name].skill_function)),
+                                           None, # embedded below, together with the other regenerated skills
                                            self.skill_registered[skill_name].skill_code,
                                            skill_code_base64)
 
+        self.embed_skills(list(skills.values()))
         self.store_skills_to_file(os.path.join(config.skill_local_path, self.skill_library_filename), skills)
 
         return skills
@@ -204,28 +342,11 @@ class SkillRegistry():
 
 
     def convert_expression_to_skill(self, expression: str = "open_map()"):
-        try:
-            parsed = ast.parse(expression, mode='eval')
-
-            if isinstance(parsed.body, ast.Call):
-                skill_name, skill_params = self.extract_function_info(expression)
-                return skill_name, skill_params
-            elif isinstance(parsed.body, ast.List):
-
-                skills_list = []
-                for call in parsed.body.elts:
-                    if isinstance(call, ast.Call):
-                        call_str = ast.unparse(call).strip()
-                        skill_name, skill_params = self.extract_function_info(call_str)
-                        skills_list.append((skill_name, skill_params))
-                    else:
-                        raise ValueError("Input must be a list of function calls")
-                return skills_list
-            else:
-                raise ValueError("Input must be a function call or a list of function calls")
-
-        except SyntaxError as e:
-            raise ValueError(f"Error parsing input: {e}")
+        # parsed once per distinct expression
+        parsed = _convert_expression_to_skill(expression)
+        if isinstance(parsed, list):
+            return [_copy_call(call) for call in parsed]
+        return _copy_call(parsed)
 
 
     def extract_function_info(self, input_string: str = "open_map()"):
@@ -237,52 +358,7 @@ class SkillRegistry():
             "other_params": [..., ...] //Unlabeled paramaters 
         }
         '''
-        pattern = re.compile(r'(\w+)\((.*?)\)')
-
-        match = pattern.match(input_string)
-
-        if match:
-            function_name = match.group(1)
-            raw_arguments = match.group(2)
-
-            # To avoid simple errors based on faulty model output
-            if raw_arguments is not None and len(raw_arguments) > 0:
-                raw_arguments = raw_arguments.replace("=false", "=False").replace("=true", "=True")
-
-            try:
-                parsed_arguments = ast.parse(f"fake_func({raw_arguments})", mode='eval')
-            except SyntaxError:
-                raise ValueError("Invalid function call/arg format to parse.")
-
-            arguments = {}
-            positional = []
-            # triverse ast
-            call_node = parsed_arguments.body
-            if not isinstance(call_node, ast.Call):
-                raise ValueError("Parsed arguments do not form a function call.")
-            
-            for arg in call_node.args:
-                try:
-                    positional.append(ast.literal_eval(arg))
-                except ValueError:
-                    raise ValueError(f"Unable to evaluate positional argument: {ast.dump(arg)}")
-
-            
-            for keyword in call_node.keywords:
-                try:
-                    arguments[keyword.arg] = ast.literal_eval(keyword.value)
-                except ValueError:
-                    raise ValueError(f"Unable to evaluate keyword argument '{keyword.arg}': {ast.dump(keyword.value)}")
-                    
-            arguments["other_params"] = positional
-
-            if len(raw_arguments) > 0 and len(arguments.keys()) == 0 and not positional:
-                raise ValueError("Call arguments not properly parsed!")
-
-            return function_name, arguments
-
-        else:
-            raise ValueError("Invalid function call format string.")
+        return _copy_call(_extract_function_info(input_string))
 
 
     def convert_code_to_skill_info(self, skill_code: str):
@@ -296,24 +372,25 @@ class SkillRegistry():
         return function_name, arguments
 
 
-    def get_from_skill_library(self,
-                               skill_name: str,
-                               skill_library_with_code: bool = False) -> Dict:
+    def get_skill_spec(self, skill_name: str) -> SkillSpec:
+        """The signature and skill library entry of a registered skill, built on first use."""
 
         skill = self.skills[skill_name]
+        spec = self.skill_specs.get(skill_name)
+        if spec is not None and spec.skill is skill:
+            return spec
+
         skill_function = skill.skill_function
+        try:
+            signature = inspect.signature(skill_function)
+        except (TypeError, ValueError):
+            signature = None
 
         docstring = inspect.getdoc(skill_function)
 
-        skill_code = ""
-        for item in self.skills:
-            if item == skill_name:
-                skill_code = self.skills[item].skill_code
-                break
-
         if docstring:
 
-            params = inspect.signature(skill_function).parameters
+            params = signature.parameters if signature is not None else {}
 
             if len(params) > 0:
                 param_descriptions = {}
@@ -323,22 +400,34 @@ class SkillRegistry():
                     param_description = re.search(rf"- {name}: (.+).", docstring).group(1)
                     param_descriptions[name] = param_description
 
-                res =  {
+                library_entry =  {
                     "function_expression": f"{skill_name}({', '.join(params.keys())})",
                     "description": docstring,
                     "parameters": param_descriptions,
                 }
             else:
-                res =  {
+                library_entry =  {
                     "function_expression": f"{skill_name}()",
                     "description": docstring,
                     "parameters": {},
                 }
         else:
-            res =  None
+            library_entry =  None
+
+        spec = SkillSpec(skill, signature, library_entry)
+        self.skill_specs[skill_name] = spec
+        return spec
+
+
+    def get_from_skill_library(self,
+                               skill_name: str,
+                               skill_library_with_code: bool = False) -> Dict:
+
+        spec = self.get_skill_spec(skill_name)
+        res = deepcopy(spec.library_entry)
 
         if skill_library_with_code and res is not None:
-            res["code"] = skill_code
+            res["code"] = spec.skill.skill_code
 
         return res
 
@@ -347,15 +436,13 @@ class SkillRegistry():
 
         info = None
         try:
-            skill_name, _ = self.extract_function_info(skill)
+            skill_name, _ = _extract_function_info(skill)
         except:
             skill_name = skill
 
         skill_code = None
-        for item in self.skills:
-            if item == skill_name:
-                skill_code = self.skills[item].skill_code
-                break
+        if skill_name in self.skills:
+            skill_code = self.skills[skill_name].skill_code
 
         if skill_code is None:
             info = f"Skill '{skill_name}' not found in the registry."
@@ -372,7 +459,12 @@ class SkillRegistry():
             positional = skill_params["other_params"]
             skill_params.pop("other_params")
             if skill_name in self.skills:
-                # skill_function = self.skills[skill_name].skill_function
+                signature = self.get_skill_spec(skill_name).signature
+                if signature is not None:
+                    try:
+                        signature.bind(*positional, **skill_params)
+                    except TypeError as e:
+                        raise ValueError(f"Invalid arguments for skill '{skill_name}': {e}")
                 skill_response = getattr(executer, skill_name)(*positional, **skill_params)
             else:
                 raise ValueError(f"Function '{skill_name}' not found in the skill library.")
@@ -387,12 +479,13 @@ class SkillRegistry():
         time.sleep(2)
 
 
-    def register_skill_from_code(self, skill_code: str, overwrite = False) -> Tuple[bool, str]:
+    def register_skill_from_code(self, skill_code: str, overwrite = False, embed = True) -> Tuple[bool, str]:
         """Register the skill function from the code string.
 
         Args:
             skill_code: the code of skill.
             overwrite: the flag indicates whether to overwrite the skill with the same name or not.
+            embed: whether to embed the skill right away, otherwise the caller batches it with embed_skills.
 
         Returns:
             bool: the true value means that there is no problem in the skill_code. The false value means that we may need to re-generate it.
@@ -481,9 +574,11 @@ class SkillRegistry():
         skill_code_base64 = base64.b64encode(skill_code.encode('utf-8')).decode('utf-8')
         skill_ins = Skill(skill_name,
                           skill,
-                          self.get_embedding(skill_name, inspect.getdoc(skill)),
+                          None,
                           skill_code,
                           skill_code_base64)
+        if embed:
+            self.embed_skills([skill_ins])
 
         self.skills[skill_name] = skill_ins
         self.recent_skills.append(skill_name)
@@ -502,6 +597,7 @@ class SkillRegistry():
 
         if skill_name in self.skills:
             del self.skills[skill_name]
+        self.skill_specs.pop(skill_name, None)
         if skill_name in self.recent_skills:
             position = self.recent_skills.index(skill_name)
             self.recent_skills.pop(position)
@@ -511,13 +607,12 @@ class SkillRegistry():
         skill_num = min(skill_num, len(self.skills))
         target_skills = [skill for skill in self.recent_skills]
 
-        task_emb = np.array(self.embedding_provider.embed_query(query_task))
-
-        sorted_skills = sorted(self.skills.items(), key=lambda x: -np.dot(x[1].skill_embedding, task_emb))
+        task_emb = self.get_query_embedding(query_task)
 
-        for skill in sorted_skills:
+        self.skill_index.build(self.skills)
+        sorted_skills = self.skill_index.top_k(task_emb, skill_num + len(target_skills))
 
-            skill_name, skill = skill
+        for skill_name in sorted_skills:
 
             if len(target_skills) >= skill_num:
                 break
@@ -563,3 +658,4 @@ class SkillRegistry():
                              skills: Dict[str, Skill]) -> None:
         serialized_skills = serialize_skills(skills)
         save_json(file_path, serialized_skills, indent=4)
+        self.skill_index.save(skills, embedding_model_key(self.embedding_provider))
@@ -39,6 +39,8 @@ def register_skill(name):
 
 class StardewSkillRegistry(SkillRegistry, metaclass=Singleton):
 
+    context_local = True
+
     def __init__(self,
                  *args,
                  skill_configs: dict[str, Any] = config.skill_configs,
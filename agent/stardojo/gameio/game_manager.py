@@ -7,6 +7,7 @@ from stardojo.environment.ui_control import UIControl
 from stardojo.log import Logger
 from stardojo.gameio import IOEnvironment
 from stardojo.gameio.lifecycle.ui_control import check_active_window
+from stardojo.gameio.wait_engine import WaitEngine
 from stardojo.utils.file_utils import assemble_project_path
 
 config = Config()
@@ -30,6 +31,7 @@ class GameManager:
         self.llm_provider = llm_provider
         self.skill_registry = skill_registry
         self.ui_control = ui_control
+        self.wait_engine = WaitEngine(config.post_action_wait)
         io_env.llm_provider = self.llm_provider # @TODO needs a better DI
 
 
@@ -186,7 +188,7 @@ class GameManager:
                 exec_info[constants.EXECUTED_SKILLS].append(skill)
                 exec_info[constants.LAST_SKILL] = skill
 
-                self.post_action_wait()
+                self.post_action_wait(skill_name, executer)
                 logger.write(f"Finished executing skill: {skill} and wait.")
 
         except Exception as e:
@@ -200,10 +202,9 @@ class GameManager:
         return exec_info
 
 
-    # Currently all actions have wait in them, if needed
-    def post_action_wait(self):
-        #time.sleep(config.DEFAULT_POST_ACTION_WAIT_TIME)
-        time.sleep(3)
+    # Wait until the game settled after the skill, as configured per skill in the env config
+    def post_action_wait(self, skill_name = None, executer = None):
+        self.wait_engine.wait(skill_name, getattr(executer, "actionproxy", None))
 
 
     def get_out_screen(self):
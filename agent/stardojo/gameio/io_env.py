@@ -19,6 +19,8 @@ class IOEnvironment(metaclass=Singleton):
     """
     Wrapper for resources to interact with the game to make sure they're available where needed and multiple instances are not created.
     """
+    context_local = True
+
     # Constants
     RIGHT_MOUSE_BUTTON = 'Right'
     LEFT_MOUSE_BUTTON = 'Left'
@@ -0,0 +1,66 @@
+import time
+from typing import Any, Dict, NamedTuple
+
+from stardojo.log import Logger
+
+logger = Logger()
+
+GAME_TICKS_PER_SECOND = 60
+
+
+class WaitPolicy(NamedTuple):
+    """How long to wait after a skill.
+
+    stable_ticks: consecutive game ticks the game must be settled (player idle, no fade, warp,
+        cutscene or menu transition, no action still running in the mod), 0 to not wait at all.
+    timeout: seconds after which the wait gives up even if the game never settled.
+    fallback: fixed seconds to sleep when the executer cannot query the game.
+    """
+    stable_ticks: int = 6
+    timeout: float = 3.0
+    fallback: float = 3.0
+
+
+class WaitEngine():
+    """
+    Waits after each skill until the game is settled instead of sleeping a fixed time.
+
+    The readiness check runs in the mod, tick by tick, so a wait is a single request
+    that returns as soon as the game is settled for stable_ticks ticks.
+
+    Policies come from the "post_action_wait" entry of the env config:
+        {
+            "default": {"stable_ticks": 6, "timeout": 3.0},
+            "skills": {"choose_item": {"stable_ticks": 0}, "move": {"timeout": 10.0}}
+        }
+    Missing fields fall back to the default policy, then to WaitPolicy's defaults.
+    """
+
+    def __init__(self, wait_config: Dict[str, Any] = None):
+        wait_config = wait_config or {}
+        self.default = WaitPolicy(**wait_config.get("default", {}))
+        self.policies = {skill_name: self.default._replace(**policy)
+                         for skill_name, policy in wait_config.get("skills", {}).items()}
+
+
+    def policy(self, skill_name: str) -> WaitPolicy:
+        return self.policies.get(skill_name, self.default)
+
+
+    def wait(self, skill_name: str = None, proxy: Any = None) -> bool:
+        """Wait after skill_name, return whether the game settled before the timeout."""
+
+        policy = self.policy(skill_name)
+        if policy.stable_ticks <= 0:
+            return True
+
+        if proxy is None or not hasattr(proxy, "wait_settled"):
+            time.sleep(policy.fallback)
+            return True
+
+        start = time.time()
+        settled = proxy.wait_settled(policy.stable_ticks, int(policy.timeout * GAME_TICKS_PER_SECOND))
+        if not settled:
+            logger.warn(f"Game did not settle within {policy.timeout}s after {skill_name}")
+        logger.debug(f"Waited {time.time() - start:.2f}s after {skill_name}")
+        return settled
@@ -1,15 +1,223 @@
+import base64
+import hashlib
+import json
 import logging
 import os
 import psutil
+import threading
+import time
+from collections import deque
 from pathlib import Path
 import sys
 
 from colorama import Fore, Back, Style, init as colours_on
 
 from stardojo.utils import Singleton
+from stardojo.utils.env_context import current_context
 
 colours_on(autoreset=True)
 
+# base64 images in logged prompts are replaced by IMAGE_REF_PREFIX + the file name under the log image dir
+IMAGE_REF_PREFIX = "img_ref:"
+IMAGE_DIR = "images"
+
+
+def _image_ref(payload: str, image_dir: str | None, image_type: str = "jpeg") -> str:
+    file_name = f"{hashlib.sha1(payload.encode()).hexdigest()}.{image_type}"
+    if image_dir is not None:
+        path = os.path.join(image_dir, file_name)
+        if not os.path.exists(path):
+            Path(image_dir).mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(base64.b64decode(payload))
+    return IMAGE_REF_PREFIX + file_name
+
+
+def redact_images(value, image_dir: str | None = None):
+    """Copy of a message structure with every base64 image replaced by a content hash reference."""
+    if isinstance(value, str):
+        if value.startswith("data:image/") and ";base64," in value:
+            header, payload = value.split(";base64,", 1)
+            return _image_ref(payload, image_dir, header[len("data:image/"):])
+        return value
+    if isinstance(value, list):
+        return [redact_images(item, image_dir) for item in value]
+    if isinstance(value, dict):
+        redacted = {key: redact_images(item, image_dir) for key, item in value.items()}
+        # anthropic "source" and gemini "inline_data" blocks carry the payload under "data"
+        if isinstance(value.get("data"), str) and not redacted["data"].startswith(IMAGE_REF_PREFIX) and \
+                ("media_type" in value or "mime_type" in value):
+            redacted["data"] = _image_ref(value["data"], image_dir)
+        return redacted
+    return value
+
+
+class PromptLogRecord:
+    """
+    Log message for LLM prompts, formatted only when a handler emits it. The prompt is
+    serialized with image references instead of inline base64, and each image is written
+    once to the image dir of the log, named by its content hash.
+    """
+
+    def __init__(self, mask: str, messages, image_dir: str | None):
+        self.mask = mask
+        self.messages = messages
+        self.image_dir = image_dir
+
+    def __str__(self):
+        return f'{self.mask}{json.dumps(redact_images(self.messages, self.image_dir), ensure_ascii=False)}\n'
+
+
+class ResourceSampler(metaclass=Singleton):
+    """
+    Samples CPU and memory on a daemon thread every `interval` seconds (RESOURCE_SAMPLE_INTERVAL,
+    default 1) so that formatting a log record only reads the latest snapshot.
+
+    A snapshot holds the system-wide usage, this process and every watched game process,
+    keyed by the port its server listens on. The last `history` snapshots are kept in
+    `series`, appended as JSON lines to every path set with `set_metrics_path`, and passed to
+    listeners registered with `add_listener`, which is how dashboards consume the stream.
+
+    The sampler is shared by the whole process. Each owner (an EnvContext, or the process
+    itself outside of any context) sets its own metrics path, and the lines written there
+    only hold the game on the port the owner watches.
+    """
+
+    def __init__(self, interval: float = None, history: int = 3600):
+        self.interval = interval if interval is not None else float(os.getenv("RESOURCE_SAMPLE_INTERVAL", "1.0"))
+        self.series = deque(maxlen=history)
+        self.process = psutil.Process()
+        self.game_processes = {}  # port -> psutil.Process, or None until the listener is found
+        self.lookup_backoff = {}  # port -> (time of the next listener lookup, delay after it)
+        self.metrics_paths = {}  # owner -> (path, port)
+        self.listeners = []
+        self.failing = set()  # metrics paths and listeners whose last call failed
+        self.lock = threading.Lock()
+        self.thread = None
+        self.latest = self._sample()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+                self.thread.start()
+
+    def watch_port(self, port: int):
+        with self.lock:
+            self.game_processes.setdefault(port, None)
+
+    def set_metrics_path(self, owner, path: str, port: int = None):
+        """Write the samples to path for owner, replacing its previous path, restricted to the game on port."""
+        with self.lock:
+            self.metrics_paths[owner] = (path, port)
+
+    def add_listener(self, listener):
+        """listener(snapshot) is called from the sampler thread after every sample."""
+        self.listeners.append(listener)
+
+    def _guard(self, target, call):
+        # a failing metrics path or listener must not stop the sampler; report it once until it recovers
+        try:
+            call()
+        except Exception as e:
+            if target not in self.failing:
+                self.failing.add(target)
+                logging.getLogger("UAC Logger").warning(f"Resource sampler: {target} failed: {e}")
+        else:
+            self.failing.discard(target)
+
+    def _write_metrics(self, path: str, port: int | None, snapshot: dict):
+        games = snapshot["games"]
+        if port is not None:
+            games = {port: games[port]} if port in games else {}
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(snapshot, games=games)) + "\n")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                snapshot = self._sample()
+            except Exception:
+                continue
+            self.latest = snapshot
+            self.series.append(snapshot)
+            with self.lock:
+                metrics_paths = list(self.metrics_paths.values())
+            for path, port in metrics_paths:
+                self._guard(f"metrics file {path}", lambda: self._write_metrics(path, port, snapshot))
+            for listener in list(self.listeners):
+                self._guard(f"listener {listener!r}", lambda: listener(snapshot))
+
+    @staticmethod
+    def _process_stats(process: psutil.Process) -> dict:
+        with process.oneshot():
+            return {
+                "pid": process.pid,
+                "cpu_usage": process.cpu_percent(interval=None),
+                "memory_rss": process.memory_info().rss,
+                "num_threads": process.num_threads(),
+            }
+
+    @staticmethod
+    def _find_listeners(ports: set) -> dict:
+        # one scan of the system's sockets for all the ports: net_connections lists every one of them
+        listeners = {}
+        for connection in psutil.net_connections(kind="tcp"):
+            if connection.laddr and connection.laddr.port in ports and connection.status == psutil.CONN_LISTEN and connection.pid:
+                listeners[connection.laddr.port] = connection.pid
+        return listeners
+
+    def _lookup_games(self, ports: set) -> None:
+        # ports without a listener are looked up again after a delay doubling up to a minute
+        now = time.time()
+        due = {port for port in ports if self.lookup_backoff.get(port, (0, 0))[0] <= now}
+        if not due:
+            return
+        try:
+            listeners = self._find_listeners(due)
+        except (psutil.Error, OSError):
+            listeners = {}
+        for port in due:
+            process = None
+            if port in listeners:
+                try:
+                    process = psutil.Process(listeners[port])
+                except psutil.Error:
+                    pass
+            with self.lock:
+                self.game_processes[port] = process
+            if process is not None:
+                self.lookup_backoff.pop(port, None)
+            else:
+                delay = min(max(2 * self.lookup_backoff.get(port, (0, 0))[1], self.interval), 60)
+                self.lookup_backoff[port] = (now + delay, delay)
+
+    def _sample(self) -> dict:
+        games = {}
+        with self.lock:
+            ports = list(self.game_processes.items())
+        # games get relaunched, so look the listener up again once it is gone
+        self._lookup_games({port for port, process in ports if process is None or not process.is_running()})
+        with self.lock:
+            ports = list(self.game_processes.items())
+        for port, process in ports:
+            if process is None:
+                continue
+            try:
+                games[port] = self._process_stats(process)
+            except (psutil.Error, OSError):
+                with self.lock:
+                    self.game_processes[port] = None
+
+        return {
+            "time": time.time(),
+            "cpu_usage": psutil.cpu_percent(interval=None),
+            "memory_usage": psutil.virtual_memory().percent,
+            "process": self._process_stats(self.process),
+            "games": games,
+        }
+
 
 class CPUMemFormatter(logging.Formatter):
 
@@ -19,12 +227,9 @@ class CPUMemFormatter(logging.Formatter):
         self.task = task
 
     def format(self, record):
-        cpu_usage = psutil.cpu_percent(interval=None)
-        memory = psutil.virtual_memory()
-        memory_usage = memory.percent
-
-        record.cpu_usage = cpu_usage
-        record.memory_usage = memory_usage
+        snapshot = ResourceSampler().latest
+        record.cpu_usage = snapshot["cpu_usage"]
+        record.memory_usage = snapshot["memory_usage"]
 
         if self.port is not None:
             record.port = f'Port {self.port}: ' 
@@ -54,17 +259,11 @@ class CPUMemColorFormatter(logging.Formatter):
         color = self.COLOURS.get(record.levelname, "")
         if color:
             record.name = color + record.name
-            record.msg = record.msg + Style.RESET_ALL
-
-        record.cpu_usage = psutil.cpu_percent(interval=None)
-        record.memory_usage = psutil.virtual_memory().percent
-
-        cpu_usage = psutil.cpu_percent(interval=None)
-        memory = psutil.virtual_memory()
-        memory_usage = memory.percent
+            record.msg = str(record.msg) + Style.RESET_ALL
 
-        record.cpu_usage = cpu_usage
-        record.memory_usage = memory_usage
+        snapshot = ResourceSampler().latest
+        record.cpu_usage = snapshot["cpu_usage"]
+        record.memory_usage = snapshot["memory_usage"]
 
         if self.port is not None:
             record.port = f'Port {self.port}: ' 
@@ -77,10 +276,14 @@ class CPUMemColorFormatter(logging.Formatter):
 
 class Logger(metaclass=Singleton):
 
+    context_local = True
+
     log_file = 'stardojo.log'
+    metrics_file = 'metrics.jsonl'
 
     log_dir = './logs'
     work_dir = None
+    image_dir = None
 
     DOWNSTREAM_MASK = "\n>> Downstream - A:\n"
     UPSTREAM_MASK = "\n>> Upstream - R:\n"
@@ -105,22 +308,33 @@ class Logger(metaclass=Singleton):
         else:
             format = '%(task)s - %(port)s - %(asctime)s - CPU: %(cpu_usage)s%%, Memory: %(memory_usage)s%% - %(name)s - %(levelname)s - %(message)s'
 
+        sampler = ResourceSampler()
+        if port is not None:
+            sampler.watch_port(port)
+        sampler.start()
+
         formatter = CPUMemFormatter(port, task, format)
         c_formatter = CPUMemColorFormatter(port, task, format)
 
         stdout_handler = logging.StreamHandler(sys.stdout)
         stdout_handler.setLevel(logging.INFO)
         stdout_handler.setFormatter(c_formatter)
+        # errors are printed (and formatted) once, by the stderr handler
+        stdout_handler.addFilter(lambda record: record.levelno < logging.ERROR)
 
         stderr_handler = logging.StreamHandler()
         stderr_handler.setLevel(logging.ERROR)
         stderr_handler.setFormatter(c_formatter)
 
         handlers = [stdout_handler, stderr_handler]
+        context = current_context()
 
         if self.work_dir is not None:
             self.log_dir = os.path.join(self.work_dir, self.log_dir)
             Path(self.log_dir).mkdir(parents=True, exist_ok=True)
+            self.image_dir = os.path.join(self.log_dir, IMAGE_DIR)
+            sampler.set_metrics_path(context.name if context is not None else None,
+                                     os.path.join(self.log_dir, self.metrics_file), port)
 
             file_handler = logging.FileHandler(filename=os.path.join(self.log_dir, self.log_file), mode='w', encoding='utf-8')
             file_handler.setLevel(logging.DEBUG)
@@ -128,8 +342,19 @@ class Logger(metaclass=Singleton):
 
             handlers.append(file_handler)
 
-        logging.basicConfig(level=logging.DEBUG, handlers=handlers, force=True)
-        self.logger = logging.getLogger("UAC Logger")
+        if context is None:
+            logging.basicConfig(level=logging.DEBUG, handlers=handlers, force=True)
+            self.logger = logging.getLogger("UAC Logger")
+        else:
+            # environments sharing the process keep their handlers off the root logger
+            self.logger = logging.getLogger(f"UAC Logger.{context.name}")
+            self.logger.setLevel(logging.DEBUG)
+            self.logger.propagate = False
+            for handler in self.logger.handlers[:]:
+                self.logger.removeHandler(handler)
+                handler.close()
+            for handler in handlers:
+                self.logger.addHandler(handler)
 
         if len(handlers) == 2:
             self.logger.warn('Work directory not set. Logging to console only???')
@@ -174,6 +399,10 @@ class Logger(metaclass=Singleton):
 
         self._log(title, title_color, message, logging.DEBUG)
 
+    def debug_prompt(self, message_prompts):
+        # nothing is serialized unless the record reaches a handler
+        self.debug(PromptLogRecord(self.UPSTREAM_MASK, message_prompts, self.image_dir))
+
     def write(
             self,
             message="",
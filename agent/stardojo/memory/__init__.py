@@ -1,10 +1,12 @@
 from .base import BaseMemory
 from .vector_store import VectorStore
+from .numpy_vector_store import NumpyVectorStore
 from .basic_vector_memory import BasicVectorMemory
 from .local_memory import LocalMemory
 
 __all__ = [
     "VectorStore",
+    "NumpyVectorStore",
     "BaseMemory",
     "BasicVectorMemory",
     "LocalMemory"
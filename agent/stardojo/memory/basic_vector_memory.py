@@ -48,10 +48,9 @@ class BasicVectorMemory(BaseMemory):
         """
 
         keys: List[str] = list(data.keys())
-        embeddings = []
+        embeddings = self.embedding_provider.embed_documents([data[k]["description"] for k in keys])
 
         for k in keys:
-            embeddings.append(self.embedding_provider.embed_query(data[k]["description"]))
             instruction = data[k]["instruction"]
             screenshot = data[k]["screenshot"]
             timestep = data[k]["timestep"]
@@ -136,4 +135,5 @@ class BasicVectorMemory(BaseMemory):
     def save(self) -> None:
         """Save the memory to the local file."""
         save_json(file_path = os.path.join(self.memory_path, self.storage_filename), json_dict = self.memory, indent = 4)
-        self.vectorstores.save()
+        for k, v in self.vectorstores.items():
+            v.save(name=k)
@@ -4,8 +4,13 @@ from typing import (
     Dict,
     Union,
     Tuple,
+    Mapping,
 )
 import os
+from collections import deque
+from copy import deepcopy
+from itertools import islice
+from types import MappingProxyType
 
 from stardojo.config import Config
 from stardojo import constants
@@ -20,6 +25,7 @@ logger = Logger()
 
 class LocalMemory(BaseMemory, metaclass=Singleton):
 
+    context_local = True
     storage_filename = "memory.json"
 
     def __init__(
@@ -31,34 +37,69 @@ class LocalMemory(BaseMemory, metaclass=Singleton):
         self.max_recent_steps = max_recent_steps
         self.memory_path = memory_path
 
-        # Public working space for the agent to store information during loop
-        self.working_area: Dict[str, Any] = {}
+        # Public working space for the agent to store information during loop.
+        # Copy-on-write: once handed out by snapshot() the dict is never modified again,
+        # the next update works on a shallow copy instead.
+        self._working_area: Dict[str, Any] = {}
+        self._working_area_shared = False
 
         self.task_duration = 3
 
         # @TODO First memory summary should be based on environment spec
         self.recent_history = {
-            constants.IMAGES_MEM_BUCKET: [],
-            constants.AUGMENTED_IMAGES_MEM_BUCKET: [],
-            "action": [],
-            "action_error": [],
-            "decision_making_reasoning": [],
-            "success_detection_reasoning": [],
-            "self_reflection_reasoning": [],
-            "image_description": [],
-            "task_guidance": [],
-            "dialogue": [],
-            "task_description": [],
-            constants.SKIIL_LIB_MEM_BUCKET: [],
-            constants.SUMMARIZATION_MEM_BUCKET: ["The user is using the target application on the PC."],
-            constants.LAST_TASK_GUIDANCE: [],
-            "long_horizon_task": [],
-            "": [self.task_duration],
-            constants.KEY_REASON_OF_LAST_ACTION: [],
-            constants.SUCCESS_DETECTION: [],
+            constants.IMAGES_MEM_BUCKET: self._bucket(),
+            constants.AUGMENTED_IMAGES_MEM_BUCKET: self._bucket(),
+            "action": self._bucket(),
+            "action_error": self._bucket(),
+            "decision_making_reasoning": self._bucket(),
+            "success_detection_reasoning": self._bucket(),
+            "self_reflection_reasoning": self._bucket(),
+            "image_description": self._bucket(),
+            "task_guidance": self._bucket(),
+            "dialogue": self._bucket(),
+            "task_description": self._bucket(),
+            constants.SKIIL_LIB_MEM_BUCKET: self._bucket(),
+            constants.SUMMARIZATION_MEM_BUCKET: self._bucket(["The user is using the target application on the PC."]),
+            constants.LAST_TASK_GUIDANCE: self._bucket(),
+            "long_horizon_task": self._bucket(),
+            "": self._bucket([self.task_duration]),
+            constants.KEY_REASON_OF_LAST_ACTION: self._bucket(),
+            constants.SUCCESS_DETECTION: self._bucket(),
             }
 
 
+    def _bucket(self, items: List[Any] = ()) -> deque:
+        return deque(items, maxlen=self.max_recent_steps)
+
+
+    @property
+    def working_area(self) -> Mapping[str, Any]:
+        """Read-only view of the current working area, see snapshot()."""
+        return self.snapshot()
+
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """
+        Read-only view of the working area as it is now. Later updates do not show through,
+        so it can be passed to the planner instead of a copy. The values are shared with the
+        memory and must not be modified.
+        """
+        self._working_area_shared = True
+        return MappingProxyType(self._working_area)
+
+
+    def copy_working_area(self) -> Dict[str, Any]:
+        """Private deep copy of the working area, for callers that edit nested values."""
+        return deepcopy(self._working_area)
+
+
+    def update_working_area(self, data: Dict[str, Any]) -> None:
+        if self._working_area_shared:
+            self._working_area = dict(self._working_area)
+            self._working_area_shared = False
+        self._working_area.update(data)
+
+
     def add_recent_history_kv(
         self,
         key: str,
@@ -67,13 +108,10 @@ class LocalMemory(BaseMemory, metaclass=Singleton):
 
         """Add recent info (skill/image/reasoning) to memory."""
         if key not in self.recent_history:
-            self.recent_history[key] = []
+            self.recent_history[key] = self._bucket()
 
         self.recent_history[key].append(info)
 
-        if len(self.recent_history[key]) > self.max_recent_steps:
-            self.recent_history[key].pop(0)
-
 
     def add_recent_history(
         self,
@@ -83,12 +121,9 @@ class LocalMemory(BaseMemory, metaclass=Singleton):
         """Add recent info to memory."""
         for key, value in information.items():
             if key not in self.recent_history:
-                self.recent_history[key] = []
+                self.recent_history[key] = self._bucket()
             self.recent_history[key].append(value)
 
-            if len(self.recent_history[key]) > self.max_recent_steps:
-                self.recent_history[key].pop(0)
-
 
     def get_recent_history(
         self,
@@ -104,16 +139,20 @@ class LocalMemory(BaseMemory, metaclass=Singleton):
         if k is None:
             k = 1
 
-        return self.recent_history[key][-k:] if len(self.recent_history[key]) >= k else self.recent_history[key]
+        history = self.recent_history[key]
+        if not isinstance(history, deque):
+            return history[-k:] if len(history) >= k else history
+
+        return list(islice(history, max(len(history) - k, 0), None))
 
 
     def update_info_history(self, data: Dict[str, Any]):
-        self.working_area.update(data)
+        self.update_working_area(data)
         self.add_recent_history(data)
 
 
     def add_summarization(self, summary: str) -> None:
-        self.recent_history[constants.SUMMARIZATION_MEM_BUCKET] = [summary]
+        self.recent_history[constants.SUMMARIZATION_MEM_BUCKET] = self._bucket([summary])
 
 
     def get_summarization(self) -> str:
@@ -143,7 +182,8 @@ class LocalMemory(BaseMemory, metaclass=Singleton):
         # @TODO load and store whole memory
         if load_path != None:
             if os.path.exists(os.path.join(load_path)):
-                self.recent_history = load_json(load_path)
+                self.recent_history = {key: self._bucket(value) if isinstance(value, list) else value
+                                       for key, value in load_json(load_path).items()}
                 logger.write(f"{load_path} has been loaded.")
             else:
                 logger.error(f"{load_path} does not exist.")
@@ -152,8 +192,9 @@ class LocalMemory(BaseMemory, metaclass=Singleton):
     def save(self, local_path=None) -> None:
         """Save the memory to the local file."""
         # @TODO load and store whole memory
-        recent_history_without_image = self.recent_history
-        recent_history_without_image['ScreenShot'] = []
+        self.recent_history['ScreenShot'] = self._bucket()
+        recent_history_without_image = {key: list(value) if isinstance(value, deque) else value
+                                        for key, value in self.recent_history.items()}
         if local_path:
             save_json(file_path=local_path, json_dict=recent_history_without_image, indent=4)
         else:
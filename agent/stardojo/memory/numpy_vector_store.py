@@ -0,0 +1,325 @@
+import os
+import json
+from typing import (
+    Any,
+    Iterable,
+    List,
+    Dict,
+    Tuple,
+    Optional,
+)
+
+import numpy as np
+
+from stardojo.log import Logger
+from stardojo.memory.vector_store import VectorStore
+
+logger = Logger()
+
+METRIC_COSINE = "cosine"
+METRIC_INNER_PRODUCT = "ip"
+
+IVF_TRAIN_POINTS_PER_LIST = 32
+IVF_TRAIN_ITERATIONS = 10
+
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int = IVF_TRAIN_ITERATIONS, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest_centroids(vectors, centroids)
+        for i in range(k):
+            members = vectors[assignments == i]
+            if len(members) > 0:  # an empty list keeps its old centroid
+                centroids[i] = members.mean(axis=0)
+    return centroids
+
+
+def _centroid_distances(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # squared L2 distances up to the |v|^2 term, which is the same for every centroid
+    return (centroids * centroids).sum(axis=1) - 2 * vectors @ centroids.T
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmin(_centroid_distances(vectors, centroids), axis=1)
+
+
+class NumpyVectorStore(VectorStore):
+    """In-process vector store over a contiguous float32 matrix.
+
+    Rows are appended in batches to a buffer that grows by doubling. Deleted or replaced
+    keys leave a tombstone that is skipped by the search and dropped by compact(), which
+    runs on its own once half of the rows are dead. Search is exact (one matrix-vector
+    product and an argpartition top-k) unless nlist is set: then, once the store holds
+    nlist * IVF_TRAIN_POINTS_PER_LIST vectors, rows are clustered into nlist inverted lists
+    and only the nprobe lists closest to the query are scanned.
+
+    save/load write the matrix as a raw .npy file, so load(mmap=True) maps it instead of
+    reading it; the mapping is copy-on-write and the file is only changed by save.
+
+    Args:
+        path: directory of the saved files.
+        metric: "cosine" (vectors are normalized on insert) or "ip" (raw inner product).
+        nlist: number of inverted lists of the coarse index, 0 for exact search only.
+        nprobe: number of lists scanned per query.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        metric: str = METRIC_COSINE,
+        nlist: int = 0,
+        nprobe: int = 8,
+        capacity: int = 1024,
+    ) -> None:
+
+        if metric not in (METRIC_COSINE, METRIC_INNER_PRODUCT):
+            raise ValueError(f"Unknown metric: {metric}")
+
+        self.path = path
+        self.metric = metric
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.capacity = capacity
+
+        self.vectors: Optional[np.ndarray] = None
+        self.size = 0
+        self.keys: List[str] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.key_to_row: Dict[str, int] = {}
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.lists: List[np.ndarray] = []
+
+
+    def __len__(self) -> int:
+        return len(self.key_to_row)
+
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.key_to_row
+
+
+    def _prepare(self, embeddings: Iterable[List[float]]) -> np.ndarray:
+        vectors = np.array(embeddings, dtype=np.float32, ndmin=2)
+        if self.metric == METRIC_COSINE:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            vectors /= norms
+        return vectors
+
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        if self.vectors is None:
+            self.vectors = np.zeros((max(self.capacity, rows), dim), dtype=np.float32)
+        elif self.vectors.shape[1] != dim:
+            raise ValueError(f"Expected embeddings of dimension {self.vectors.shape[1]}, got {dim}")
+        elif self.size + rows > len(self.vectors):
+            capacity = max(2 * len(self.vectors), self.size + rows)
+            vectors = np.zeros((capacity, dim), dtype=np.float32)
+            vectors[:self.size] = self.vectors[:self.size]
+            self.vectors = vectors
+
+        if self.size + rows > len(self.alive):
+            capacity = len(self.vectors)
+            self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), dtype=bool)])
+            self.assignments = np.concatenate([self.assignments, np.full(capacity - len(self.assignments), -1, dtype=np.int32)])
+
+
+    def add_embeddings(
+        self,
+        keys: List[str],
+        embeddings: Iterable[List[float]],
+        **kwargs: Any,
+    ) -> None:
+        """Add a batch of embeddings. A key that is already stored, or repeated in the batch, is replaced."""
+
+        vectors = self._prepare(embeddings)
+        if len(keys) != len(vectors):
+            raise ValueError(f"Got {len(keys)} keys for {len(vectors)} embeddings")
+        if len(keys) == 0:
+            return
+
+        # the last embedding of a repeated key wins
+        last = {key: i for i, key in enumerate(keys)}
+        if len(last) < len(keys):
+            rows = sorted(last.values())
+            keys = [keys[i] for i in rows]
+            vectors = vectors[rows]
+
+        self.delete([key for key in keys if key in self.key_to_row])
+        self._reserve(len(vectors), vectors.shape[1])
+
+        start, end = self.size, self.size + len(vectors)
+        self.vectors[start:end] = vectors
+        self.alive[start:end] = True
+        for row, key in enumerate(keys, start):
+            self.keys.append(key)
+            self.key_to_row[key] = row
+        self.size = end
+
+        if self.centroids is not None:
+            self._assign(np.arange(start, end))
+        elif self.nlist > 0 and len(self) >= self.nlist * IVF_TRAIN_POINTS_PER_LIST:
+            self.train()
+
+
+    def delete(self, keys: List[str] = None, **kwargs: Any) -> bool:
+        """Tombstone the rows of keys, return False if any key was missing."""
+
+        if keys is None:
+            return False
+
+        found = True
+        for key in keys:
+            row = self.key_to_row.pop(key, None)
+            if row is None:
+                found = False
+                continue
+            self.alive[row] = False
+
+        if self.size > self.capacity and len(self) < self.size // 2:
+            self.compact()
+
+        return found
+
+
+    def compact(self) -> None:
+        """Drop tombstoned rows and rebuild the lists of the coarse index."""
+
+        if self.vectors is None:
+            return
+
+        rows = np.flatnonzero(self.alive[:self.size])
+        self.vectors = np.ascontiguousarray(self.vectors[rows])
+        self.keys = [self.keys[row] for row in rows]
+        self.key_to_row = {key: row for row, key in enumerate(self.keys)}
+        self.size = len(rows)
+        self.alive = np.ones(self.size, dtype=bool)
+        self.assignments = self.assignments[rows]
+        if self.centroids is not None:
+            self._build_lists()
+
+
+    def train(self, nlist: int = None) -> None:
+        """Cluster the stored vectors into the inverted lists of the coarse index."""
+
+        nlist = nlist or self.nlist
+        rows = np.flatnonzero(self.alive[:self.size])
+        if nlist <= 0 or len(rows) < nlist:
+            return
+
+        self.nlist = nlist
+        self.centroids = _kmeans(self.vectors[rows], nlist)
+        self.assignments[:self.size] = -1
+        self.assignments[rows] = _nearest_centroids(self.vectors[rows], self.centroids)
+        self._build_lists()
+        logger.write(f"Trained a coarse index of {nlist} lists over {len(rows)} vectors")
+
+
+    def _assign(self, rows: np.ndarray) -> None:
+        assignments = _nearest_centroids(self.vectors[rows], self.centroids)
+        self.assignments[rows] = assignments
+        for i in np.unique(assignments):
+            self.lists[i] = np.concatenate([self.lists[i], rows[assignments == i]])
+
+
+    def _build_lists(self) -> None:
+        order = np.argsort(self.assignments[:self.size], kind='stable')
+        bounds = np.searchsorted(self.assignments[:self.size][order], np.arange(self.nlist + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.nlist)]
+
+
+    def similarity_search(
+        self,
+        embedding: List[float],
+        top_k: int,
+        nprobe: int = None,
+        **kwargs: Any,
+    ) -> List[Tuple[str, float]]:
+        """Return the keys and scores of the top_k stored embeddings, best first."""
+
+        if len(self) == 0 or top_k <= 0:
+            return []
+
+        query = self._prepare([embedding])[0]
+
+        if self.centroids is not None:
+            nprobe = min(nprobe or self.nprobe, self.nlist)
+            probe = np.argsort(_centroid_distances(query[None], self.centroids)[0])[:nprobe]
+            rows = np.concatenate([self.lists[i] for i in probe])
+            rows = rows[self.alive[rows]]
+        else:
+            rows = None
+
+        if rows is None:
+            scores = self.vectors[:self.size] @ query
+            scores[~self.alive[:self.size]] = -np.inf
+            candidates = np.arange(self.size)
+        else:
+            scores = self.vectors[rows] @ query
+            candidates = rows
+
+        top_k = min(top_k, len(self), len(candidates))
+        if top_k == 0:
+            return []
+        if top_k < len(scores):
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind='stable')]
+
+        return [(self.keys[candidates[i]], float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+
+    def _files(self, name: str) -> Tuple[str, str]:
+        return os.path.join(self.path, f"{name}.vectors.npy"), os.path.join(self.path, f"{name}.meta.npz")
+
+
+    def save(self, name: str = "vectorstore") -> None:
+        """Save the vectors and keys to <path>/<name>.vectors.npy and <name>.meta.npz."""
+
+        self.compact()
+        vectors_file, meta_file = self._files(name)
+        os.makedirs(self.path, exist_ok=True)
+
+        np.save(vectors_file, self.vectors[:self.size] if self.vectors is not None else np.zeros((0, 0), dtype=np.float32))
+
+        meta = dict(
+            keys=np.array(self.keys, dtype=str),
+            config=np.array(json.dumps({"metric": self.metric, "nlist": self.nlist, "nprobe": self.nprobe})),
+        )
+        if self.centroids is not None:
+            meta.update(centroids=self.centroids, assignments=self.assignments[:self.size])
+        with open(meta_file, 'wb') as fd:
+            np.savez(fd, **meta)
+
+
+    @classmethod
+    def load(cls, path: str, name: str = "vectorstore", mmap: bool = False) -> "NumpyVectorStore":
+        """Load a store written by save. With mmap the vectors are mapped from disk, copy-on-write."""
+
+        store = cls(path=path)
+        vectors_file, meta_file = store._files(name)
+
+        with np.load(meta_file) as meta:
+            config = json.loads(str(meta["config"]))
+            store.metric, store.nlist, store.nprobe = config["metric"], config["nlist"], config["nprobe"]
+            store.keys = meta["keys"].tolist()
+            if "centroids" in meta:
+                store.centroids = meta["centroids"]
+                store.assignments = meta["assignments"].astype(np.int32)
+
+        vectors = np.load(vectors_file, mmap_mode='c' if mmap else None)
+        if vectors.size > 0:
+            store.vectors = vectors
+        store.size = len(store.keys)
+        store.alive = np.ones(store.size, dtype=bool)
+        store.key_to_row = {key: row for row, key in enumerate(store.keys)}
+        if store.centroids is not None:
+            store._build_lists()
+
+        logger.write(f"Loaded {store.size} vectors from {vectors_file}")
+        return store
+
@@ -1,6 +1,5 @@
 import os
 from typing import Dict, Any
-from copy import deepcopy
 
 from stardojo.config.config import Config
 # from stardojo.environment.software.skill_registry import SoftwareSkillRegistry
@@ -34,7 +33,7 @@ class Executor(BaseProvider):
                  **kwargs) -> Dict[str, Any]:
 
         # > Pre-processing
-        params = self.memory.working_area.copy()
+        params = self.memory.snapshot()
 
         skill_steps = params.get(constants.SKILL_STEPS, [])
         som_map = params.get(constants.SOM_MAP, {})
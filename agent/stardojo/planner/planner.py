@@ -38,7 +38,7 @@ async def gather_information_get_completion_parallel(llm_provider, text_input_ma
     text_input["image_introduction"] = image_introduction
     message_prompts = llm_provider.assemble_prompt(template_str=get_text_template, params=text_input)
 
-    logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+    logger.debug_prompt(message_prompts)
 
     success_flag = False
     while not success_flag:
@@ -87,7 +87,7 @@ def gather_information_get_completion_sequence(llm_provider, text_input_map, cur
 
     message_prompts = llm_provider.assemble_prompt(template_str=get_text_template, params=text_input)
 
-    logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+    logger.debug_prompt(message_prompts)
 
     response, info = llm_provider.create_completion(message_prompts)
 
@@ -294,7 +294,7 @@ class InformationGatheirng():
                 # Call the LLM provider for gather information json
                 message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-                logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+                logger.debug_prompt(message_prompts)
 
                 gather_information_success_flag = False
                 while gather_information_success_flag is False:
@@ -436,7 +436,7 @@ class ActionPlanning():
         try:
             message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-            logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+            logger.debug_prompt(message_prompts)
 
             # Call the LLM provider for decision making
             response, info = self.llm_provider.create_completion(message_prompts)
@@ -498,7 +498,7 @@ class SuccessDetection():
             # Call the LLM provider for success detection
             message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-            logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+            logger.debug_prompt(message_prompts)
 
             response, info = self.llm_provider.create_completion(message_prompts)
 
@@ -554,7 +554,7 @@ class SelfReflection():
             # Call the LLM provider for self reflection
             message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-            logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+            logger.debug_prompt(message_prompts)
 
             response, info = self.llm_provider.create_completion(message_prompts)
 
@@ -611,7 +611,7 @@ class TaskInference():
             # Call the LLM provider for information summary
             message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-            logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+            logger.debug_prompt(message_prompts)
 
             response, info = self.llm_provider.create_completion(message_prompts)
 
@@ -0,0 +1,74 @@
+import contextvars
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional
+
+from stardojo.log import Logger
+
+logger = Logger()
+
+
+class Stage(NamedTuple):
+    """One reasoning stage of a step.
+
+    call: the LLM round-trip, called as call(params=...) with the memory snapshot taken right
+        after preprocess. It may run on a worker thread, so it must not write to memory.
+    preprocess: prepares the inputs of the stage in memory, runs on the calling thread.
+    postprocess: takes the response of call and writes it to memory, runs on the calling thread.
+    """
+    call: Callable[..., Any]
+    preprocess: Optional[Callable[[], Any]] = None
+    postprocess: Optional[Callable[[Any], Any]] = None
+
+
+def run_stages(stages: Dict[str, Stage],
+               dependencies: Dict[str, List[str]],
+               snapshot: Callable[[], Mapping],
+               executor: Executor = None) -> Dict[str, Any]:
+    """
+    Run stages in dependency order and return the result of each postprocess by stage name.
+
+    A stage starts once every stage it depends on has been postprocessed; dependencies on
+    stages that are not in stages are ignored. Without an executor each call blocks, so the
+    stages run one after another in the order of stages. With an executor the calls of all
+    ready stages are in flight at the same time and a step takes about as long as its slowest
+    chain of calls. Memory is only written by pre- and postprocess, on the calling thread.
+    Calls run in a copy of the calling thread's context, so they see the same EnvContext.
+    """
+
+    remaining = {name: {d for d in dependencies.get(name, []) if d in stages and d != name} for name in stages}
+    running = {}
+    results = {}
+
+    def finish(name, response):
+        postprocess = stages[name].postprocess
+        results[name] = postprocess(response) if postprocess is not None else response
+        for waiting in remaining.values():
+            waiting.discard(name)
+
+    while remaining or running:
+        ready = [name for name, waiting in remaining.items() if not waiting]
+        for name in ready:
+            del remaining[name]
+            stage = stages[name]
+            if stage.preprocess is not None:
+                stage.preprocess()
+            params = snapshot()
+            if executor is None:
+                finish(name, stage.call(params=params))
+            else:
+                # worker threads do not inherit the EnvContext of the calling thread
+                context = contextvars.copy_context()
+                running[executor.submit(context.run, stage.call, params=params)] = name
+
+        if not running:
+            if remaining and not ready:
+                raise ValueError(f"Cyclic stage dependencies between {sorted(remaining)}")
+            continue
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            logger.debug(f"Stage {name} finished")
+            finish(name, future.result())
+
+    return results
@@ -9,6 +9,7 @@ from stardojo.log import Logger
 from stardojo.planner.base import BasePlanner
 from stardojo.utils.check import check_planner_params
 from stardojo.utils.file_utils import assemble_project_path, read_resource_file
+from stardojo.provider.base.prompt_template import PromptTemplate
 from stardojo.utils.json_utils import load_json, parse_semi_formatted_text, JsonFrameStructure
 from stardojo.utils.template_matching import match_templates_images, selection_box_identifier
 from stardojo import constants
@@ -37,7 +38,7 @@ async def gather_information_get_completion_parallel(llm_provider, text_input_ma
     text_input["image_introduction"] = image_introduction
     message_prompts = llm_provider.assemble_prompt(template_str=get_text_template, params=text_input)
 
-    logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+    logger.debug_prompt(message_prompts)
 
     success_flag = False
     while not success_flag:
@@ -86,7 +87,7 @@ def gather_information_get_completion_sequence(llm_provider, text_input_map, cur
 
     message_prompts = llm_provider.assemble_prompt(template_str=get_text_template, params=text_input)
 
-    logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+    logger.debug_prompt(message_prompts)
 
     response, info = llm_provider.create_completion(message_prompts)
 
@@ -549,7 +550,7 @@ class InformationGathering():
                 # Call the LLM provider for gather information json
                 message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-                logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+                logger.debug_prompt(message_prompts)
 
                 gather_information_success_flag = False
                 while gather_information_success_flag is False:
@@ -628,7 +629,7 @@ class ActionPlanning():
         try:
             message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-            logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+            logger.debug_prompt(message_prompts)
 
             # Call the LLM provider for decision making
             response, info = self.llm_provider.create_completion(message_prompts)
@@ -689,7 +690,7 @@ class SuccessDetection():
             # Call the LLM provider for success detection
             message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-            logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+            logger.debug_prompt(message_prompts)
 
             response, info = self.llm_provider.create_completion(message_prompts)
 
@@ -745,7 +746,7 @@ class SelfReflection():
             # Call the LLM provider for self reflection
             message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-            logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+            logger.debug_prompt(message_prompts)
 
             response, info = self.llm_provider.create_completion(message_prompts)
 
@@ -803,7 +804,7 @@ class TaskInference():
             # Call the LLM provider for information summary
             message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=input)
 
-            logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+            logger.debug_prompt(message_prompts)
 
             response, info = self.llm_provider.create_completion(message_prompts)
 
@@ -933,7 +934,8 @@ class StardewPlanner(BasePlanner):
         for key, value in template_paths.items():
             path = assemble_project_path(value)
             if path.endswith(PROMPT_EXT):
-                templates[key] = read_resource_file(path)
+                # parsed once here, every LLM call only fills the placeholders
+                templates[key] = PromptTemplate(read_resource_file(path))
             else:
                 templates[key] = load_json(path)
 
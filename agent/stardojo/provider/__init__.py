@@ -1,6 +1,7 @@
 from .base import BaseProvider
 from .base.base_provider import BaseModuleProvider
 from .base.base_embedding import EmbeddingProvider
+from .base.embedding_cache import CachedEmbeddingProvider
 from .base.base_llm import LLMProvider
 
 from .llm.openai import OpenAIProvider
@@ -66,6 +67,7 @@ __all__ = [
     # LLM providers
     "LLMProvider",
     "EmbeddingProvider",
+    "CachedEmbeddingProvider",
     "OpenAIProvider",
     "ClaudeProvider",
     "RestfulClaudeProvider",
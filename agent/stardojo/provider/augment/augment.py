@@ -1,5 +1,4 @@
 from typing import Dict, Any
-from copy import deepcopy
 import os
 from PIL import Image
 
@@ -62,7 +61,7 @@ class AugmentProvider(BaseProvider):
 
         logger.write(f"Draw axis on the screen shot.")
 
-        params = deepcopy(memory.working_area)
+        params = memory.snapshot()
 
         screenshot_path = params.get(constants.IMAGES_MEM_BUCKET, None)
         augmented_screenshot_path = screenshot_path.replace(".jpg", "_augmented.jpg")
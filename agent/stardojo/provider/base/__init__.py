@@ -1,4 +1,5 @@
 from .base_provider import BaseProvider
 from .base_provider import BaseModuleProvider
 from .base_embedding import EmbeddingProvider
+from .embedding_cache import CachedEmbeddingProvider
 from .base_llm import LLMProvider
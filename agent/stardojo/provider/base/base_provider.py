@@ -12,6 +12,9 @@ logger = Logger()
 
 class BaseProvider(metaclass=Singleton):
 
+    # providers hold the planner, game manager and memory of their environment
+    context_local = True
+
     def __init__(self, *args, **kwargs):
         pass
 
@@ -51,7 +54,7 @@ class BaseProvider(metaclass=Singleton):
             original_debug = logger.debug
 
             def new_debug(message):
-                if self.__class__.__name__ in message:
+                if not isinstance(message, str) or self.__class__.__name__ in message:
                     full_message = message
                 else:
                     full_message = f"# {self.__class__.__name__} # {message}"
@@ -0,0 +1,185 @@
+"""Caching and batching wrapper for embedding providers."""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import (
+    Dict,
+    List,
+    Optional,
+)
+
+import numpy as np
+
+from stardojo.log import Logger
+from stardojo.provider.base.base_embedding import EmbeddingProvider
+
+logger = Logger()
+
+SQLITE_MAX_VARIABLES = 900
+
+
+class EmbeddingBatcher():
+    """
+    Coalesces concurrent single-text requests into one embed_documents call.
+
+    The first caller of a batch waits max_wait seconds for others to join, then embeds
+    everything queued so far; the rest only wait for their result. A caller on its own
+    pays max_wait once, so only route cache misses through the batcher.
+    """
+
+    def __init__(self, embed_documents, max_wait: float = 0.005):
+        self.embed_documents = embed_documents
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.pending = []
+
+
+    def submit(self, text: str) -> List[float]:
+        future = Future()
+        with self.lock:
+            self.pending.append((text, future))
+            leader = len(self.pending) == 1
+
+        if leader:
+            time.sleep(self.max_wait)
+            with self.lock:
+                batch, self.pending = self.pending, []
+            try:
+                embeddings = self.embed_documents([text for text, _ in batch])
+                for (_, waiting), embedding in zip(batch, embeddings):
+                    waiting.set_result(embedding)
+            except Exception as e:
+                for _, waiting in batch:
+                    waiting.set_exception(e)
+
+        return future.result()
+
+
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """
+    Wraps any EmbeddingProvider with an in-memory LRU in front of an SQLite store keyed by
+    the hash of model name and text, so a text is embedded once across skills, memories,
+    tasks and runs. Cache misses of embed_documents go to the wrapped provider in a single
+    call, concurrent embed_query misses are coalesced by an EmbeddingBatcher.
+
+    Attributes the wrapper does not define are read from the wrapped provider.
+    """
+
+    def __init__(self,
+                 provider: EmbeddingProvider,
+                 cache_path: Optional[str] = None,
+                 max_memory_items: int = 4096,
+                 max_wait: float = 0.005):
+
+        self.provider = provider
+        self.max_memory_items = max_memory_items
+        self.memory_cache: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.batcher = EmbeddingBatcher(self.embed_documents, max_wait=max_wait)
+
+        self.db = None
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            # shared by the processes of parallel runs, so wait for their writes instead of failing
+            self.db = sqlite3.connect(cache_path, check_same_thread=False, timeout=30)
+            self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB)")
+            self.db.commit()
+
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the wrapper
+        provider = self.__dict__.get('provider')
+        if provider is None:
+            raise AttributeError(name)
+        return getattr(provider, name)
+
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.provider, "embedding_model", "") or type(self.provider).__name__
+
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+
+    def _remember(self, key: str, embedding: List[float]) -> None:
+        self.memory_cache[key] = embedding
+        self.memory_cache.move_to_end(key)
+        if len(self.memory_cache) > self.max_memory_items:
+            self.memory_cache.popitem(last=False)
+
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.memory_cache:
+                    self.memory_cache.move_to_end(key)
+                    found[key] = self.memory_cache[key]
+
+            missing = [key for key in keys if key not in found]
+            if self.db is not None and missing:
+                for i in range(0, len(missing), SQLITE_MAX_VARIABLES):
+                    chunk = missing[i:i + SQLITE_MAX_VARIABLES]
+                    rows = self.db.execute(
+                        f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float64).tolist()
+                        self._remember(key, found[key])
+        return found
+
+
+    def _store(self, embeddings: Dict[str, List[float]]) -> None:
+        with self.lock:
+            for key, embedding in embeddings.items():
+                self._remember(key, embedding)
+            if self.db is not None:
+                try:
+                    self.db.executemany("INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)",
+                                        [(key, np.asarray(embedding, dtype=np.float64).tobytes())
+                                         for key, embedding in embeddings.items()])
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logger.warn(f"Could not write embeddings to the cache: {e}")
+
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            logger.debug(f"Embedding {len(missing)} of {len(texts)} texts, the rest is cached")
+            embeddings = self.provider.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), embeddings))
+            self._store(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        found = self._lookup([key])
+        if key in found:
+            return found[key]
+        return self.batcher.submit(text)
+
+
+    def get_embedding_dim(self) -> int:
+        return self.provider.get_embedding_dim()
+
+
+    def init_provider(self, provider_cfg) -> None:
+        self.provider.init_provider(provider_cfg)
+
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,100 @@
+"""Prompt templates parsed once and filled per call."""
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from stardojo import constants
+
+PARAGRAPH_PATTERN = re.compile(r"(.+?)(?=\n\n|$)", re.DOTALL)
+PLACEHOLDER_PATTERN = re.compile(r"<\$[^\$]+\$>")
+
+
+class Paragraph(NamedTuple):
+    """A template paragraph: plain text, or the text split around its (first) placeholder."""
+    segments: Tuple[str, ...]
+    name: Optional[str] = None
+
+
+def format_placeholder_value(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    if isinstance(value, (bool, int, float)):
+        return str(value)
+    raise ValueError(f"Unexpected input type: {type(value)}")
+
+
+class PromptTemplate:
+    """
+    A tripartite prompt template, split into paragraphs once:
+    <system message>
+
+    <user message part 1 before image introduction>
+    <image introduction>
+    <user message part 2 after image introduction>
+
+    Providers only fill placeholders and wrap the parts in their own message format.
+    """
+
+    def __init__(self, template_str: str):
+        self.template_str = template_str
+
+        paragraphs = [p for p in PARAGRAPH_PATTERN.findall(template_str) if p.strip() != '']
+
+        self.system_content = paragraphs[0]  # the system content defaults to the first paragraph of the template
+
+        image_index = None
+        for i, paragraph in enumerate(paragraphs):
+            if constants.IMAGES_INPUT_TAG in paragraph:
+                image_index = i
+                break
+
+        self.image_introduction = paragraphs[image_index] if image_index is not None else None
+        self.part1 = tuple(self._compile_paragraph(p) for p in paragraphs[1:image_index])
+        self.part2 = tuple(self._compile_paragraph(p) for p in paragraphs[image_index + 1:]) if image_index is not None else ()
+
+    def __str__(self):
+        return self.template_str
+
+    @staticmethod
+    def _compile_paragraph(paragraph: str) -> Paragraph:
+        placeholder = PLACEHOLDER_PATTERN.search(paragraph)
+        if not placeholder:
+            return Paragraph((paragraph,))
+        placeholder = placeholder.group()
+        return Paragraph(tuple(paragraph.split(placeholder)), placeholder[2:-2])
+
+    @staticmethod
+    def fill(paragraphs: Tuple[Paragraph, ...], params: Dict[str, Any]) -> List[str]:
+        """Fill the paragraphs of one part, dropping those whose input is missing or empty."""
+        contents = []
+        for paragraph in paragraphs:
+            if paragraph.name is None:
+                contents.append(paragraph.segments[0])
+                continue
+
+            value = params.get(paragraph.name, None)
+            if value is None or value == "" or value == []:
+                continue
+            contents.append(format_placeholder_value(value).join(paragraph.segments))
+        return contents
+
+    def fill_part1(self, params: Dict[str, Any]) -> str:
+        return "\n\n".join(self.fill(self.part1, params))
+
+    def fill_part2(self, params: Dict[str, Any]) -> str:
+        return "\n\n".join(self.fill(self.part2, params))
+
+
+@lru_cache(maxsize=64)
+def _compile_template_str(template_str: str) -> PromptTemplate:
+    return PromptTemplate(template_str)
+
+
+def compile_template(template: Any) -> PromptTemplate:
+    """Accept a compiled template or a raw template string (compiled once and cached)."""
+    if isinstance(template, PromptTemplate):
+        return template
+    return _compile_template_str(template)
@@ -1,6 +1,5 @@
 import os
 from typing import Dict, Any
-from copy import deepcopy
 
 from stardojo.config.config import Config
 from stardojo.provider import BaseProvider
@@ -32,7 +31,7 @@ class SkillExecuteProvider(BaseProvider):
                  *args,
                  **kwargs) -> Dict[str, Any]:
 
-        params = deepcopy(self.memory.working_area)
+        params = self.memory.snapshot()
 
         skill_steps = params.get("skill_steps", [])
         pre_screen_classification = params.get("pre_screen_classification", "")
@@ -1,7 +1,12 @@
 from stardojo.provider.llm.openai import OpenAIProvider
 from stardojo.provider.llm.claude import ClaudeProvider
 from stardojo.provider.llm.gemini import GeminiProvider
+from stardojo.provider.base.embedding_cache import CachedEmbeddingProvider
+from stardojo.config import Config
 from stardojo.utils import Singleton
+from stardojo.utils.file_utils import assemble_project_path
+
+config = Config()
 
 
 class LLMFactory(metaclass=Singleton):
@@ -44,4 +49,7 @@ class LLMFactory(metaclass=Singleton):
         if not llm_provider or not embed_provider:
             raise ValueError(key)
 
+        cache_path = assemble_project_path(config.embedding_cache_path) if config.embedding_cache_path else None
+        embed_provider = CachedEmbeddingProvider(embed_provider, cache_path=cache_path)
+
         return llm_provider, embed_provider
@@ -21,6 +21,7 @@ from openai import OpenAI, AzureOpenAI, APIError, RateLimitError, APITimeoutErro
 
 from stardojo import constants
 from stardojo.provider.base import LLMProvider, EmbeddingProvider
+from stardojo.provider.base.prompt_template import PromptTemplate, compile_template
 from stardojo.config import Config
 from stardojo.log import Logger
 from stardojo.utils.json_utils import load_json
@@ -505,7 +506,7 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
         return self.provider_cfg[PROVIDER_SETTING_DEPLOYMENT_MAP][model_label]
 
 
-    def assemble_prompt_tripartite(self, template_str: str = None, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    def assemble_prompt_tripartite(self, template_str: str | PromptTemplate = None, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
 
         """
         A tripartite prompt is a message with the following structure:
@@ -514,97 +515,38 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
         <user message part 1 before image introduction>
         <image introduction>
         <user message part 2 after image introduction>
-        """
-        pattern = re.compile(r"(.+?)(?=\n\n|$)", re.DOTALL)
-
-        paragraphs = re.findall(pattern, template_str)
 
-        filtered_paragraphs = [p for p in paragraphs if p.strip() != '']
+        The template is parsed once (see PromptTemplate), here its placeholders are only filled.
+        """
+        template = compile_template(template_str)
 
-        system_content = filtered_paragraphs[0]  # the system content defaults to the first paragraph of the template
         system_message = {
             "role": "system",
             "content": [
                 {
                     "type": "text",
-                    "text": f"{system_content}"
+                    "text": f"{template.system_content}"
                 }
             ]
         }
 
-        # segmenting "paragraphs"
-        image_introduction_paragraph_index = None
-        image_introduction_paragraph = None
-        for i, paragraph in enumerate(filtered_paragraphs):
-            if constants.IMAGES_INPUT_TAG in paragraph:
-                image_introduction_paragraph_index = i
-                image_introduction_paragraph = paragraph
-                break
-
-        user_messages_part1_paragraphs = filtered_paragraphs[1:image_introduction_paragraph_index]
-        user_messages_part2_paragraphs = filtered_paragraphs[image_introduction_paragraph_index + 1:]
-
         combined_user_message = {
             "role": "user",
             "content": [
             ]
         }
         # assemble user messages part 1
-        user_messages_part1_contents = []
-        for paragraph in user_messages_part1_paragraphs:
-            search_placeholder_pattern = re.compile(r"<\$[^\$]+\$>")
-
-            placeholder = re.search(search_placeholder_pattern, paragraph)
-            if not placeholder:
-                user_messages_part1_contents.append(paragraph)
-            else:
-                placeholder = placeholder.group()
-                placeholder_name = placeholder.replace("<$", "").replace("$>", "")
-
-                paragraph_input = params.get(placeholder_name, None)
-                if paragraph_input is None or paragraph_input == "" or paragraph_input == []:
-                    continue
-                else:
-                    if isinstance(paragraph_input, str):
-                        paragraph_content = paragraph.replace(placeholder, paragraph_input)
-                        user_messages_part1_contents.append(paragraph_content)
-                    elif isinstance(paragraph_input, list) or isinstance(paragraph_input, dict):
-                        paragraph_content = paragraph.replace(placeholder, json.dumps(paragraph_input))
-                        user_messages_part1_contents.append(paragraph_content)
-                    else:
-                        raise ValueError(f"Unexpected input type: {type(paragraph_input)}")
-
-        if len(user_messages_part1_contents) > 0:
-
-            user_messages_part1_content = "\n\n".join(user_messages_part1_contents)
-
-            # user_messages_part1 = {
-            #     "role": "user",
-            #     "content": [
-            #         {
-            #             "type": "text",
-            #             "text": f"{user_messages_part1_content}"
-            #         }
-            #     ]
-            # }
-            
+        user_messages_part1_content = template.fill_part1(params)
+        if user_messages_part1_content:
             combined_user_message["content"].append({
                         "type": "text",
                         "text": f"{user_messages_part1_content}"
                     })
 
-        else:
-            user_messages_part1 = None
-
         # assemble image introduction messages
-        image_introduction_messages = []
-
         paragraph_input = params.get(constants.IMAGES_INPUT_TAG_NAME, []) # 'image_introduction'
 
-        if paragraph_input is None or paragraph_input == "" or paragraph_input == []:
-            image_introduction_messages = []
-        else:
-            # paragraph_content_pre = image_introduction_paragraph.replace(constants.IMAGES_INPUT_TAG, "")
+        if paragraph_input is not None and paragraph_input != "" and paragraph_input != []:
             paths = params["image_paths"] if "image_paths" in params else []
             print("--------------------------------")
             print(f"imagepaths: {paths}")
@@ -612,7 +554,7 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
             encoded_images = []
             for i, path in enumerate(paths):
                 if path is not None and path != "":
-                    encoded_images.append(encode_data_to_base64_path(path)[0] if isinstance(encode_data_to_base64_path(path), list) else encode_data_to_base64_path(path))
+                    encoded_images.append(encode_data_to_base64_path(path)[0])
 
             for i, encoded_image in enumerate(reversed(encoded_images)):
                 msg_text = "This is a screenshot of the current step of the game." if i == 0 else f"This is the game screenshot from {i} steps ago"
@@ -629,56 +571,12 @@ class OpenAIProvider(LLMProvider, EmbeddingProvider):
                 }
                 combined_user_message["content"].append(msg_content)
 
-
         # assemble user messages part 2
-        user_messages_part2_contents = []
-        for paragraph in user_messages_part2_paragraphs:
-            search_placeholder_pattern = re.compile(r"<\$[^\$]+\$>")
-
-            placeholder = re.search(search_placeholder_pattern, paragraph)
-            if not placeholder:
-                user_messages_part2_contents.append(paragraph)
-            else:
-                placeholder = placeholder.group()
-                placeholder_name = placeholder.replace("<$", "").replace("$>", "")
-
-                paragraph_input = params.get(placeholder_name, None)
-                if paragraph_input is None or paragraph_input == "" or paragraph_input == []:
-                    continue
-                else:
-                    if isinstance(paragraph_input, str):
-                        paragraph_content = paragraph.replace(placeholder, paragraph_input)
-                        user_messages_part2_contents.append(paragraph_content)
-                    elif isinstance(paragraph_input, bool) or isinstance(paragraph_input, int) or isinstance(paragraph_input, float):
-                        paragraph_content = paragraph.replace(placeholder, str(paragraph_input))
-                        user_messages_part2_contents.append(paragraph_content)
-                    elif isinstance(paragraph_input, list):
-                        paragraph_content = paragraph.replace(placeholder, json.dumps(paragraph_input))
-                        user_messages_part2_contents.append(paragraph_content)
-                    else:
-                        raise ValueError(f"Unexpected input type: {type(paragraph_input)}")
-
-        user_messages_part2_content = "\n\n".join(user_messages_part2_contents)
-        user_messages_part2 = {
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": f"{user_messages_part2_content}"
-                }
-            ]
-        }
-        
         combined_user_message["content"].append({
             "type": "text",
-            "text": f"{user_messages_part2_content}"
+            "text": f"{template.fill_part2(params)}"
         })
 
-        # if user_messages_part1 is None:
-        #     return [system_message] + image_introduction_messages + [combined_user_message]
-        # else:
-        #     return [system_message] + [user_messages_part1] + image_introduction_messages + [user_messages_part2]
-        
         return [system_message] + [combined_user_message]
 
 
@@ -23,6 +23,7 @@ from PIL import Image
 
 from stardojo import constants
 from stardojo.provider.base import LLMProvider
+from stardojo.provider.base.prompt_template import PromptTemplate, compile_template
 from stardojo.config import Config
 from stardojo.log import Logger
 from stardojo.utils.json_utils import load_json
@@ -317,7 +318,7 @@ class RestfulClaudeProvider(LLMProvider):
         return num_tokens
 
 
-    def assemble_prompt_tripartite(self, template_str: str = None, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    def assemble_prompt_tripartite(self, template_str: str | PromptTemplate = None, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
 
         """
         A tripartite prompt is a message with the following structure:
@@ -325,68 +326,28 @@ class RestfulClaudeProvider(LLMProvider):
         <user message part 1 before image introduction>
         <image introduction>
         <user message part 2 after image introduction>
-        """
-        pattern = re.compile(r"(.+?)(?=\n\n|$)", re.DOTALL)
-
-        paragraphs = re.findall(pattern, template_str)
 
-        filtered_paragraphs = [p for p in paragraphs if p.strip() != '']
+        The template is parsed once (see PromptTemplate), here its placeholders are only filled.
+        """
+        template = compile_template(template_str)
 
-        system_content = filtered_paragraphs[0]  # the system content defaults to the first paragraph of the template
         system_message = {
             "role": "system",
             "content": [
                 {
                     "type": "text",
-                    "text": f"{system_content}"
+                    "text": f"{template.system_content}"
                 }
             ]
         }
 
-        # segmenting "paragraphs"
-        image_introduction_paragraph_index = None
-        image_introduction_paragraph = None
-        for i, paragraph in enumerate(filtered_paragraphs):
-            if constants.IMAGES_INPUT_TAG in paragraph:
-                image_introduction_paragraph_index = i
-                image_introduction_paragraph = paragraph
-                break
-
-        user_messages_part1_paragraphs = filtered_paragraphs[1:image_introduction_paragraph_index]
-        user_messages_part2_paragraphs = filtered_paragraphs[image_introduction_paragraph_index + 1:]
-
         # assemble user messages part 1
-        user_messages_part1_contents = []
-        for paragraph in user_messages_part1_paragraphs:
-            search_placeholder_pattern = re.compile(r"<\$[^\$]+\$>")
-
-            placeholder = re.search(search_placeholder_pattern, paragraph)
-            if not placeholder:
-                user_messages_part1_contents.append(paragraph)
-            else:
-                placeholder = placeholder.group()
-                placeholder_name = placeholder.replace("<$", "").replace("$>", "")
-
-                paragraph_input = params.get(placeholder_name, None)
-                if paragraph_input is None or paragraph_input == "" or paragraph_input == []:
-                    continue
-                else:
-                    if isinstance(paragraph_input, str):
-                        paragraph_content = paragraph.replace(placeholder, paragraph_input)
-                        user_messages_part1_contents.append(paragraph_content)
-                    elif isinstance(paragraph_input, list):
-                        paragraph_content = paragraph.replace(placeholder, json.dumps(paragraph_input))
-                        user_messages_part1_contents.append(paragraph_content)
-                    else:
-                        raise ValueError(f"Unexpected input type: {type(paragraph_input)}")
-
-        user_messages_part1_content = "\n\n".join(user_messages_part1_contents)
         user_messages_part1 = {
             "role": "user",
             "content": [
                 {
                     "type": "text",
-                    "text": f"{user_messages_part1_content}"
+                    "text": f"{template.fill_part1(params)}"
                 }
             ]
         }
@@ -398,7 +359,7 @@ class RestfulClaudeProvider(LLMProvider):
         if paragraph_input is None or paragraph_input == "" or paragraph_input == []:
             image_introduction_messages = []
         else:
-            paragraph_content_pre = image_introduction_paragraph.replace(constants.IMAGES_INPUT_TAG, "")
+            paragraph_content_pre = template.image_introduction.replace(constants.IMAGES_INPUT_TAG, "")
             message = {
                 "role": "user",
                 "content": [
@@ -460,37 +421,12 @@ class RestfulClaudeProvider(LLMProvider):
                     image_introduction_messages.append(message)
 
         # assemble user messages part 2
-        user_messages_part2_contents = []
-        for paragraph in user_messages_part2_paragraphs:
-            search_placeholder_pattern = re.compile(r"<\$[^\$]+\$>")
-
-            placeholder = re.search(search_placeholder_pattern, paragraph)
-            if not placeholder:
-                user_messages_part2_contents.append(paragraph)
-            else:
-                placeholder = placeholder.group()
-                placeholder_name = placeholder.replace("<$", "").replace("$>", "")
-
-                paragraph_input = params.get(placeholder_name, None)
-                if paragraph_input is None or paragraph_input == "" or paragraph_input == []:
-                    continue
-                else:
-                    if isinstance(paragraph_input, str):
-                        paragraph_content = paragraph.replace(placeholder, paragraph_input)
-                        user_messages_part2_contents.append(paragraph_content)
-                    elif isinstance(paragraph_input, list):
-                        paragraph_content = paragraph.replace(placeholder, json.dumps(paragraph_input))
-                        user_messages_part2_contents.append(paragraph_content)
-                    else:
-                        raise ValueError(f"Unexpected input type: {type(paragraph_input)}")
-
-        user_messages_part2_content = "\n\n".join(user_messages_part2_contents)
         user_messages_part2 = {
             "role": "user",
             "content": [
                 {
                     "type": "text",
-                    "text": f"{user_messages_part2_content}"
+                    "text": f"{template.fill_part2(params)}"
                 }
             ]
         }
@@ -1,7 +1,6 @@
 import os
 from typing import Dict, Any
 import json
-from copy import deepcopy
 
 from stardojo.utils.json_utils import parse_semi_formatted_text
 from stardojo.provider import BaseModuleProvider, BaseProvider
@@ -39,12 +38,12 @@ class ActionPlanningProvider(BaseModuleProvider):
                  use_screenshot_augmented = False,
                  **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot())
 
         self._check_input_keys(params)
 
         message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=params)
-        logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+        logger.debug_prompt(message_prompts)
 
         response = {}
         try:
@@ -81,7 +80,7 @@ class RDR2ActionPlanningProvider(BaseProvider):
 
     def __call__(self, *args, **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot())
 
         data = self.planner.action_planning(input=params)
 
@@ -109,7 +108,7 @@ class StardewActionPlanningProvider(BaseProvider):
 
     def __call__(self, *args, **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot())
 
         data = self.planner.action_planning(input=params)
 
@@ -1,6 +1,5 @@
 import json
 from typing import Any, Dict, List
-from copy import deepcopy
 
 from stardojo.provider import BaseModuleProvider, BaseProvider
 from stardojo.log import Logger
@@ -39,12 +38,12 @@ class InformationGatheringProvider(BaseModuleProvider):
                  *args,
                  **kwargs):
 
-        params = deepcopy(memory.working_area)
+        params = dict(memory.snapshot())
 
         self._check_input_keys(params)
 
         message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=params)
-        logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+        logger.debug_prompt(message_prompts)
 
         response = {}
         try:
@@ -75,7 +74,7 @@ class RDR2InformationGatheringProvider(BaseProvider):
 
     def __call__(self, *args, **kwargs):
 
-        params = deepcopy(memory.working_area)
+        params = memory.copy_working_area()
 
         data = self.planner.information_gathering(input=params)
 
@@ -97,7 +96,7 @@ class StardewInformationGatheringProvider(BaseProvider):
 
     def __call__(self, *args, **kwargs):
 
-        params = deepcopy(memory.working_area)
+        params = memory.copy_working_area()
 
         data = self.planner.information_gathering(input=params)
 
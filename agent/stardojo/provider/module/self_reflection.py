@@ -1,6 +1,5 @@
 from typing import List, Dict, Any
 import json
-from copy import deepcopy
 
 from stardojo.provider import BaseModuleProvider, BaseProvider
 from stardojo.utils.json_utils import parse_semi_formatted_text
@@ -36,12 +35,12 @@ class SelfReflectionProvider(BaseModuleProvider):
                  *args,
                  **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot())
 
         self._check_input_keys(params)
 
         message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=params)
-        logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+        logger.debug_prompt(message_prompts)
 
         response = {}
         try:
@@ -75,7 +74,7 @@ class RDR2SelfReflectionProvider(BaseProvider):
 
     def __call__(self, *args, **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot())
 
         data = self.planner.self_reflection(input=params)
 
@@ -101,9 +100,9 @@ class StardewSelfReflectionProvider(BaseProvider):
         self.memory = LocalMemory()
 
 
-    def __call__(self, *args, **kwargs):
+    def __call__(self, *args, params: Dict[str, Any] = None, **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot() if params is None else params)
 
         data = self.planner.self_reflection(input=params)
 
@@ -1,4 +1,3 @@
-from copy import deepcopy
 import os
 
 from stardojo.provider import BaseProvider
@@ -36,7 +35,7 @@ class SkillCurationProvider(BaseProvider):
                  *args,
                  **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot())
 
         last_task_guidance = params.get('last_task_guidance', '')
         long_horizon = params.get('long_horizon', False)
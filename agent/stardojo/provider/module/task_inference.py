@@ -1,6 +1,5 @@
-from typing import Any
+from typing import Dict, Any
 import json
-from copy import deepcopy
 
 from stardojo.provider import BaseModuleProvider, BaseProvider
 from stardojo.log import Logger
@@ -38,12 +37,12 @@ class TaskInferenceProvider(BaseModuleProvider):
                  used_video = False,
                  **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot())
 
         self._check_input_keys(params)
 
         message_prompts = self.llm_provider.assemble_prompt(template_str=self.template, params=params)
-        logger.debug(f'{logger.UPSTREAM_MASK}{json.dumps(message_prompts, ensure_ascii=False)}\n')
+        logger.debug_prompt(message_prompts)
 
         response = {}
         try:
@@ -80,7 +79,7 @@ class RDR2TaskInferenceProvider(BaseProvider):
 
     def __call__(self, *args, **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot())
 
         data = self.planner.task_inference(input=params)
 
@@ -106,9 +105,9 @@ class StardewTaskInferenceProvider(BaseProvider):
         self.memory = LocalMemory(memory_path=config.work_dir, max_recent_steps=config.max_recent_steps)
 
 
-    def __call__(self, *args, **kwargs):
+    def __call__(self, *args, params: Dict[str, Any] = None, **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot() if params is None else params)
 
         data = self.planner.task_inference(input=params)
 
@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 from stardojo.provider import BaseProvider
 from stardojo import constants
 from stardojo.log import Logger
@@ -27,7 +25,7 @@ class GdProvider(BaseProvider):
                  *args,
                  **kwargs):
 
-        params = deepcopy(memory.working_area)
+        params = memory.snapshot()
 
         screenshot_path = memory.get_recent_history("screenshot_path")[-1]
 
@@ -35,7 +33,7 @@ class GdProvider(BaseProvider):
             if constants.NONE_TARGET_OBJECT_OUTPUT not in params[
             constants.TARGET_OBJECT_NAME].lower() else ""
 
-        memory.working_area.update({
+        memory.update_working_area({
             "target_object_name": target_object_name,
         })
 
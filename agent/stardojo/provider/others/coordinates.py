@@ -1,5 +1,4 @@
 from typing import Dict, Any
-from copy import deepcopy
 
 from stardojo.provider import BaseProvider
 from stardojo.utils.check import is_valid_value
@@ -134,7 +133,7 @@ class CoordinatesProvider(BaseProvider):
                  init = False,
                  **kwargs):
 
-        params = deepcopy(self.memory.working_area)
+        params = dict(self.memory.snapshot())
         params.update(self._preprocess(params, gm = self.gm, init = init,  **kwargs))
         res_params = self._postprocess(params, **kwargs)
         self.memory.update_info_history(res_params)
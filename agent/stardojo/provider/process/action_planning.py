@@ -54,7 +54,7 @@ class ActionPlanningPreprocessProvider(BaseProvider):
             "image_introduction": image_introduction
         }
 
-        memory.working_area.update(processed_params)
+        memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -162,7 +162,7 @@ class RDR2ActionPlanningPreprocessProvider(BaseProvider):
             "image_introduction": image_introduction
         }
 
-        memory.working_area.update(processed_params)
+        memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -240,7 +240,7 @@ class StardewActionPlanningPreprocessProvider(BaseProvider):
             "image_introduction": image_introduction
         }
 
-        memory.working_area.update(processed_params)
+        memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -71,7 +71,7 @@ class InformationGatheringPreprocessProvider(BaseProvider):
             task_description = self.task_guidance.get_task_guidance(use_last=False)
             processed_params["task_description"] = task_description
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -187,7 +187,7 @@ class RDR2InformationGatheringPreprocessProvider(BaseProvider):
             "gather_information_configurations": gather_information_configurations
         }
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -267,7 +267,7 @@ class StardewInformationGatheringPreprocessProvider(BaseProvider):
             "gather_information_configurations": gather_information_configurations
         }
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
         return processed_params
 
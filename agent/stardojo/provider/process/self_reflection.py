@@ -116,7 +116,7 @@ class SelfReflectionPreprocessProvider(BaseProvider):
                 "action_code": action_code
             }
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -201,7 +201,7 @@ class RDR2SelfReflectionPreprocessProvider(BaseProvider):
                 "executing_action_error": executing_action_error
             })
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -332,7 +332,7 @@ class StardewSelfReflectionPreprocessProvider(BaseProvider):
             "previous_reasoning": pre_decision_making_reasoning,
         })
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
         return processed_params
 
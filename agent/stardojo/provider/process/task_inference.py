@@ -68,7 +68,7 @@ class TaskInferencePreprocessProvider(BaseProvider):
                 "event_count": config.event_count
             }
 
-        memory.working_area.update(processed_params)
+        memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -147,7 +147,7 @@ class RDR2TaskInferencePreprocessProvider(BaseProvider):
                 "event_count": event_count
             })
 
-        memory.working_area.update(processed_params)
+        memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -226,7 +226,7 @@ class StardewTaskInferencePreprocessProvider(BaseProvider):
             "previous_action": pre_action
         }
 
-        memory.working_area.update(processed_params)
+        memory.update_working_area(processed_params)
 
         return processed_params
 
@@ -226,11 +226,11 @@ class PipelineRunner():
             "gather_information_configurations": gather_information_configurations
         }
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
 
         # 2. Call llm api for information gathering
-        params = deepcopy(self.memory.working_area)
+        params = self.memory.copy_working_area()
         data = self.planner.information_gathering(input=params)
         response = data['res_dict']
         del params
@@ -372,10 +372,10 @@ class PipelineRunner():
                 "previous_reasoning": pre_decision_making_reasoning,
             })
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
         # 2. Call llm api for self reflection
-        params = deepcopy(self.memory.working_area)
+        params = self.memory.snapshot()
         data = self.planner.self_reflection(input=params)
         response = data['res_dict']
         del params
@@ -435,10 +435,10 @@ class PipelineRunner():
             "self_reflection_reasoning": self_reflection_reasoning,
         }
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
         # 2. Call llm api for task inference
-        params = deepcopy(self.memory.working_area)
+        params = self.memory.snapshot()
         data = self.planner.task_inference(input=params)
         response = data['res_dict']
         del params
@@ -528,10 +528,10 @@ class PipelineRunner():
             "image_introduction": image_introduction
         }
 
-        self.memory.working_area.update(processed_params)
+        self.memory.update_working_area(processed_params)
 
         # 2. Call llm api for action planning
-        params = deepcopy(self.memory.working_area)
+        params = self.memory.snapshot()
         data = self.planner.action_planning(input=params)
         response = data['res_dict']
         del params
@@ -571,7 +571,7 @@ class PipelineRunner():
         self.memory.update_info_history(processed_response)
 
         # 4. Execute the actions
-        params = deepcopy(self.memory.working_area)
+        params = self.memory.snapshot()
 
         skill_steps = params.get("skill_steps", [])
         # pre_screen_classification = params.get("pre_screen_classification", "")
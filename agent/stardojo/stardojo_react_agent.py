@@ -1,5 +1,6 @@
 import os
 import atexit
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 from copy import deepcopy
 
@@ -16,6 +17,7 @@ from stardojo.environment.ui_control_factory import UIControlFactory
 from stardojo.gameio.io_env import IOEnvironment
 from stardojo.gameio.game_manager import GameManager
 from stardojo.planner.stardew_planner import StardewPlanner
+from stardojo.planner.stage_graph import Stage, run_stages
 from log_processor import process_log_messages
 from env.stardew_env import *
 import logging
@@ -150,6 +152,10 @@ class PipelineRunner():
         self.task_inference = StardewTaskInferenceProvider(planner=self.planner, gm=self.gm)
         self.task_inference_postprocess = StardewTaskInferencePostprocessProvider(gm=self.gm)
 
+        # Stages whose dependencies are done call the LLM concurrently when the pipeline is async
+        self.stage_dependencies = config.pipeline_stages
+        self.stage_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="stage") if config.pipeline_async else None
+
         init_params = {
             "task_description": self.task_description,
             "skill_library": self.skill_library,
@@ -171,6 +177,8 @@ class PipelineRunner():
     def pipeline_shutdown(self):
 
         self.gm.cleanup_io()
+        if self.stage_executor is not None:
+            self.stage_executor.shutdown(wait=False)
         # self.video_recorder.finish_capture()
 
         log = process_log_messages(config.work_dir)
@@ -270,7 +278,7 @@ class PipelineRunner():
 
 
         # 2. Call llm api for action planning
-        params = deepcopy(self.memory.working_area)
+        params = self.memory.snapshot()
         data = self.planner.action_planning(input=params)
         response = data['res_dict']
         del params
@@ -308,7 +316,7 @@ class PipelineRunner():
         self.memory.update_info_history(processed_response)
 
         # 4. Execute the actions
-        params = deepcopy(self.memory.working_area)
+        params = self.memory.snapshot()
 
         skill_steps = params.get("skill_steps", [])
 
@@ -370,18 +378,30 @@ class PipelineRunner():
 
         self.memory.update_info_history(processed_params)
 
+        stages = {}
         if step_num != 0:
             if self.use_self_reflection:
-                self.run_self_reflection()
-
+                stages["self_reflection"] = Stage(self.self_reflection,
+                                                  self.self_reflection_preprocess,
+                                                  self.self_reflection_postprocess)
             if self.use_task_inference:
-                self.run_task_inference()
+                stages["task_inference"] = Stage(self.task_inference,
+                                                 self.task_inference_preprocess,
+                                                 self.task_inference_postprocess)
 
-        # 2. Call llm api for action planning
-        params = deepcopy(self.memory.working_area)
+        # 2. Call llm api for action planning, after the stages it depends on
+        stages["action_planning"] = Stage(self.call_action_planning,
+                                          postprocess=self.action_planning_postprocess)
+
+        results = run_stages(stages, self.stage_dependencies, self.memory.snapshot, self.stage_executor)
+
+        return results["action_planning"]
+
+    def call_action_planning(self, params):
         data = self.planner.action_planning(input=params)
-        response = data['res_dict']
-        del params
+        return data['res_dict']
+
+    def action_planning_postprocess(self, response):
 
         # 3. Postprocess the response
         logger.write("Stardew Action Planning Postprocess")
@@ -426,7 +446,7 @@ class PipelineRunner():
         self.memory.update_info_history(processed_response)
 
         # 4. Execute the actions
-        params = deepcopy(self.memory.working_area)
+        params = self.memory.snapshot()
 
         skill_steps = params.get("skill_steps", [])
 
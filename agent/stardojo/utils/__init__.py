@@ -1,6 +1,9 @@
 from stardojo.utils.singleton import AbstractSingleton, Singleton
+from stardojo.utils.env_context import EnvContext, current_context
 
 __all__ = [
     "AbstractSingleton",
     "Singleton",
+    "EnvContext",
+    "current_context",
 ]
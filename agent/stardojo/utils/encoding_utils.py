@@ -1,5 +1,8 @@
 import base64
+import hashlib
 import os
+import threading
+from collections import OrderedDict
 from typing import Any, List
 import io
 
@@ -9,7 +12,7 @@ from PIL import Image
 
 from stardojo.log.logger import Logger
 from stardojo.utils.file_utils import assemble_project_path
-from stardojo.utils.string_utils import hash_text_sha256
+from stardojo.utils.singleton import Singleton
 
 logger = Logger()
 
@@ -37,18 +40,92 @@ def encode_image_path(image_path):
 
 
 def encode_image_binary(image_binary, image_path=None):
-    encoded_image = encode_base64(image_binary)
-    if image_path is None:
-        image_path = '<$bin_placeholder$>'
-
-    logger.debug(f'|>. img_hash {hash_text_sha256(encoded_image)}, path {image_path} .<|')
-    return encoded_image
+    # logged prompts reference images by content hash (see stardojo.log.logger.redact_images)
+    return encode_base64(image_binary)
 
 
 def decode_image(base64_encoded_image):
     return decode_base64(base64_encoded_image)
 
 
+class EncodedImageCache(metaclass=Singleton):
+    """
+    Process-wide LRU of base64 data URLs keyed by the SHA-1 of the image bytes, bounded by
+    the total size of the encoded strings. Files are looked up by identity (path, size,
+    mtime), so an unchanged screenshot is neither re-read nor re-encoded, and rewriting a file
+    invalidates its entry. Images handed over in memory with `put_image` are keyed the same
+    way when their file exists, and by their bare path only until it does.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_paths: int = 1024):
+        self.max_bytes = max_bytes
+        self.max_paths = max_paths
+        self.size = 0
+        self.encoded = OrderedDict()  # digest -> data url
+        self.digests = OrderedDict()  # (path, size, mtime_ns), or path without a file -> digest
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key) -> str | None:
+        with self.lock:
+            digest = self.digests.get(key)
+            if digest is None or digest not in self.encoded:
+                return None
+            self.digests.move_to_end(key)
+            self.encoded.move_to_end(digest)
+            self.hits += 1
+            return self.encoded[digest]
+
+    def _insert(self, key, image_binary: bytes, image_type: str, image_path: str) -> str:
+        digest = hashlib.sha1(image_binary).hexdigest()
+        with self.lock:
+            data_url = self.encoded.get(digest)
+        if data_url is None:
+            data_url = f"data:image/{image_type};base64,{encode_image_binary(image_binary, image_path)}"
+        with self.lock:
+            self.misses += 1
+            if digest not in self.encoded:
+                self.encoded[digest] = data_url
+                self.size += len(data_url)
+                while self.size > self.max_bytes and len(self.encoded) > 1:
+                    _, evicted = self.encoded.popitem(last=False)
+                    self.size -= len(evicted)
+            self.digests[key] = digest
+            self.digests.move_to_end(key)
+            while len(self.digests) > self.max_paths:
+                self.digests.popitem(last=False)
+        return data_url
+
+    @staticmethod
+    def _file_key(image_path: str) -> tuple | None:
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return (image_path, stat.st_size, stat.st_mtime_ns)
+
+    def put_image(self, image_path: str, image_binary: bytes, image_type: str = "jpeg") -> str:
+        key = self._file_key(image_path)
+        return self._insert(key if key is not None else image_path, image_binary, image_type, image_path)
+
+    def encode_path(self, image_path: str) -> str | None:
+        key = self._file_key(image_path)
+        if key is None:
+            return self._lookup(image_path)
+        data_url = self._lookup(key)
+        if data_url is not None:
+            return data_url
+        with open(image_path, "rb") as image_file:
+            image_binary = image_file.read()
+        return self._insert(key, image_binary, image_path.split(".")[-1].lower(), image_path)
+
+
+def put_image_in_memory(image_path: str, image_binary: bytes, image_type: str = "jpeg") -> str:
+    """Make encoded image bytes available under image_path without reading them from disk."""
+    return EncodedImageCache().put_image(assemble_project_path(image_path), image_binary, image_type)
+
+
 def encode_data_to_base64_path(data: Any) -> List[str]:
     encoded_images = []
 
@@ -57,14 +134,8 @@ def encode_data_to_base64_path(data: Any) -> List[str]:
 
     for item in data:
         if isinstance(item, str):
-            if os.path.exists(assemble_project_path(item)):
-                path = assemble_project_path(item)
-                encoded_image = encode_image_path(path)
-                image_type = path.split(".")[-1].lower()
-                encoded_image = f"data:image/{image_type};base64,{encoded_image}"
-                encoded_images.append(encoded_image)
-            else:
-                encoded_images.append(item)
+            encoded_image = EncodedImageCache().encode_path(assemble_project_path(item))
+            encoded_images.append(item if encoded_image is None else encoded_image)
 
             continue
 
@@ -0,0 +1,56 @@
+"""Per-environment context for running several environments in one process."""
+import contextvars
+import itertools
+from typing import Any, Callable, Dict, Optional
+
+_current_context = contextvars.ContextVar("stardojo_env_context", default=None)
+_context_ids = itertools.count()
+
+
+def current_context() -> Optional["EnvContext"]:
+    """The context active in the calling thread or asyncio task, None outside of any context."""
+    return _current_context.get()
+
+
+class EnvContext():
+    """
+    The state of one environment: its own instance of every context-local singleton
+    (Config, Logger, LocalMemory, IOEnvironment, the module providers and the skill registry).
+
+    Code run inside `with context:` or context.run(fn) sees the instances of that context,
+    including through the module-level `config`, `logger` and `io_env` handles, so several
+    environments can run as threads or asyncio tasks of one process. Outside of any context
+    the process-wide instances are used. Singletons that are not context-local (factories,
+    detection models, caches) are shared by all contexts.
+
+    A context is meant to be active in one thread or task at a time.
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name or f"env{next(_context_ids)}"
+        self.instances: Dict[type, Any] = {}
+        self._tokens = []
+
+
+    def __enter__(self) -> "EnvContext":
+        self._tokens.append(_current_context.set(self))
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        _current_context.reset(self._tokens.pop())
+
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        with self:
+            return fn(*args, **kwargs)
+
+
+    def get(self, cls: type, *args, **kwargs) -> Any:
+        """The instance of the singleton class cls in this context, created with args if missing."""
+        with self:
+            return type(cls).instance(cls, *args, **kwargs)
+
+
+    def __repr__(self) -> str:
+        return f"EnvContext({self.name})"
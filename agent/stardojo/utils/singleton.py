@@ -1,19 +1,76 @@
 """A singleton metaclass for ensuring only one instance of a class."""
 import abc
+import threading
+
+from stardojo.utils.env_context import current_context
+
+
+class ContextProxy():
+    """
+    Stands for the instance of a context-local singleton class in the active EnvContext,
+    or the process-wide instance outside of any context. Calling such a class returns its
+    proxy, so handles like the module-level `config = Config()` follow the context of the
+    code using them, wherever they were created.
+    """
+
+    __slots__ = ("_cls",)
+
+    def __init__(self, cls):
+        object.__setattr__(self, "_cls", cls)
+
+    def _target(self):
+        return Singleton.instance(object.__getattribute__(self, "_cls"))
+
+    @property
+    def __class__(self):
+        return type(self._target())
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._target(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._target()(*args, **kwargs)
+
+    def __repr__(self):
+        return repr(self._target())
 
 
 class Singleton(abc.ABCMeta, type):
     """
     Singleton metaclass for ensuring only one instance of a class.
+
+    Classes with `context_local = True` have one instance per EnvContext instead of one per
+    process (see stardojo.utils.env_context).
     """
 
     _instances = {}
+    _proxies = {}
+    _lock = threading.RLock()
+
+    def instance(cls, *args, **kwargs):
+        """The instance of cls for the active context, created with args if missing."""
+        context = current_context() if getattr(cls, "context_local", False) else None
+        instances = context.instances if context is not None else cls._instances
+        if cls not in instances:
+            with Singleton._lock:
+                if cls not in instances:
+                    instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
+        return instances[cls]
 
     def __call__(cls, *args, **kwargs):
         """Call method for the singleton metaclass."""
-        if cls not in cls._instances:
-            cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
-        return cls._instances[cls]
+        instance = Singleton.instance(cls, *args, **kwargs)
+        if not getattr(cls, "context_local", False):
+            return instance
+        if cls not in cls._proxies:
+            cls._proxies[cls] = ContextProxy(cls)
+        return cls._proxies[cls]
 
 
 class AbstractSingleton(abc.ABC, metaclass=Singleton):
@@ -0,0 +1,115 @@
+import numpy as np
+
+from stardojo.memory.numpy_vector_store import IVF_TRAIN_POINTS_PER_LIST, NumpyVectorStore
+
+
+def unit(i, dim=8):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i % dim] = 1
+    return vector.tolist()
+
+
+def random_vectors(count, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def test_add_replaces_stored_key():
+    store = NumpyVectorStore()
+    store.add_embeddings(["x", "y"], [unit(0), unit(1)])
+    store.add_embeddings(["x"], [unit(2)])
+
+    assert len(store) == 2
+    assert store.similarity_search(unit(2), top_k=1) == [("x", 1.0)]
+    assert sorted(key for key, _ in store.similarity_search(unit(0), top_k=3)) == ["x", "y"]
+
+
+def test_key_repeated_in_batch_keeps_last():
+    store = NumpyVectorStore()
+    store.add_embeddings(["x", "x", "y"], [unit(0), unit(1), unit(2)])
+
+    assert len(store) == 2
+    results = store.similarity_search(unit(1), top_k=3)
+    assert [key for key, _ in results] == ["x", "y"]
+    assert results[0][1] == 1.0
+
+    assert store.delete(["x"])
+    assert [key for key, _ in store.similarity_search(unit(1), top_k=3)] == ["y"]
+
+
+def test_delete_hides_key_and_reports_missing():
+    store = NumpyVectorStore()
+    store.add_embeddings(["x", "y"], [unit(0), unit(1)])
+
+    assert not store.delete(["x", "missing"])
+    assert "x" not in store
+    assert [key for key, _ in store.similarity_search(unit(0), top_k=2)] == ["y"]
+
+
+def test_compact_drops_tombstones():
+    store = NumpyVectorStore(capacity=4)
+    keys = [f"k{i}" for i in range(10)]
+    vectors = random_vectors(10)
+    store.add_embeddings(keys, vectors)
+    store.delete(keys[:3])
+    store.compact()
+
+    assert store.size == len(store) == 7
+    assert store.keys == keys[3:]
+    assert store.alive.all()
+    assert store.similarity_search(vectors[5], top_k=1)[0][0] == "k5"
+
+    # deleting more than half of the rows compacts on its own
+    store.delete(keys[3:8])
+    assert store.size == len(store) == 2
+
+
+def test_ivf_search_finds_stored_vectors():
+    nlist = 4
+    count = nlist * IVF_TRAIN_POINTS_PER_LIST
+    vectors = random_vectors(count, seed=1)
+    keys = [f"k{i}" for i in range(count)]
+    store = NumpyVectorStore(nlist=nlist, nprobe=nlist)
+    store.add_embeddings(keys, vectors)
+
+    assert store.centroids is not None
+    assert sum(len(rows) for rows in store.lists) == count
+
+    # probing every list is exact
+    exact = NumpyVectorStore()
+    exact.add_embeddings(keys, vectors)
+    query = random_vectors(1, seed=2)[0]
+    assert [key for key, _ in store.similarity_search(query, top_k=5)] == \
+        [key for key, _ in exact.similarity_search(query, top_k=5)]
+
+    # vectors added after training are assigned to a list
+    store.add_embeddings(["new"], [vectors[0] * 3 + 1])
+    assert store.similarity_search(vectors[0] * 3 + 1, top_k=1)[0][0] == "new"
+
+    store.delete(["k7"])
+    assert "k7" not in [key for key, _ in store.similarity_search(vectors[7], top_k=3)]
+
+
+def test_save_and_load_with_mmap(tmp_path):
+    nlist = 2
+    count = nlist * IVF_TRAIN_POINTS_PER_LIST
+    vectors = random_vectors(count, seed=3)
+    keys = [f"k{i}" for i in range(count)]
+    store = NumpyVectorStore(path=str(tmp_path), nlist=nlist)
+    store.add_embeddings(keys, vectors)
+    store.delete(["k0"])
+    store.save("skills")
+
+    loaded = NumpyVectorStore.load(str(tmp_path), "skills", mmap=True)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.keys == keys[1:]
+    assert loaded.nlist == nlist and loaded.centroids is not None
+    query = vectors[10]
+    assert loaded.similarity_search(query, top_k=3) == store.similarity_search(query, top_k=3)
+
+    # the mapping is copy-on-write: changes stay in memory until the next save
+    vectors_file = tmp_path / "skills.vectors.npy"
+    on_disk = vectors_file.read_bytes()
+    loaded.add_embeddings(["k1"], [vectors[20]])
+    loaded.compact()
+    assert vectors_file.read_bytes() == on_disk
+    assert loaded.similarity_search(vectors[20], top_k=2)[0][0] in ("k1", "k20")
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from stardojo.planner.stage_graph import Stage, run_stages
+from stardojo.utils.env_context import EnvContext
+from stardojo.utils.singleton import Singleton
+
+
+class Planner(metaclass=Singleton):
+    context_local = True
+
+    def __init__(self):
+        self.name = None
+
+
+planner = Planner()
+
+
+def plan(name):
+    # reads the context-local singleton through its module-level proxy, like the providers do
+    return lambda params: (name, planner.name, params["step"])
+
+
+def run_step(step):
+    stages = {
+        "information_gathering": Stage(call=plan("information_gathering")),
+        "self_reflection": Stage(call=plan("self_reflection")),
+        "task_inference": Stage(call=plan("task_inference")),
+        "action_planning": Stage(call=plan("action_planning")),
+    }
+    dependencies = {"action_planning": ["information_gathering", "self_reflection", "task_inference"]}
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="stage") as executor:
+        return run_stages(stages, dependencies, lambda: {"step": step}, executor)
+
+
+def test_stage_calls_see_the_env_context_under_threads():
+    contexts = [EnvContext(name=f"env{env_idx}") for env_idx in range(4)]
+    for context in contexts:
+        context.get(Planner).name = context.name
+
+    def run_steps(steps):
+        return [run_step(step) for step in range(steps)]
+
+    # one thread per environment as ThreadVecEnv does, each stepping inside its own context
+    with ThreadPoolExecutor(max_workers=len(contexts), thread_name_prefix="env") as envs:
+        futures = [envs.submit(context.run, run_steps, 5) for context in contexts]
+        results = [future.result() for future in futures]
+
+    for context, steps in zip(contexts, results):
+        for step, result in enumerate(steps):
+            assert len(result) == 4
+            assert result == {name: (name, context.name, step) for name in result}
+
+
+def test_stage_calls_without_executor_see_the_env_context():
+    context = EnvContext(name="sync")
+    context.get(Planner).name = context.name
+    result = context.run(run_stages, {"action_planning": Stage(call=plan("action_planning"))}, {},
+                         lambda: {"step": 0})
+    assert result == {"action_planning": ("action_planning", "sync", 0)}
@@ -10,6 +10,10 @@ import dotenv
 import platform
 import cbor
 import msgpack
+import numpy as np
+
+from env.connection import (MessageSession, TransferStats, recv_until_eof,
+                            STATUS_SHARED_MEMORY, STATUS_ERROR, SOCKET_RECV_BUFFER, BATCH_PREFIX)
 
 dotenv.load_dotenv()
 
@@ -17,6 +21,8 @@ base_dir = os.path.dirname(os.path.abspath(__file__))
 crafting_recipes_path = os.path.join(base_dir, 'game_data/CraftingRecipes.json')
 _crafting_recipes = json.load(open(crafting_recipes_path))
 mmap_size = 4 * 1024 * 1024  # 8MB
+# commands whose result the mod writes to shared memory instead of the socket
+SHARED_MEMORY_COMMANDS = ("observe", "observe_binary")
 
 
 
@@ -61,43 +67,162 @@ def convert_to_case_insensitive_dict(d):
     return ci_dict
 
 
+def get_shared_memory_path(port, suffix: str = "") -> str:
+    os_type = platform.system()
+    stardew_app_path = os.getenv("STARDEW_APP_PATH")
+    stardew_app_parent_path = os.path.dirname(stardew_app_path)
+    if os_type == "Linux":
+        mmap_file = os.path.join(f"{stardew_app_parent_path}/shared_memory_{port}{suffix}.bin")
+    elif os_type == "Darwin":
+        mmap_file = os.path.join(f"{stardew_app_parent_path}/shared_memory_{port}{suffix}.bin")
+    else:
+        mmap_file = os.path.join(f"{stardew_app_parent_path}\\shared_memory_{port}{suffix}.bin")
+    return mmap_file
+
+
 class SharedMemoryReader:
+    '''
+    ### Usage
+    Consumer side of the shared memory region written by the mod. The mod publishes each
+    message into one of two alternating slots and bumps a sequence number last, so the
+    reader waits for the sequence to move past the value it saw before sending its request.
+    Regions written by an older mod (flag byte + length + payload) are still understood.
+
+    One reader is kept per port for the lifetime of the process, see `get_shared_memory_reader`.
+    '''
+    magic = b"SDJM"
+    header = struct.Struct("<4siqii")  # magic, version, sequence, slot, length
+    slot_size_offset = 32
+    header_size = 64
+
     def __init__(self, mmap_file, port):
         self.mmap_size = mmap_size
-
-        os_type = platform.system()
-        stardew_app_path = os.getenv("STARDEW_APP_PATH")
-        stardew_app_parent_path = os.path.dirname(stardew_app_path)
-        if os_type == "Linux":
-            mmap_file = os.path.join(f"{stardew_app_parent_path}/shared_memory_{port}.bin")
-        elif os_type == "Darwin":
-            mmap_file = os.path.join(f"{stardew_app_parent_path}/shared_memory_{port}.bin")
-        else:
-            mmap_file = os.path.join(f"{stardew_app_parent_path}\shared_memory_{port}.bin")
-        self.mmap_file = mmap_file
+        self.mmap_file = get_shared_memory_path(port)
+        self.last_length = 0
+        self.last_sequence = 0
         self.f = open(self.mmap_file, "r+b")
-        self.mm = mmap.mmap(self.f.fileno(), self.mmap_size, access=mmap.ACCESS_WRITE)
-
-    def read_from_mmap(self):
+        # map the whole file: the mod sizes the region, not us
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_WRITE)
+
+    def sequence(self) -> int:
+        magic, _, sequence, _, _ = self.header.unpack_from(self.mm, 0)
+        return sequence if magic == self.magic else 0
+
+    def _read_slot(self, after_sequence):
+        header = self.header.unpack_from(self.mm, 0)
+        _, _, sequence, slot, length = header
+        if sequence == after_sequence or length <= 0:
+            return None
+        slot_size = struct.unpack_from("<i", self.mm, self.slot_size_offset)[0]
+        offset = self.header_size + slot * slot_size
+        data = self.mm[offset:offset + length]
+        # slot and length are written before the sequence, so any change of the header during
+        # the copy (a publish finished or under way) may have torn the data: read again
+        if self.header.unpack_from(self.mm, 0) != header:
+            return None
+        self.last_sequence = sequence
+        self.last_length = length
+        return data
+
+    def _read_legacy(self):
+        if self.mm[0] != 1:
+            return None
+        length = struct.unpack_from("I", self.mm, 4)[0]
+        if length <= 0:
+            return None
+        data = self.mm[8:8 + length]
+        self.mm[0] = 0
+        self.last_length = length
+        return data
+
+    def read_from_mmap(self, after_sequence: int = None, timeout: float = 30):
+        if after_sequence is None:
+            after_sequence = self.last_sequence
         start_time = time.time()
+        delay = 0.0005
         while True:
-            self.mm.seek(0) 
-            flag = struct.unpack("B", self.mm.read(1))[0]
-            if time.time() - start_time > 30:
+            if self.mm[:4] == self.magic:
+                data = self._read_slot(after_sequence)
+            else:
+                data = self._read_legacy()
+            if data is not None:
+                # data = msgpack.unpackb(data, raw=False)
+                data = cbor.loads(data)
+                return convert_to_case_insensitive_dict(data)
+            if time.time() - start_time > timeout:
                 print("Timeout: Server is not ready.")
                 return None
-            if flag == 1:
-                self.mm.seek(4)
-                length = struct.unpack("I", self.mm.read(4))[0] 
-                if length > 0:
-                    data = self.mm.read(length)
-                    print(type(data))
-                    # data = msgpack.unpackb(data, raw=False)
-                    data = cbor.loads(data)
-                    data = convert_to_case_insensitive_dict(data)
-                    self.mm.seek(0)
-                    self.mm.write(struct.pack("B", 0))
-                    return data
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+
+
+_shared_memory_readers = {}
+_frame_readers = {}
+
+
+def get_shared_memory_reader(port) -> SharedMemoryReader:
+    reader = _shared_memory_readers.get(port)
+    if reader is None:
+        reader = SharedMemoryReader(mmap_size, port)
+        _shared_memory_readers[port] = reader
+    return reader
+
+
+def get_frame_reader(port) -> "FrameReader":
+    reader = _frame_readers.get(port)
+    if reader is None:
+        reader = FrameReader(port)
+        _frame_readers[port] = reader
+    return reader
+
+
+# screenshot encodings, see ActionProxy.set_image_mode
+FRAME_FORMAT_RGBA = 0
+FRAME_FORMAT_GRAY = 1
+FRAME_FORMAT_JPEG = 2
+IMAGE_MODES = ("rgba", "gray", "jpeg", "none")
+
+
+def decode_screenshot(raw, width: int, height: int, frame_format: int = FRAME_FORMAT_RGBA):
+    '''
+    Turn screenshot bytes from the mod into an (height, width, 4) RGBA or (height, width)
+    grayscale array. JPEG screenshots are returned as bytes, ready to be written to disk.
+    '''
+    if raw is None or len(raw) == 0:
+        return None
+    if frame_format == FRAME_FORMAT_JPEG:
+        return bytes(raw)
+    frame = np.frombuffer(raw, dtype=np.uint8)
+    if frame_format == FRAME_FORMAT_GRAY:
+        return frame.reshape(height, width)
+    return frame.reshape(height, width, 4)
+
+
+class FrameReader:
+    '''
+    ### Usage
+    Read the screenshot that `observe_binary` writes into the sidecar shared memory
+    segment. Raw frames are returned as a read-only ndarray view over the mapped
+    memory, so they are only valid until the next observation overwrites them; copy
+    one if it has to outlive the step.
+    '''
+    header = struct.Struct("<iiii")  # width, height, length, format
+
+    def __init__(self, port):
+        self.mmap_file = get_shared_memory_path(port, "_frame")
+        self.f = open(self.mmap_file, "rb")
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_frame(self):
+        width, height, length, frame_format = self.header.unpack_from(self.mm, 0)
+        if length <= 0:
+            return None
+        frame = memoryview(self.mm)[self.header.size:self.header.size + length]
+        return decode_screenshot(frame, width, height, frame_format)
 
     def close(self):
         self.mm.close()
@@ -105,34 +230,78 @@ class SharedMemoryReader:
 
 
 class ActionProxy:
-    def __init__(self, port: int):
+    def __init__(self, port: int, persistent: bool = False):
         self.port = port
         self.timeout = 5
         self.mmap_reader = None
+        self.frame_reader = None
+        self.transfer_stats = TransferStats()
+        self.session = MessageSession(port, stats=self.transfer_stats) if persistent else None
 
     def set_mmap_reader(self):
-        self.mmap_reader = SharedMemoryReader(mmap_size, self.port)
+        self.mmap_reader = get_shared_memory_reader(self.port)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+    def _get_timeout(self, message: str) -> float:
+        if message.startswith(BATCH_PREFIX):
+            batch = json.loads(message[len(BATCH_PREFIX):])
+            messages = [m for entry in batch["commands"] for m in (entry if isinstance(entry, list) else [entry])]
+            if batch["observe"] is not None:
+                messages.append(batch["observe"])
+            return sum(self._get_timeout(m) for m in messages)
+        if message.startswith("wait_settled%"):
+            # the mod gives up after the given number of ticks
+            return int(message.split("%")[2]) / 60 + self.timeout
+        if "move" in message:
+            return 30
+        elif "observe" in message or "get_surroundings" in message:
+            return 30
+        elif "wait_for_server" in message:
+            return 30
+        return self.timeout
+
+    def _post_session_message(self, message: str) -> str:
+        try:
+            # the response frame is the wakeup: by the time it arrives the shared memory is written
+            sequence = self.mmap_reader.sequence() if self.mmap_reader is not None else None
+            status, body = self.session.request(message, self._get_timeout(message))
+        except AssertionError as e:
+            print(f"AssertionError: {e}")
+            assert False, f"got a Error: {e}"
+        except Exception as e:
+            print(message.encode('utf-8'))
+            print(f"Error: {e}")
+            return None
+
+        if status == STATUS_SHARED_MEMORY:
+            return self.mmap_reader.read_from_mmap(sequence)
+        if status == STATUS_ERROR:
+            print(f"Error from server: {str(body, 'utf-8')}")
+            return None
+        return str(body, 'utf-8')
+
+    def get_transfer_stats(self) -> dict:
+        return self.transfer_stats.summary()
 
     def _post_message(self, message: str, print_message: bool = True) -> str:
+        if self.session is not None:
+            return self._post_session_message(message)
 
         client_socket = None
+        response = bytearray()
         start_time = time.time()
         try:
             host = '127.0.0.1'
             port = self.port
             client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RECV_BUFFER)
 
             
             client_socket.setblocking(False)
-
-            if f"move" in message:
-                client_socket.settimeout(30)
-            elif "observe" in message or "get_surroundings" in message:
-                client_socket.settimeout(30)
-            elif "wait_for_server" in message:
-                client_socket.settimeout(30)
-            else:
-                client_socket.settimeout(self.timeout)
+            client_socket.settimeout(self._get_timeout(message))
 
            
             result = client_socket.connect_ex((host, port))  
@@ -143,25 +312,21 @@ class ActionProxy:
                 result = client_socket.connect_ex((host, port)) 
                 reconnect_time += 1
           
+            is_observe = message.split('%', 1)[0] in SHARED_MEMORY_COMMANDS
+            sequence = self.mmap_reader.sequence() if is_observe else None
             client_socket.sendall(message.encode('utf-8'))
-            is_observe = "observe" in message and "observe_v2" not in message
+            sent_time = time.time()
 
             if is_observe:
                 # print("using mmap to receive message")
-                return self.mmap_reader.read_from_mmap()
+                obs = self.mmap_reader.read_from_mmap(sequence)
+                self.transfer_stats.record(message, self.mmap_reader.last_length, time.time() - sent_time, 0.0)
+                return obs
 
-            response = []
-            while True:
-                data = client_socket.recv(1024)
-                if not data:
-                    break
-                data_block = data.decode('utf-8')
-                response.append(data_block)
-                full_response_tmp = ''.join(response)
-                if full_response_tmp.endswith("<EOF>"):
-                    break
+            response, first_byte_time = recv_until_eof(client_socket)
+            self.transfer_stats.record(message, len(response), first_byte_time - sent_time, time.time() - first_byte_time)
 
-            full_response = ''.join(response)[:-5]
+            full_response = response[:-5].decode('utf-8')
             # if print_message:
                 # print(f"response from server(sample)：{full_response[:200]}")
             return full_response
@@ -175,8 +340,8 @@ class ActionProxy:
             print(message.encode('utf-8'))
             print(f"Error: {e}")
             if print_message:
-                full_response = ''.join(response)
-                print(f"response from server(sample)：{full_response[:20]}")
+                full_response = response[:20].decode('utf-8', errors='replace')
+                print(f"response from server(sample)：{full_response}")
 
 
         finally:
@@ -203,35 +368,49 @@ class ActionProxy:
                 print("Waiting for server to start listening...")
                 time.sleep(1)  
 
+    def batch(self, commands: list, observe: str = None) -> tuple[list, object]:
+        '''
+        ### Usage
+        Execute several commands in one round-trip. The mod runs them back-to-back in its
+        update loop and returns one result per command (None for commands without a result).
+
+        ### Paramaters
+        commands: Messages in execution order. An entry may itself be a list of alternative
+            messages, tried in order until one returns true (see `move_messages`).
+        observe: Optional observe message (e.g. "observe_v2%3" or "observe_binary%3") run after
+            the commands. Its result is returned in the same form as `observe`/`observe_binary`.
+        '''
+        message = BATCH_PREFIX + json.dumps({"commands": commands, "observe": observe})
+        # shared memory observations are published after this sequence number
+        sequence = self.mmap_reader.sequence() if observe is not None and self.mmap_reader is not None else None
+        ret_str = self._post_message(message)
+        if ret_str is None:
+            print(f"batch of {len(commands)} commands return value is None")
+            return [None] * len(commands), None
+        ret = json.loads(ret_str)
+        obs = ret["observation"]
+        if ret["shared_memory"]:
+            obs = self.mmap_reader.read_from_mmap(sequence)
+            if obs is not None and observe.startswith("observe_binary"):
+                self.attach_frame(obs)
+        return ret["results"], obs
+
+    @staticmethod
+    def move_messages(x: int, y: int) -> list[str]:
+        # the target first, then the adjacent tiles in case the target is occupied
+        return [f"move_relative%{x}%{y}",
+                f"move_relative%{x}%{y+1}",
+                f"move_relative%{x-1}%{y}",
+                f"move_relative%{x}%{y-1}",
+                f"move_relative%{x+1}%{y}",
+                f"move_relative%{x}%{y+2}"]
+
     def move(self, x: int, y: int) -> bool:
-        message = f"move_relative%{x}%{y}"
-        success = self._post_message(message)
-        if success is None:
+        results, _ = self.batch([self.move_messages(x, y)])
+        if results[0] is None:
             print(f"move%{x}%{y} return value is None")
             return False
-        success = (success.lower() == "true")
-        if not success:
-            retries = 5
-            for r in range(retries):
-                print(f"Retrying moving to adjacent tile retries:[{r}]")
-                if r == 0:
-                    message = f"move_relative%{x}%{y+1}"
-                elif r == 1:
-                    message = f"move_relative%{x-1}%{y}"
-                elif r == 2:
-                    message = f"move_relative%{x}%{y-1}"
-                elif r == 3:
-                    message = f"move_relative%{x+1}%{y}"
-                else:
-                    message = f"move_relative%{x}%{y+2}"
-                success = self._post_message(message)
-                if success is None:
-                    print(f"{message} return value is None")
-                    return False
-                success = (success.lower() == "true")
-                if success:
-                    break
-        return success
+        return str(results[0]).lower() == "true"
 
     def move_step(self, direction: int) -> None:
         if (direction < 1) or (direction > 4):
@@ -253,11 +432,15 @@ class ActionProxy:
         self._post_message(message)
 
     def turn(self, direction: int) -> None:
+        for message in self.turn_messages(direction):
+            self._post_message(message)
+
+    @staticmethod
+    def turn_messages(direction: int) -> list[str]:
         if direction<0 or direction>3:
             print("invalid direction for turning")
-            return
-        message = f"turn%{direction}"
-        self._post_message(message)
+            return []
+        return [f"turn%{direction}"]
 
     def open_map(self) -> None:
         message = f"open_map"
@@ -276,9 +459,7 @@ class ActionProxy:
         slot_index: Inventory slot indices
         direction: 0: up, 1: right, 2: down, 3: left
         '''
-        self.turn(direction)
-        message = f"use"
-        self._post_message(message)
+        self.batch(self.turn_messages(direction) + ["use"])
 
     def choose_item(self, slot_index: int) -> None:
         message = f"choose_item%{slot_index}"
@@ -297,9 +478,7 @@ class ActionProxy:
         slot_index: Inventory slot indices
         direction: 0: up, 1: right, 2: down, 3: left
         '''
-        self.turn(direction)
-        message = f"interact"
-        self._post_message(message)
+        self.batch(self.turn_messages(direction) + ["interact"])
         
     def choose_option(self, option_index: int, quantity: int = None, direction: int = None) -> None:
         if quantity is None:
@@ -322,6 +501,53 @@ class ActionProxy:
         ret_str = self._post_message(message)
         return ret_str
 
+    def set_image_mode(self, mode: str = "rgba", scale: int = 1, crop: tuple = None) -> None:
+        '''
+        ### Usage
+        Choose the screenshot the mod attaches to observations. The setting lasts until the
+        game process exits.
+
+        ### Paramaters
+        mode: "rgba" (raw frame), "gray", "jpeg" (encoded by the mod) or "none" (no capture at all)
+        scale: keep every scale-th pixel in both directions
+        crop: (x, y, width, height) in viewport pixels, None for the whole viewport
+        '''
+        if mode not in IMAGE_MODES:
+            raise ValueError(f"image mode must be one of {IMAGE_MODES}")
+        x, y, width, height = crop if crop is not None else (0, 0, 0, 0)
+        message = f"set_image_mode%{mode}%{scale}%{x}%{y}%{width}%{height}"
+        self._post_message(message)
+
+    def observe_delta(self, base_version: int, size: int = 3) -> str:
+        '''
+        ### Usage
+        Observe only what changed since `base_version` (see `apply_observation_delta`).
+        A base_version of 0 always returns a full keyframe. The screenshot is not part of the
+        delta: it is written to the frame segment, see `attach_frame`.
+        '''
+        message = f"observe_delta%{size}%{base_version}"
+        ret_str = self._post_message(message)
+        return ret_str
+
+    def observe_binary(self, size: int = 3) -> dict:
+        '''
+        ### Usage
+        Observe through shared memory: the structured fields arrive as CBOR and the
+        screenshot is attached as a view over the raw frame, with no base64 round-trip.
+        '''
+        message = f"observe_binary%{size}"
+        obs = self._post_message(message)
+        if obs is None:
+            return None
+        self.attach_frame(obs)
+        return obs
+
+    def attach_frame(self, obs: dict) -> None:
+        '''Set obs['ScreenShot'] to the frame of the last observe_binary or observe_delta.'''
+        if self.frame_reader is None:
+            self.frame_reader = get_frame_reader(self.port)
+        obs['ScreenShot'] = self.frame_reader.read_frame()
+
     def unattach_item(self) -> None:
         message = "unattach"
         self._post_message(message)
@@ -352,6 +578,18 @@ class ActionProxy:
         self._post_message(message)
         print(f"game started")
 
+    def wait_settled(self, stable_ticks: int = 6, timeout_ticks: int = 180) -> bool:
+        '''
+        ### Usage
+        Wait until the game has been settled for `stable_ticks` consecutive game ticks: the player
+        is not moving or pathing, has no tool, weapon or eating animation, no screen fade or warp,
+        no cutscene, no dialogue being typed or opening, the active menu did not change and no
+        other action sent to the mod is still running. Returns False if that did not happen
+        within `timeout_ticks` ticks (60 ticks per second).
+        '''
+        ret = self._post_message(f"wait_settled%{stable_ticks}%{timeout_ticks}")
+        return ret is not None and str(ret).lower() == "true"
+
     def pause_game(self):
         message = "pause"
         self._post_message(message)
@@ -371,14 +609,66 @@ class ActionProxy:
         return ret_str
 
 
-def convert_discrete_into_commands(action: list[int], action_proxy: ActionProxy, is_RL = False) -> str:
+def _element_key(value):
+    # hashable form of a list element key sent by the mod ([x, y], {"X": .., "Y": ..} or a name)
+    if isinstance(value, list):
+        return tuple(_element_key(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _element_key(item)) for key, item in value.items()))
+    return value
+
+
+def _patch_list(items: list, change: dict) -> list:
+    # elements keep their order, new ones are appended unless the mod sent the full order
+    key = change["Key"]
+    index = {_element_key(item[key]): item for item in items}
+    for item in change["Set"]:
+        index[_element_key(item[key])] = item
+    for value in change["Unset"]:
+        index.pop(_element_key(value), None)
+    if "Order" in change:
+        return [index[_element_key(value)] for value in change["Order"]]
+    return list(index.values())
+
+
+def apply_observation_delta(state: dict, delta: dict) -> dict:
+    '''
+    Patch an observation state with a delta from `observe_delta` and return the new state.
+    Changed subtrees replace the old ones instead of being modified in place, and parents on
+    a changed path are copied, so observations returned earlier keep their own snapshot.
+    Lists the mod diffs per element (surroundings, crops, NPCs) are rebuilt from the elements
+    that changed and the ones of the previous state.
+    '''
+    if delta["Keyframe"]:
+        return delta["State"]
+    state = dict(state)
+    for change in delta["Changed"]:
+        path = change["Path"]
+        if "Key" in change:
+            state[path[0]] = _patch_list(state[path[0]], change)
+            continue
+        value = change["Value"]
+        if len(path) == 1:
+            state[path[0]] = value
+        else:
+            parent = state[path[0]] = dict(state[path[0]])
+            parent[path[1]] = value
+    for path in delta["Removed"]:
+        if len(path) == 1:
+            state.pop(path[0], None)
+        else:
+            parent = state[path[0]] = dict(state[path[0]])
+            parent.pop(path[1], None)
+    return state
+
+
+def convert_discrete_into_messages(action: list[int], is_RL = False) -> tuple[list, list[str]]:
     """
     Parameters:
 
     action (list[int]): A list containing actions.
-    action_proxy (ActionProxy): A proxy object used to send instructions.
     Returns:
-        str: Description of the executed command.
+        tuple[list, list[str]]: The batch entries for `ActionProxy.batch` and a description of each command.
     """
     if len(action) != 10:
         raise ValueError("Action list must have 10 elements.")
@@ -395,52 +685,71 @@ def convert_discrete_into_commands(action: list[int], action_proxy: ActionProxy,
     pos_y = action[8]
     quantity = action[9]
 
+    messages = []
     command_descriptions = []
 
     # Move action
     if move_action == 1:
         if direction > 0:
-            action_proxy.move_step(direction)
+            if direction > 4:
+                raise ValueError("Direction must be between 1 and 4")
+            messages.append(f"move_step%{direction}")
             command_descriptions.append(f"Moved one step in direction {direction}")
         elif not is_RL:
-            action_proxy.move(pos_x, pos_y)
+            messages.append(ActionProxy.move_messages(pos_x, pos_y))
             command_descriptions.append(f"Moved to position ({pos_x}, {pos_y})")
 
     # Turn action
     if turn_action > 0 and direction > 0:
-        action_proxy.turn(direction-1)
+        messages.extend(ActionProxy.turn_messages(direction-1))
         command_descriptions.append(f"Turned direction {direction-1}")
 
     # Functional actions
     if func_action > 0:
         if func_action == 1:  # Use
-            action_proxy.use()
+            messages.append("use")
             command_descriptions.append(f"Used item in slot {item_slot} facing direction {direction}")
         elif func_action == 2:  # Interact
-            action_proxy.interact()
+            messages.append("interact")
             command_descriptions.append(f"Interacted facing direction {direction}")
         elif func_action == 3:  # Craft
-            action_proxy.craft(craft_item_id)
+            crafting_id = list(_crafting_recipes["content"].keys())[craft_item_id]
+            messages.append(f"craft%{crafting_id}")
             command_descriptions.append(f"Crafted item with ID {craft_item_id}")
         elif func_action == 4:  # Choose option
             if choose_option_index == 0:
-                action_proxy.exit_menu()
+                messages.append("exit_menu")
                 command_descriptions.append("Exited menu")
             else:
                 read_index = choose_option_index - 1
-                action_proxy.choose_option(read_index, quantity, pos_x, pos_y)
+                messages.append(f"choose_option%{read_index}%{quantity}%{pos_x}")
                 command_descriptions.append(
                     f"Chose option {read_index} with quantity {quantity} at position ({pos_x}, {pos_y})")
         elif func_action == 5:  # Choose item
-            action_proxy.choose_item(item_slot)
+            messages.append(f"choose_item%{item_slot}")
             command_descriptions.append(f"Chose item in slot {item_slot}")
         elif func_action == 6:  # Attach
-            action_proxy.attach(item_slot)
+            messages.append(f"attach%{item_slot}")
             command_descriptions.append(f"Attached item in slot {item_slot}")
         elif func_action == 7:  # Unattach
-            action_proxy.unattach()
+            messages.append("unattach")
             command_descriptions.append("Unattached item")
 
+    return messages, command_descriptions
+
+
+def convert_discrete_into_commands(action: list[int], action_proxy: ActionProxy, is_RL = False) -> str:
+    """
+    Parameters:
+
+    action (list[int]): A list containing actions.
+    action_proxy (ActionProxy): A proxy object used to send instructions.
+    Returns:
+        str: Description of the executed command.
+    """
+    messages, command_descriptions = convert_discrete_into_messages(action, is_RL)
+    if messages:
+        action_proxy.batch(messages)
     return " | ".join(command_descriptions)
 
 
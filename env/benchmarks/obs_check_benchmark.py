@@ -0,0 +1,128 @@
+'''
+Per-call cost of the task evaluators in tasks/utils/obs_check.py over synthetic surroundings,
+before and after indexing tiles and buildings by position and id.
+
+    python env/benchmarks/obs_check_benchmark.py
+    python env/benchmarks/obs_check_benchmark.py --sizes 3 6 12 --repeat 20
+
+Each size is the observe radius in the game's units: the surroundings hold (8 * size + 1)^2 tiles.
+'''
+import argparse
+import importlib.util
+import os
+import random
+import statistics
+import time
+
+ENV_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# loaded by path so the benchmark does not import every task through tasks.utils
+_spec = importlib.util.spec_from_file_location("obs_check", os.path.join(ENV_ROOT, "tasks", "utils", "obs_check.py"))
+obs_check = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(obs_check)
+
+OBJECTS = ["Weeds", "Stone", "Twig", "Parsnip", ""]
+
+
+def legacy_surrounding_check(check_list: list, surrounding: list, last_surrounding: list, is_remove: bool, type: str) -> int:
+    # obs_check.surrounding_check before the position index
+    number = 0
+    if is_remove:
+        for last_tile in last_surrounding:
+            if type in last_tile and last_tile[type] in check_list:
+                position = last_tile["position"]
+                for tile in surrounding:
+                    if tile.get("position") == position and tile.get(type) not in check_list:
+                        number += 1
+                        break
+    else:
+        for tile in surrounding:
+            if type in tile and tile[type] in check_list:
+                position = tile["position"]
+                for last_tile in last_surrounding:
+                    if last_tile.get("position") == position and last_tile.get(type) not in check_list:
+                        number += 1
+                        break
+    return number
+
+
+def legacy_building_moving_check(check_list: list, buildings: list, last_buildings: list, is_change: bool) -> int:
+    # obs_check.building_moving_check before the id index
+    number = 0
+    for last_building in last_buildings:
+        if last_building["type"] in check_list:
+            building_id = last_building["id"]
+            position = last_building["position"]
+            for building in buildings:
+                if building.get("id") == building_id and (building.get("position") != position) == is_change:
+                    number += 1
+                    break
+    return number
+
+
+def synthetic_surroundings(size: int, rng: random.Random) -> tuple:
+    last_surrounding, surrounding = [], []
+    for dx in range(-size * 4, size * 4 + 1):
+        for dy in range(-size * 4, size * 4 + 1):
+            last_object = rng.choice(OBJECTS)
+            # a fifth of the tiles change between the two steps
+            current_object = rng.choice(OBJECTS) if rng.random() < 0.2 else last_object
+            last_surrounding.append({"position": [60 + dx, 15 + dy], "object_at_tile": last_object})
+            surrounding.append({"position": [60 + dx, 15 + dy], "object_at_tile": current_object})
+    # the mod does not promise the same tile order on every step
+    rng.shuffle(surrounding)
+    return surrounding, last_surrounding
+
+
+def synthetic_buildings(count: int, rng: random.Random) -> tuple:
+    last_buildings = [{"id": f"b{i}", "type": rng.choice(["Coop", "Barn", "Silo"]), "position": [i, i]}
+                      for i in range(count)]
+    buildings = [dict(building, position=[building["position"][0] + (rng.random() < 0.1), building["position"][1]])
+                 for building in last_buildings]
+    rng.shuffle(buildings)
+    return buildings, last_buildings
+
+
+def measure(check, args: tuple, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        check(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.mean(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the task evaluators of obs_check")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 6, 12])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    check_list = ["Weeds", "Stone", "Twig"]
+
+    for size in args.sizes:
+        surrounding, last_surrounding = synthetic_surroundings(size, rng)
+        for is_remove in (True, False):
+            check_args = (check_list, surrounding, last_surrounding, is_remove, "object_at_tile")
+            assert legacy_surrounding_check(*check_args) == obs_check.surrounding_check(*check_args), \
+                f"surrounding_check differs for size {size}, is_remove {is_remove}"
+            legacy = measure(legacy_surrounding_check, check_args, args.repeat)
+            indexed = measure(obs_check.surrounding_check, check_args, args.repeat)
+            print(f"surrounding_check     tiles {len(surrounding):6d} is_remove {is_remove!s:<5}  "
+                  f"legacy {legacy * 1e3:9.2f} ms  indexed {indexed * 1e3:7.2f} ms  ({legacy / indexed:6.1f}x)")
+
+        buildings, last_buildings = synthetic_buildings(size * 50, rng)
+        for is_change in (True, False):
+            check_args = (["Coop", "Barn"], buildings, last_buildings, is_change)
+            assert legacy_building_moving_check(*check_args) == obs_check.building_moving_check(*check_args), \
+                f"building_moving_check differs for size {size}, is_change {is_change}"
+            legacy = measure(legacy_building_moving_check, check_args, args.repeat)
+            indexed = measure(obs_check.building_moving_check, check_args, args.repeat)
+            print(f"building_moving_check buildings {len(buildings):4d} is_change {is_change!s:<5}  "
+                  f"legacy {legacy * 1e3:7.2f} ms  indexed {indexed * 1e3:7.2f} ms  ({legacy / indexed:6.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
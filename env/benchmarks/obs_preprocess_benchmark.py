@@ -0,0 +1,203 @@
+'''
+Per-step cost of the observation preprocessing, before and after the compiled pipeline.
+
+Record a corpus from a running game (one observe_v2 JSON per line):
+    python env/benchmarks/obs_preprocess_benchmark.py --record obs_corpus.jsonl --port 10783 --steps 200
+Benchmark it:
+    python env/benchmarks/obs_preprocess_benchmark.py --corpus obs_corpus.jsonl
+Without --corpus a synthetic observation of a busy farm is used.
+'''
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import observation
+from utils import utils
+
+
+def legacy_preprocess(obs: dict, space, image_paths) -> dict:
+    # the pre-compiled StarDojo.obs_preprocess, with fill_observation_space applied to the space's fields
+    observation.fill_observation_space(obs, space.spaces)
+    _object_id_map = {object_id: {"Name": name} for object_id, name in observation._object_names.items()}
+    surroundings = obs["SurroundingsData"]
+    info_list = []
+    for info in surroundings:
+        if info.get("crop_at_tile") is not None and info["crop_at_tile"] != "" and info["crop_at_tile"].get("seed_id") in _object_id_map:
+            info["crop_at_tile"]["seed_name"] = _object_id_map[info["crop_at_tile"]["seed_id"]]["Name"]
+            del info["crop_at_tile"]["seed_id"]
+
+        if info.get("debris_at_tile") is not None and info["debris_at_tile"] != "" and info["debris_at_tile"].strip('(O)') in _object_id_map:
+            info["debris_at_tile"] = _object_id_map[info["debris_at_tile"].strip('(O)')]["Name"]
+
+        new_info = {}
+        for key in list(info.keys()):
+            if info[key] != '' and info[key] != []:
+                new_info[key] = info[key]
+        info = new_info
+        info_list.append(info)
+
+    crops = obs["Crops"]
+    for i, crop in enumerate(crops):
+        crop_id = crop.get("id")
+        if crop_id in _object_id_map:
+            crop["id"] = _object_id_map[crop_id]["Name"]
+
+    return_dict = obs
+    return_dict.update({
+        'basic_knowledge': list(observation.BASIC_KNOWLEDGE),
+        "health": str(obs["Player"]["Health"]),
+        "energy": str(obs["Player"]["Stamina"]),
+        "money": str(obs["Player"]["Money"]),
+        "location": obs["Player"]["Location"],
+        "position": obs["Player"]["Position"],
+        "facing_direction": utils.get_direction_text(obs["Player"]["FacingDirection"]),
+        "inventory": obs["Player"]["Inventory"],
+        "chosen_item": obs["Player"]["CurrentInventory"],
+        "time": str(obs["GameState"]["Time"]),
+        "day": str(obs["GameState"]["DayOfMonth"]),
+        "season": obs["GameState"]["Season"],
+        "farm_animals": obs["Farm"]["Animals"],
+        "farm_pets": obs["Farm"]["Pets"],
+        "farm_buildings": obs["Farm"]["Buildings"],
+        "image_paths": image_paths,
+        "surroundings": info_list,
+        "crops": crops,
+        "exits": [],
+        "buildings": obs["Buildings"],
+        "furniture": obs["Furnitures"],
+        "npcs": obs["NPCs"],
+        "shop_counters": obs["ShopCounters"],
+        "current_menu": obs["CurrentMenuData"],
+    })
+
+    def lowercase_keys(d):
+        new = {}
+        for k, v in d.items():
+            new_key = k.lower() if isinstance(k, str) else k
+            if isinstance(v, dict):
+                new[new_key] = lowercase_keys(v)
+            else:
+                new[new_key] = v
+        return new
+
+    return lowercase_keys(return_dict)
+
+
+def synthetic_observation(size: int = 3) -> dict:
+    object_ids = list(observation._object_names)
+    surroundings = []
+    for dx in range(-size * 4, size * 4 + 1):
+        for dy in range(-size * 4, size * 4 + 1):
+            i = len(surroundings)
+            surroundings.append({
+                "position": [60 + dx, 15 + dy],
+                "building_info": "",
+                "crop_at_tile": {"seed_id": object_ids[i % len(object_ids)], "phase": 2} if i % 7 == 0 else None,
+                "debris_at_tile": f"(O){object_ids[(i * 3) % len(object_ids)]}" if i % 5 == 0 else "",
+                "object_at_tile": "StardewValley.Object" if i % 11 == 0 else "",
+                "terrain_at_tile": "StardewValley.TerrainFeatures.Grass" if i % 3 == 0 else "",
+                "furniture_at_tile": "",
+                "exit_info": "",
+                "npc_info": "",
+                "tile_properties": [] if i % 2 else ["Diggable"],
+            })
+    return {
+        "Player": {
+            "Name": "Farmer", "Health": 100, "Stamina": 270.0, "Money": 500, "Location": "Farm",
+            "Position": [60, 15], "FacingDirection": 2, "CurrentInventory": "Hoe",
+            "Inventory": [{"Name": f"Item {i}", "Quantity": i} for i in range(36)],
+        },
+        "NPCs": [{"Name": f"NPC {i}", "Location": "Town", "Friendship": i * 10} for i in range(30)],
+        "GameState": {"Time": 1230, "DayOfMonth": 5, "Season": "spring", "Year": 1, "Weather": "sunny"},
+        "Farm": {
+            "Animals": [{"Type": "White Chicken", "Name": f"Chicken {i}"} for i in range(8)],
+            "Pets": [{"Name": "Dog"}],
+            "Buildings": [{"Type": "Coop", "BuildingsData": ""} for _ in range(4)],
+        },
+        "CurrentMenuData": {"type": "No Menu"},
+        "MetaData": {"ViewportSize": [1280, 720]},
+        "CallBackData": {"OnDayStarted": 1},
+        "SurroundingsData": surroundings,
+        "Crops": [{"id": object_ids[i % len(object_ids)], "position": {"X": i, "Y": 3}} for i in range(80)],
+        "Furnitures": [],
+        "Exits": [{"target": "BusStop", "position": {"X": 79, "Y": 16}}],
+        "ShopCounters": [{"name": "SeedShop Counter", "position": {"X": 4, "Y": 18}}],
+        "Buildings": [{"name": "FarmHouse", "doorPosition": {"X": 64, "Y": 15}}],
+    }
+
+
+def load_corpus(path: str) -> list:
+    corpus = []
+    with open(path) as f:
+        for line in f:
+            obs = json.loads(line)
+            obs.pop('ScreenShot', None)
+            position = obs['Player']['Position']
+            if isinstance(position, dict):
+                obs['Player']['Position'] = [position['X'], position['Y']]
+            corpus.append(obs)
+    return corpus
+
+
+def record_corpus(path: str, port: int, steps: int, interval: float) -> None:
+    import actions
+    proxy = actions.ActionProxy(port)
+    with open(path, 'w') as f:
+        for _ in range(steps):
+            f.write(json.dumps(json.loads(proxy.observe())) + "\n")
+            time.sleep(interval)
+
+
+def measure(preprocess, corpus: list, repeat: int) -> list:
+    # every run gets fresh copies: both pipelines rename ids in place
+    inputs = [copy.deepcopy(obs) for _ in range(repeat) for obs in corpus]
+    times = []
+    for obs in inputs:
+        start = time.perf_counter()
+        preprocess(obs)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark observation preprocessing")
+    parser.add_argument("--corpus", type=str, default=None, help="JSONL file of recorded observe_v2 observations")
+    parser.add_argument("--record", type=str, default=None, help="Record a corpus from a running game into this file")
+    parser.add_argument("--port", type=int, default=10783)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.record is not None:
+        record_corpus(args.record, args.port, args.steps, args.interval)
+        print(f"recorded {args.steps} observations to {args.record}")
+        return
+
+    corpus = load_corpus(args.corpus) if args.corpus is not None else [synthetic_observation()]
+    space = observation.get_observation_space()
+    spec = observation.compile_observation_space(space)
+    image_paths = []
+
+    expected = legacy_preprocess(copy.deepcopy(corpus[0]), space, image_paths)
+    actual = observation.preprocess_observation(copy.deepcopy(corpus[0]), spec, image_paths)
+    assert json.dumps(expected) == json.dumps(actual), "compiled pipeline output differs from the legacy one"
+
+    results = {
+        "legacy": measure(lambda obs: legacy_preprocess(obs, space, image_paths), corpus, args.repeat),
+        "compiled": measure(lambda obs: observation.preprocess_observation(obs, spec, image_paths), corpus, args.repeat),
+    }
+    for name, times in results.items():
+        print(f"{name:>8}: mean {statistics.mean(times) * 1e6:8.1f} us  "
+              f"median {statistics.median(times) * 1e6:8.1f} us  over {len(times)} observations")
+    speedup = statistics.mean(results["legacy"]) / statistics.mean(results["compiled"])
+    print(f"speedup: {speedup:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+'''
+Per-step payload of observe_delta, before and after diffing lists per element and moving the
+screenshot to the frame segment.
+
+Record a corpus from a running game (one observe_v2 JSON per line, with the screenshot):
+    python env/benchmarks/observe_delta_benchmark.py --record obs_corpus.jsonl --port 10783 --steps 200
+Benchmark it:
+    python env/benchmarks/observe_delta_benchmark.py --corpus obs_corpus.jsonl
+Without --corpus a synthetic walk over a farm is used, with a screenshot of --width x --height RGBA.
+
+The deltas are built here by a transcription of the mod's DiffDeltaState (Actions.cs), before
+and after the change, and every new delta is checked to rebuild the state with
+actions.apply_observation_delta.
+'''
+import argparse
+import copy
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from env import actions
+
+# DeltaListKeys in Actions.cs
+LIST_KEYS = {"SurroundingsData": "position", "Crops": "position", "NPCs": "Name"}
+
+
+def _dumps(value) -> str:
+    # Formatting.None of Newtonsoft
+    return json.dumps(value, separators=(',', ':'))
+
+
+def legacy_delta(previous: dict, current: dict) -> dict:
+    # DiffDeltaState before per-element lists: top-level fields and children of top-level objects
+    changed, removed = [], []
+    for name, value in current.items():
+        before = previous.get(name)
+        if name in previous and before == value:
+            continue
+        if isinstance(before, dict) and isinstance(value, dict):
+            for child, child_value in value.items():
+                if before.get(child) != child_value or child not in before:
+                    changed.append({"Path": [name, child], "Value": child_value})
+            removed.extend([name, child] for child in before if child not in value)
+        else:
+            changed.append({"Path": [name], "Value": value})
+    removed.extend([name] for name in previous if name not in current)
+    return {"Changed": changed, "Removed": removed, "Version": 0, "BaseVersion": 0, "Keyframe": False}
+
+
+def _index(items: list, key: str):
+    index = {}
+    for item in items:
+        if not isinstance(item, dict) or key not in item:
+            return None
+        key_text = _dumps(item[key])
+        if key_text in index:
+            return None
+        index[key_text] = item
+    return index
+
+
+def _list_delta(name: str, key: str, previous: list, current: list):
+    # DiffDeltaList
+    previous_index, current_index = _index(previous, key), _index(current, key)
+    if previous_index is None or current_index is None:
+        return None
+    derived_order, added, unset, set_items = [], [], [], []
+    for item in previous:
+        key_text = _dumps(item[key])
+        if key_text in current_index:
+            derived_order.append(key_text)
+        else:
+            unset.append(item[key])
+    for item in current:
+        key_text = _dumps(item[key])
+        if key_text not in previous_index:
+            set_items.append(item)
+            added.append(key_text)
+        elif previous_index[key_text] != item:
+            set_items.append(item)
+    change = {"Path": [name], "Key": key, "Set": set_items, "Unset": unset}
+    if derived_order + added != [_dumps(item[key]) for item in current]:
+        change["Order"] = [item[key] for item in current]
+    return change
+
+
+def keyed_delta(previous: dict, current: dict) -> dict:
+    delta = legacy_delta(previous, current)
+    for index, change in enumerate(delta["Changed"]):
+        path = change["Path"]
+        if len(path) == 1 and path[0] in LIST_KEYS and isinstance(previous.get(path[0]), list) \
+                and isinstance(change["Value"], list):
+            list_change = _list_delta(path[0], LIST_KEYS[path[0]], previous[path[0]], change["Value"])
+            if list_change is not None:
+                delta["Changed"][index] = list_change
+    return delta
+
+
+def _tile(x: int, y: int) -> dict:
+    rng = random.Random(x * 1000 + y)
+    return {
+        "position": [x, y],
+        "object_at_tile": rng.choice(["", "", "", "Weeds", "Stone", "Twig"]),
+        "terrain_at_tile": rng.choice(["", "", "StardewValley.TerrainFeatures.Grass", "StardewValley.TerrainFeatures.HoeDirt"]),
+        "building_info": "",
+        "tile_properties": rng.choice(["", "Diggable"]),
+        "crop_at_tile": {"seed_id": "472", "index_harvest": "24"} if rng.random() < 0.05 else None,
+        "debris_at_tile": "",
+        "furniture_at_tile": "",
+        "exit_info": "",
+        "npc_info": "",
+        "placeable": rng.random() < 0.7,
+    }
+
+
+def synthetic_walk(steps: int, size: int, width: int, height: int, seed: int) -> list:
+    rng = random.Random(seed)
+    x, y = 60, 15
+    radius = size * 4
+    npcs = [{"Name": f"NPC {i}", "Location": "Town", "Friendship": i * 10, "Position": [i, 40],
+             "isTalked": False, "GiftsToday": 0} for i in range(30)]
+    crops = [{"id": "472", "position": {"X": 40 + i % 10, "Y": 20 + i // 10}, "isWatered": False,
+              "isDead": False, "forage_crop": False, "current_phase": 1} for i in range(80)]
+    screenshot_length = 4 * math.ceil(width * height * 4 / 3)
+    walk = []
+    for step in range(steps):
+        dx, dy = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1), (0, 0)])
+        x, y = x + dx, y + dy
+        for crop in rng.sample(crops, 2):
+            crop["isWatered"] = True
+        for npc in rng.sample(npcs, 5):
+            npc["Position"] = [npc["Position"][0] + rng.choice([-1, 1]), npc["Position"][1]]
+        walk.append({
+            "Player": {"Name": "Farmer", "Health": 100, "Stamina": 270.0 - step, "Money": 500, "Location": "Farm",
+                       "Position": {"X": x, "Y": y}, "FacingDirection": 2, "CurrentInventory": "Hoe",
+                       "Inventory": [{"Name": f"Item {i}", "Quantity": i} for i in range(36)]},
+            "NPCs": copy.deepcopy(npcs),
+            "GameState": {"Time": 600 + 10 * (step // 7), "DayOfMonth": 5, "Season": "spring", "Year": 1, "Weather": "Sunny"},
+            "Farm": {"Animals": [], "Pets": [{"Name": "Dog"}], "Buildings": [{"type": "Coop", "id": "b0"}]},
+            "CurrentMenuData": {"type": "No Menu"},
+            # every frame differs, only its size matters here
+            "ScreenShot": (str(step) * screenshot_length)[:screenshot_length] if screenshot_length else None,
+            "Buildings": [{"name": "FarmHouse", "doorPosition": {"X": 64, "Y": 15}}],
+            "Crops": copy.deepcopy(crops),
+            "Exits": [{"target": "BusStop", "position": {"X": 79, "Y": 16}}],
+            "ShopCounters": [],
+            "MetaData": {"ViewportSize": [width, height], "ScreenShotSize": [width, height], "ScreenShotFormat": 0},
+            "CallBackData": {"OnDayStarted": 1},
+            "SurroundingsData": [_tile(tx, ty) for tx in range(x - radius, x + radius + 1)
+                                 for ty in range(y - radius, y + radius + 1)],
+            "Furnitures": [],
+        })
+    return walk
+
+
+def load_corpus(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def record_corpus(path: str, port: int, steps: int, interval: float) -> None:
+    proxy = actions.ActionProxy(port)
+    with open(path, 'w') as f:
+        for _ in range(steps):
+            f.write(_dumps(json.loads(proxy.observe())) + "\n")
+            time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the observe_delta payload")
+    parser.add_argument("--corpus", type=str, default=None, help="JSONL file of recorded observe_v2 observations")
+    parser.add_argument("--record", type=str, default=None, help="Record a corpus from a running game into this file")
+    parser.add_argument("--port", type=int, default=10783)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--size", type=int, default=3, help="observe size of the synthetic walk")
+    parser.add_argument("--width", type=int, default=1280, help="screenshot width of the synthetic walk, 0 for none")
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.record is not None:
+        record_corpus(args.record, args.port, args.steps, args.interval)
+        print(f"recorded {args.steps} observations to {args.record}")
+        return
+
+    states = load_corpus(args.corpus) if args.corpus is not None else \
+        synthetic_walk(args.steps, args.size, args.width, args.height, args.seed)
+
+    full, before, after = [], [], []
+    client_state = None
+    for previous, current in zip(states, states[1:]):
+        full.append(len(_dumps(current)))
+        before.append(len(_dumps(legacy_delta(previous, current))))
+        previous_fields = dict(previous, ScreenShot=None)
+        current_fields = dict(current, ScreenShot=None)
+        if client_state is None:
+            client_state = copy.deepcopy(previous_fields)
+        delta = keyed_delta(previous_fields, current_fields)
+        after.append(len(_dumps(delta)))
+        client_state = actions.apply_observation_delta(client_state, json.loads(_dumps(delta)))
+        assert _dumps(client_state) == _dumps(current_fields), "patched state differs from the observed one"
+
+    screenshot = states[-1].get("ScreenShot")
+    print(f"{len(before)} steps, screenshot of {len(screenshot) * 3 // 4 if screenshot else 0} bytes per frame")
+    for name, sizes in (("observe_v2", full), ("delta before", before), ("delta after", after)):
+        print(f"{name:>12}: mean {statistics.mean(sizes) / 1024:9.1f} KiB  median {statistics.median(sizes) / 1024:9.1f} KiB")
+    print(f"delta payload: {statistics.mean(before) / statistics.mean(after):.1f}x smaller")
+
+
+if __name__ == '__main__':
+    main()
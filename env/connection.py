@@ -0,0 +1,186 @@
+import select
+import socket
+import struct
+import time
+
+# A session client opens with this preamble so the mod can tell it apart from
+# the legacy one-command-per-connection clients sharing the same port.
+SESSION_MAGIC = b"SDJS\x01"
+
+# request:  request_id (uint32) | payload length (uint32) | utf-8 command
+# response: request_id (uint32) | status (uint8) | payload length (uint32) | payload
+REQUEST_HEADER = struct.Struct("!II")
+RESPONSE_HEADER = struct.Struct("!IBI")
+
+STATUS_OK = 0
+STATUS_SHARED_MEMORY = 1
+STATUS_ERROR = 2
+
+# batch%{"commands": [...], "observe": "observe_v2%3" | null}, see ActionProxy.batch
+BATCH_PREFIX = "batch%"
+
+EOF_MARKER = b"<EOF>"
+RECV_CHUNK_SIZE = 256 * 1024
+SOCKET_RECV_BUFFER = 4 * 1024 * 1024
+
+
+class TransferStats:
+    '''
+    ### Usage
+    Per-command transfer accounting for a proxy. For every command name (the part
+    before the first `%`) it keeps the number of calls, bytes received, the time spent
+    waiting for the first response byte (mostly game-side work) and the time spent
+    receiving the rest of the payload (transfer and framing).
+    '''
+
+    def __init__(self):
+        self.commands = {}
+
+    def record(self, message: str, num_bytes: int, wait_time: float, recv_time: float) -> None:
+        command = message.split('%', 1)[0]
+        entry = self.commands.get(command)
+        if entry is None:
+            entry = {"count": 0, "bytes": 0, "wait_time": 0.0, "recv_time": 0.0, "max_time": 0.0}
+            self.commands[command] = entry
+        entry["count"] += 1
+        entry["bytes"] += num_bytes
+        entry["wait_time"] += wait_time
+        entry["recv_time"] += recv_time
+        entry["max_time"] = max(entry["max_time"], wait_time + recv_time)
+
+    def summary(self) -> dict:
+        summary = {}
+        for command, entry in self.commands.items():
+            count = entry["count"]
+            summary[command] = dict(entry,
+                                    avg_bytes=entry["bytes"] / count,
+                                    avg_time=(entry["wait_time"] + entry["recv_time"]) / count)
+        return summary
+
+    def reset(self) -> None:
+        self.commands = {}
+
+
+def recv_until_eof(sock: socket.socket) -> tuple[bytearray, float]:
+    '''
+    Receive a legacy `<EOF>`-terminated response in linear time: chunks are read with
+    `recv_into` into one reusable buffer and appended to a single bytearray, and only the
+    tail is checked for the marker. Returns the raw bytes (marker included) and the time
+    the first byte arrived.
+    '''
+    response = bytearray()
+    chunk = bytearray(RECV_CHUNK_SIZE)
+    view = memoryview(chunk)
+    first_byte_time = None
+    while True:
+        n = sock.recv_into(view)
+        if n == 0:
+            break
+        if first_byte_time is None:
+            first_byte_time = time.time()
+        response += view[:n]
+        if response.endswith(EOF_MARKER):
+            break
+    return response, first_byte_time or time.time()
+
+
+class MessageSession:
+    '''
+    ### Usage
+    A persistent connection to the StardojoMod server. Every command is sent as a
+    length-prefixed frame tagged with a request id, and the matching response frame
+    is returned, so a whole episode can ride a single TCP connection.
+
+    The connection is (re)established lazily: if the game closed the socket or a
+    previous request failed, the next request reconnects before sending.
+    '''
+
+    def __init__(self, port: int, host: str = '127.0.0.1', max_reconnects: int = 10, stats: TransferStats = None):
+        self.host = host
+        self.port = port
+        self.max_reconnects = max_reconnects
+        self.stats = stats
+        self.sock = None
+        self.next_request_id = 1
+        self.header_buffer = bytearray(RESPONSE_HEADER.size)
+        self.recv_buffer = bytearray(RECV_CHUNK_SIZE)
+
+    def connect(self) -> None:
+        reconnect_time = 0
+        while True:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RECV_BUFFER)
+            result = sock.connect_ex((self.host, self.port))
+            if result == 0:
+                break
+            sock.close()
+            assert reconnect_time <= self.max_reconnects, "reconnect too many time, the game need restart!"
+            print(f"session on port {self.port} reconnecting!", result)
+            reconnect_time += 1
+            time.sleep(0.5)
+
+        sock.sendall(SESSION_MAGIC)
+        self.sock = sock
+
+    def close(self) -> None:
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+    def _is_stale(self) -> bool:
+        # An idle session socket must never be readable: pending data or EOF both
+        # mean the game side went away (or restarted) since the last request.
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _recv_exact(self, buffer: bytearray, size: int) -> memoryview:
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            n = self.sock.recv_into(view[received:size], size - received)
+            if n == 0:
+                raise ConnectionError(f"connection to port {self.port} closed by the game")
+            received += n
+        return view[:size]
+
+    def request(self, message: str, timeout: float) -> tuple[int, memoryview]:
+        '''
+        Send one command and block until its response arrives.
+        Returns (status, payload). The payload is a view over the session's receive
+        buffer and is only valid until the next request; decode or copy it first.
+        On any socket error or timeout the session is closed before the exception
+        propagates, so no stale response can be read by a later request.
+        '''
+        if self.sock is None or self._is_stale():
+            self.close()
+            self.connect()
+
+        request_id = self.next_request_id
+        self.next_request_id = request_id % 0xFFFFFFFF + 1
+        payload = message.encode('utf-8')
+
+        try:
+            self.sock.settimeout(timeout)
+            self.sock.sendall(REQUEST_HEADER.pack(request_id, len(payload)) + payload)
+            sent_time = time.time()
+            while True:
+                response_id, status, length = RESPONSE_HEADER.unpack(
+                    self._recv_exact(self.header_buffer, RESPONSE_HEADER.size))
+                first_byte_time = time.time()
+                if length > len(self.recv_buffer):
+                    self.recv_buffer = bytearray(length)
+                body = self._recv_exact(self.recv_buffer, length)
+                if response_id == request_id:
+                    if self.stats is not None:
+                        self.stats.record(message, RESPONSE_HEADER.size + length,
+                                          first_byte_time - sent_time, time.time() - first_byte_time)
+                    return status, body
+        except Exception:
+            self.close()
+            raise
@@ -1,11 +1,10 @@
 import os.path
 from stardew_env import *
 from agent.stardojo.stardojo_react_agent import *
+from stardojo.utils.encoding_utils import put_image_in_memory
+from stardojo.environment.skill_executor import SkillExecutor
 from tasks.base import *
-import importlib.util
 import types
-import uuid
-import sys
 import logging
 from env.tasks.base import *
 from env.tasks.utils import load_task
@@ -14,51 +13,6 @@ from env.tasks.utils.init_task import InitTaskProxy
 import argparse
 from typing import Any
 
-class SkillExecutor:
-    def __init__(
-        self,
-        actionproxy: Any,
-        module_name: str = "stardojo.environment.stardew.atomic_skills.basic_skills",
-    ) -> None:
-        self.actionproxy = actionproxy
-        self.module_name = module_name
-        self._load_skills()
-
-    def _load_skills(self):
-        
-        unique_id = uuid.uuid4().hex
-        unique_module_name = f"{self.module_name}_{unique_id}"
-
-        
-        if unique_module_name in sys.modules:
-            skill_module = sys.modules[unique_module_name]
-        else:
-            
-            spec = importlib.util.find_spec(self.module_name)
-            if spec is None:
-                raise ImportError(f"Module {self.module_name} not found.")
-
-           
-            skill_module = importlib.util.module_from_spec(spec)
-
-           
-            spec.loader.exec_module(skill_module)
-
-           
-            sys.modules[unique_module_name] = skill_module
-
-        
-        setattr(skill_module, 'actionproxy', self.actionproxy)
-
-       
-        for func_name in dir(skill_module):
-            func = getattr(skill_module, func_name)
-           
-            if callable(func) and not func_name.startswith("__"):
-                
-                setattr(self, func_name, func)
-
-
 class StarDojoLLM(StarDojo):
 
     def __init__(
@@ -72,18 +26,27 @@ class StarDojoLLM(StarDojo):
             image_obs: bool = False,
             needs_pausing: bool = True,
             output_video: bool = False,
+            image_mode: str = None,
     ) -> None:
-        super().__init__(port, save_index, new_game, is_RL, image_save_path, output_video=output_video)
+        # text-only runs skip the screenshot entirely unless a video is recorded
+        if image_mode is None:
+            image_mode = "rgba" if image_obs or output_video else "none"
+        super().__init__(port, save_index, new_game, is_RL, image_save_path, output_video=output_video,
+                         image_mode=image_mode)
         self.agent = agent
         self.task = task
         self.needs_pausing = needs_pausing
         self.skill_executer = SkillExecutor(actionproxy=self.action_proxy)
         self.last_action = None
         self.image_obs = image_obs
+        if image_obs:
+            # screenshots reach the prompt encoder from memory, not by reading the files back
+            self.frame_writer.on_image = put_image_in_memory
         self.step_num = 0
         self.task_proxy = InitTaskProxy(port)
         if task is not None:
             self.action_proxy.wait_for_server()
+            self.apply_image_mode()
             task.init_task(self.task_proxy)
             self.action_proxy.set_mmap_reader()
             self.agent.reconfigure_root_logger(port=None, task=None)
@@ -255,6 +218,9 @@ class StarDojoLLM(StarDojo):
         if self.needs_pausing:
             logging.log(logging.INFO, f"Starting to plan, the game is paused.")
             self.action_proxy.pause_game()
+        if self.image_obs:
+            # on_image runs on the writer thread: wait until the screenshots are cached for the planner
+            self.frame_writer.flush()
         try:
             skill_steps = self.agent.run_planning(obs, image_obs=self.image_obs, step_num = self.step_num)
         except Exception as e:
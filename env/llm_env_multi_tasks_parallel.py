@@ -1,20 +1,24 @@
 import logging
-import importlib.util
-import uuid
-import sys
 
 from stardew_env import *
 from agent.stardojo.stardojo_react_agent import *
+from stardojo.utils.encoding_utils import put_image_in_memory
+from stardojo.environment.skill_executor import SkillExecutor
+from stardojo.utils.env_context import EnvContext
 from tasks.base import *
 from env.tasks.utils import load_task
 import env.tasks.open as debug_task
 from env.tasks.utils.init_task import InitTaskProxy
+from env.utils.game_pool import GamePool
 from typing import Any
 from pathlib import Path
 import logging
 from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type, Union
 import argparse
 import multiprocessing as mp
+from multiprocessing.connection import wait
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED
+from concurrent.futures import wait as wait_futures
 from queue import Empty
 from multiprocessing import Manager
 from stable_baselines3.common.vec_env.base_vec_env import (
@@ -54,6 +58,10 @@ def _worker(
             elif cmd == "pipeline_shutdown":
                 result = env.pipeline_shutdown()
                 remote.send((result))
+            elif cmd == "close":
+                env.close()
+                remote.close()
+                break
             elif cmd == "_get_obs":
                 observation = env._get_obs()
                 remote.send((observation))
@@ -89,6 +97,10 @@ class SubprocVecEnv():
     :param start_method: method used to start the subprocesses.
            Must be one of the methods returned by multiprocessing.get_all_start_methods().
            Defaults to 'forkserver' on available platforms, and 'spawn' otherwise.
+
+    step() advances every environment in lockstep, so each round waits for the slowest one.
+    step_async() and poll_ready() let each environment advance on its own: start a step on
+    some environments, collect whichever finish first and start their next step right away.
     """
 
     def __init__(self, env_fns: List[Callable[[], gym.Env]], start_method: Optional[str] = None, task_queue: mp.Queue = None,):
@@ -119,6 +131,15 @@ class SubprocVecEnv():
         self._seeds: List[Optional[int]] = [None for _ in range(self.num_envs)]
         # options to be used in the next call to env.reset()
         self._options: List[Dict[str, Any]] = [{} for _ in range(self.num_envs)]
+        # environments with a step sent by step_async and not yet collected by poll_ready
+        self.pending: set = set()
+
+    def _get_indices(self, indices: VecEnvIndices = None) -> List[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
 
     def reset(self, ):
         for env_idx, remote in enumerate(self.remotes):
@@ -159,6 +180,9 @@ class SubprocVecEnv():
         return results
 
     def pipeline_shutdown(self):
+        # collect the steps still running, so their results are not read as the replies below
+        while self.pending:
+            self.poll_ready()
         for env_idx, remote in enumerate(self.remotes):
             try:
                 remote.send(("pipeline_shutdown", None))
@@ -177,6 +201,23 @@ class SubprocVecEnv():
                 results.append(None) 
         return results
 
+    def close(self) -> None:
+        '''
+        Tear the environments down once no task is left and wait for the workers to exit.
+        '''
+        if self.closed:
+            return
+        while self.pending:
+            self.poll_ready()
+        for env_idx, remote in enumerate(self.remotes):
+            try:
+                remote.send(("close", None))
+            except Exception as e:
+                print(f"Error sending data to remote {env_idx}: {e}")
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
     def step(self,):
         for env_idx, remote in enumerate(self.remotes):
             remote.send(("step", None))
@@ -188,14 +229,46 @@ class SubprocVecEnv():
         
         return obs, rews, dones, truncated, infos
 
-    def get_queue_empty_attri(self):
-        for env_idx, remote in enumerate(self.remotes):
+    def step_async(self, indices: VecEnvIndices = None) -> None:
+        '''
+        Start a step on the environments of indices (all by default) without waiting for it.
+        Environments whose previous step was not collected yet are skipped.
+        '''
+        for env_idx in self._get_indices(indices):
+            if env_idx in self.pending:
+                continue
+            self.remotes[env_idx].send(("step", None))
+            self.pending.add(env_idx)
+
+    def poll_ready(self, timeout: Optional[float] = None) -> List[Tuple[int, Any]]:
+        '''
+        Wait until at least one pending step finished, or timeout seconds, and return
+        (env_idx, (obs, reward, terminated, truncated, info)) for every finished step.
+        The result is None for an environment whose worker exited.
+        '''
+        if not self.pending:
+            return []
+        remote_to_idx = {self.remotes[env_idx]: env_idx for env_idx in self.pending}
+        results = []
+        for remote in wait(list(remote_to_idx), timeout=timeout):
+            env_idx = remote_to_idx[remote]
+            self.pending.discard(env_idx)
+            try:
+                results.append((env_idx, remote.recv()))
+            except EOFError:
+                print(f"Remote {env_idx} connection closed unexpectedly.")
+                results.append((env_idx, None))
+        return sorted(results, key=lambda item: item[0])
+
+    def get_queue_empty_attri(self, indices: VecEnvIndices = None):
+        remotes = [(env_idx, self.remotes[env_idx]) for env_idx in self._get_indices(indices)]
+        for env_idx, remote in remotes:
             try:
                 remote.send(("get_queue_empty_attri", None))
             except Exception as e:
                 print(f"Error sending data to remote {env_idx}: {e}")
         results = []
-        for env_idx, remote in enumerate(self.remotes):
+        for env_idx, remote in remotes:
             try:
                 result = remote.recv()
                 results.append(result)
@@ -208,39 +281,92 @@ class SubprocVecEnv():
         return results
 
 
-class SkillExecutor:
-    def __init__(
-        self,
-        actionproxy: Any,
-        module_name: str = "stardojo.environment.stardew.atomic_skills.basic_skills",
-    ) -> None:
-        self.actionproxy = actionproxy
-        self.module_name = module_name
-        self._load_skills()
+class ThreadVecEnv():
+    """
+    Runs the environments as threads of this process instead of one process each, with the
+    interface of SubprocVecEnv. Every environment gets its own EnvContext, entered around each
+    call, so it sees its own Config, Logger, LocalMemory, IOEnvironment and providers while
+    sharing the interpreter, the imported modules and the process-wide caches.
 
-    def _load_skills(self):
-        unique_id = uuid.uuid4().hex
-        unique_module_name = f"{self.module_name}_{unique_id}"
+    A step is almost entirely socket round-trips and LLM requests, which release the GIL, so
+    the threads overlap like processes would at a fraction of the memory and startup cost.
+    """
 
-        if unique_module_name in sys.modules:
-            skill_module = sys.modules[unique_module_name]
-        else:
-            spec = importlib.util.find_spec(self.module_name)
-            if spec is None:
-                raise ImportError(f"Module {self.module_name} not found.")
+    def __init__(self, env_fns: List[Callable[[], gym.Env]], task_queue: mp.Queue = None,):
+        self.num_envs = len(env_fns)
+        self.executor = ThreadPoolExecutor(max_workers=self.num_envs, thread_name_prefix="env")
+        self.contexts = [EnvContext(name=f"env{env_idx}") for env_idx in range(self.num_envs)]
+        self.envs = [None] * self.num_envs
+        for env_idx, env_fn in enumerate(env_fns):
+            self.envs[env_idx] = self.contexts[env_idx].run(lambda: _patch_env(env_fn()))
+            self.envs[env_idx].set_task_queue(task_queue)
+        # future of each step sent by step_async and not yet collected by poll_ready
+        self.pending: Dict[int, Any] = {}
+
+    def _get_indices(self, indices: VecEnvIndices = None) -> List[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    def _submit(self, env_idx: int, method: str):
+        return self.executor.submit(self.contexts[env_idx].run, getattr(self.envs[env_idx], method))
+
+    def _result(self, env_idx: int, future):
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error in env {env_idx}: {e}")
+            return None
 
-            skill_module = importlib.util.module_from_spec(spec)
+    def _call(self, method: str, indices: VecEnvIndices = None) -> list:
+        futures = [(env_idx, self._submit(env_idx, method)) for env_idx in self._get_indices(indices)]
+        return [self._result(env_idx, future) for env_idx, future in futures]
 
-            spec.loader.exec_module(skill_module)
+    def reset(self, ):
+        return self._call("reset")
+
+    def _get_obs(self):
+        return self._call("_get_obs")
+
+    def set_agent(self, ):
+        return self._call("set_agent")
+
+    def pipeline_shutdown(self):
+        while self.pending:
+            self.poll_ready()
+        return self._call("pipeline_shutdown")
+
+    def close(self) -> None:
+        while self.pending:
+            self.poll_ready()
+        self._call("close")
+        self.executor.shutdown(wait=False)
+
+    def step(self,):
+        obs, rews, dones, truncated, infos = zip(*self._call("step"))
+        return obs, rews, dones, truncated, infos
 
-            sys.modules[unique_module_name] = skill_module
+    def step_async(self, indices: VecEnvIndices = None) -> None:
+        for env_idx in self._get_indices(indices):
+            if env_idx not in self.pending:
+                self.pending[env_idx] = self._submit(env_idx, "step")
 
-        setattr(skill_module, 'actionproxy', self.actionproxy)
+    def poll_ready(self, timeout: Optional[float] = None) -> List[Tuple[int, Any]]:
+        if not self.pending:
+            return []
+        future_to_idx = {future: env_idx for env_idx, future in self.pending.items()}
+        done, _ = wait_futures(future_to_idx, timeout=timeout, return_when=FIRST_COMPLETED)
+        results = []
+        for future in done:
+            env_idx = future_to_idx[future]
+            del self.pending[env_idx]
+            results.append((env_idx, self._result(env_idx, future)))
+        return sorted(results, key=lambda item: item[0])
 
-        for func_name in dir(skill_module):
-            func = getattr(skill_module, func_name)
-            if callable(func) and not func_name.startswith("__"):
-                setattr(self, func_name, func)
+    def get_queue_empty_attri(self, indices: VecEnvIndices = None):
+        return self._call("get_queue_empty_attri", indices)
 
 
 class StarDojoLLM(StarDojo):
@@ -262,12 +388,21 @@ class StarDojoLLM(StarDojo):
             use_task_inference= False,
             envconfig = None,
             output_video: bool = False,
+            persistent_connection: bool = False,
+            binary_observation: bool = False,
+            delta_observation: bool = False,
+            image_mode: str = None,
+            spare_ports: list = None,
     ) -> None:
-        
-        time.sleep(env_id * 0.3)
         self.log_dir_name = str(port) + str(time.time())
-        super().__init__(port, save_index, new_game, is_RL, image_save_path, output_video=output_video)
-        time.sleep(5)
+        # text-only runs skip the screenshot entirely unless a video is recorded
+        if image_mode is None:
+            image_mode = "rgba" if image_obs or output_video else "none"
+        super().__init__(port, save_index, new_game, is_RL, image_save_path, output_video=output_video,
+                         persistent_connection=persistent_connection, binary_observation=binary_observation,
+                         delta_observation=delta_observation, image_mode=image_mode)
+        # a launched game already accepts connections, an attached one may still be starting
+        self.action_proxy.wait_for_server()
         self.agent = None 
         self.task = None
         self.needs_pausing = needs_pausing
@@ -275,7 +410,10 @@ class StarDojoLLM(StarDojo):
         self.skill_executer = None
         self.last_action = None
         self.image_obs = image_obs
-        self.task_proxy = InitTaskProxy(port)
+        if image_obs:
+            # screenshots reach the prompt encoder from memory, not by reading the files back
+            self.frame_writer.on_image = put_image_in_memory
+        self.task_proxy = InitTaskProxy(port, persistent=persistent_connection)
 
         self.config = None
         self.logger = None
@@ -295,6 +433,10 @@ class StarDojoLLM(StarDojo):
         self.if_task_queue_empty = False
         self.current_task_finsh = True
         self.task_config = None
+        # the game launched by __init__ has not run a task yet, so the first reset can use it as is
+        self.fresh_game = new_game
+        # spare games launched ahead of time, swapped in when a task needs a fresh game
+        self.game_pool = GamePool(spare_ports, launch_game, find_and_kill_process_by_port) if new_game and spare_ports else None
 
     def get_queue_empty_attri(self):
         return self.if_task_queue_empty
@@ -302,9 +444,17 @@ class StarDojoLLM(StarDojo):
     def set_task_queue(self, task_queue):
         self.task_queue = task_queue
 
+    def switch_port(self, port: int) -> None:
+        self.port = port
+        self.action_proxy.close()
+        self.action_proxy = actions.ActionProxy(port, persistent=self.persistent_connection)
+        self.skill_executer = SkillExecutor(actionproxy=self.action_proxy)
+        self.task_proxy.close()
+        self.task_proxy = InitTaskProxy(port, persistent=self.persistent_connection)
+
     def reset(self, ) -> bool:
-        time.sleep(self.env_id * 0.3)
-        self.action_proxy = actions.ActionProxy(self.port)
+        self.action_proxy.close()
+        self.action_proxy = actions.ActionProxy(self.port, persistent=self.persistent_connection)
         self.skill_executer = SkillExecutor(actionproxy=self.action_proxy)
 
         try:
@@ -320,36 +470,15 @@ class StarDojoLLM(StarDojo):
 
             self.task = task
 
-            if self.new_game and os_type == "Linux":
-                while not is_port_available(self.port):  
-                    find_and_kill_process_by_port(range(self.port, self.port + 1))
-                while is_port_available(self.port):  
-                    if os_type == "Linux":
-                        subprocess.Popen(
-                            ["xvfb-run", "-a", "-s", f"-screen 0 1280x720x24", LAUNCH_PATH, PORT_ARG, str(self.port),
-                             SAMPLE_RATE, "100"],
-                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL, )
-                    elif os_type == "Windows":
-
-                        startupinfo = subprocess.STARTUPINFO()
-                        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                        startupinfo.wShowWindow = win32con.SW_HIDE 
-
-                        subprocess.Popen([LAUNCH_PATH, PORT_ARG, str(self.port), SAMPLE_RATE, "100", "--background"],
-                                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
-                                         stderr=subprocess.DEVNULL,
-                                         startupinfo=startupinfo)
-
-                    elif os_type == "Darwin":
-                        subprocess.Popen([LAUNCH_PATH, PORT_ARG, str(self.port), SAMPLE_RATE, "100"],
-                                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
-                                         stderr=subprocess.DEVNULL, )
-                    self.action_proxy = actions.ActionProxy(self.port)
-                    self.action_proxy.wait_for_server()
-                    time.sleep(1)
+            if self.new_game and not self.fresh_game:
+                if self.game_pool is not None:
+                    self.switch_port(self.game_pool.swap(self.port))
+                elif os_type == "Linux":
+                    launch_game(self.port)
+            self.fresh_game = False
 
             self.action_proxy.wait_for_server()
+            self.apply_image_mode()
             self.task.init_task(self.task_proxy)
             self.step_num = 0
             self.terminated = False
@@ -376,9 +505,18 @@ class StarDojoLLM(StarDojo):
         return  True
 
     def pipeline_shutdown(self):
+        self.logger.write(f"Port {self.port}: transfer stats {self.action_proxy.get_transfer_stats()}")
         self.agent.pipeline_shutdown()
+        # the video spans all tasks of this environment, it is finalized by close()
+        self.frame_writer.flush()
         return None
 
+    def close(self):
+        # final teardown, once no task is left; pipeline_shutdown runs after every task
+        self.frame_writer.close()
+        if self.game_pool is not None:
+            self.game_pool.close()
+
     def get_last_part(self, s):
         if isinstance(s, str):
             return s.split('.')[-1]
@@ -567,6 +705,9 @@ class StarDojoLLM(StarDojo):
                 if self.needs_pausing:
                     self.logger.write(f"Port {self.port}: Starting to plan, the game is paused.")
                     self.action_proxy.pause_game()
+                if self.image_obs:
+                    # on_image runs on the writer thread: wait until the screenshots are cached for the planner
+                    self.frame_writer.flush()
                 try:
                     skill_steps = self.agent.run_planning(obs, step_num=self.step_num, image_obs=self.image_obs)
                 except Exception as e:
@@ -652,6 +793,13 @@ if __name__ == "__main__":
     parser.add_argument("--parallel_numb", type=int, default=1)
     parser.add_argument("--start_port", type=int, default=10783)
     parser.add_argument("--task_params", type=str, default='[{"type": "farming", "id": 0}]', help="Task queue config (JSON list)")
+    parser.add_argument("--persistent_connection", action="store_true", help="Keep one session connection per game instead of one socket per command")
+    parser.add_argument("--binary_observation", action="store_true", help="Receive observations as CBOR plus a raw shared-memory frame instead of JSON")
+    parser.add_argument("--delta_observation", action="store_true", help="Receive only the changed parts of the JSON observation, with periodic keyframes")
+    parser.add_argument("--image_mode", type=str, default=None, choices=["rgba", "gray", "jpeg", "none"], help="Screenshot produced by the mod (default: rgba for image agents, none otherwise)")
+    parser.add_argument("--warm_games", type=int, default=0, help="Spare games kept launched per environment, swapped in when a task starts")
+    parser.add_argument("--async_envs", action="store_true", help="Step each environment as soon as its previous step finished instead of in lockstep")
+    parser.add_argument("--threads", action="store_true", help="Run the environments as threads of one process instead of one process each")
     args = parser.parse_args()
 
     llmProviderConfig = args.llm_config
@@ -664,6 +812,8 @@ if __name__ == "__main__":
 
     env_params = []
     port = args.start_port
+    # spare games listen on the ports after the ones of the environments
+    spare_port = args.start_port + args.parallel_numb
     for i in range(args.parallel_numb):
         each_env_params = {
             'port': port,
@@ -678,34 +828,65 @@ if __name__ == "__main__":
             "use_self_reflection": False,
             "use_task_inference": False,
             "envconfig": envConfig,
+            "persistent_connection": args.persistent_connection,
+            "binary_observation": args.binary_observation,
+            "delta_observation": args.delta_observation,
+            "image_mode": args.image_mode,
+            "spare_ports": [spare_port + i * args.warm_games + k for k in range(args.warm_games)],
         }
         env_params.append(each_env_params)
         port += 1
 
-    ports_to_clear = range(args.start_port, args.start_port + len(env_params))
+    ports_to_clear = range(args.start_port, spare_port + args.parallel_numb * args.warm_games)
     find_and_kill_process_by_port(ports_to_clear)
 
     def make_env(params):
         return lambda: StarDojoLLM(**params)
 
-    env = SubprocVecEnv([make_env(p) for p in env_params], start_method=start_method, task_queue=task_list)
+    if args.threads:
+        env = ThreadVecEnv([make_env(p) for p in env_params], task_queue=task_list)
+    else:
+        env = SubprocVecEnv([make_env(p) for p in env_params], start_method=start_method, task_queue=task_list)
 
     env.reset()
     env.set_agent()
 
-    task_list_empty = False
-    finished = False
-    while (not task_list_empty) | (not finished):
-        try:
-            obs, reward, terminated_each, truncated_each, info = env.step()
-            queue_empty = env.get_queue_empty_attri()
-            task_list_empty = np.any(np.array(queue_empty))
-            finished = np.all(np.array(terminated_each) | np.array(truncated_each))
-
-        except KeyboardInterrupt:
-            logging.error('KeyboardInterrupt Ctrl+C detected, exiting.')
-            env.pipeline_shutdown()
-            find_and_kill_process_by_port(ports_to_clear)
-            break
-
-
+    if args.async_envs:
+        # an environment is retired once it is done and found no task left to reset into
+        active = set(range(env.num_envs))
+        env.step_async()
+        while active:
+            try:
+                for env_idx, result in env.poll_ready():
+                    if result is None:
+                        active.discard(env_idx)
+                        continue
+                    obs, reward, terminated, truncated, info = result
+                    if (terminated or truncated) and env.get_queue_empty_attri(indices=[env_idx])[0]:
+                        active.discard(env_idx)
+                    else:
+                        env.step_async(indices=[env_idx])
+
+            except KeyboardInterrupt:
+                logging.error('KeyboardInterrupt Ctrl+C detected, exiting.')
+                env.pipeline_shutdown()
+                find_and_kill_process_by_port(ports_to_clear)
+                break
+
+    else:
+        task_list_empty = False
+        finished = False
+        while (not task_list_empty) | (not finished):
+            try:
+                obs, reward, terminated_each, truncated_each, info = env.step()
+                queue_empty = env.get_queue_empty_attri()
+                task_list_empty = np.any(np.array(queue_empty))
+                finished = np.all(np.array(terminated_each) | np.array(truncated_each))
+
+            except KeyboardInterrupt:
+                logging.error('KeyboardInterrupt Ctrl+C detected, exiting.')
+                env.pipeline_shutdown()
+                find_and_kill_process_by_port(ports_to_clear)
+                break
+
+    env.close()
@@ -1,6 +1,24 @@
 from gymnasium import spaces
 import numpy as np
 import json
+import os
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+object_id_path = os.path.join(base_dir, 'game_data/Objects.json')
+# item id -> display name, built once at import
+_object_names = {object_id: entry["Name"] for object_id, entry in json.load(open(object_id_path))["content"].items()}
+# raw debris value -> display name (or the value itself when it is not a known item), filled lazily
+_debris_names = {}
+
+BASIC_KNOWLEDGE = (
+    "1. Hoe is used to till the soil, Watering Can is used to water the soil, Pickaxe is used to break rocks, Axe is used to chop trees, Scythe is used to harvest crops.",
+    "2. When you want to go through a door, move in front of it by 1 tile, and interact towards it.",
+    "3. Please go to bed at night (after 18:00) even if your task is not yet complete!",
+    "4. Call interact(direction) with a box, a shipping bin or anything else. Call use(direction) to use an item or tool in your inventory.",
+    #"5. You have to wait multiple days for harvest before you plant crops."
+)
+DIRECTION_TEXT = {0: 'up', 1: 'right', 2: 'down', 3: 'left'}
+_EMPTY_TYPES = (str, list)
 
 
 def get_observation_space():
@@ -107,3 +125,154 @@ def fill_observation_space(data, space):
                 for i in range(len(data[key])):
                     if isinstance(data[key][i], dict) and isinstance(sub_space.feature_space, spaces.Dict):
                         fill_observation_space(data[key][i], sub_space.feature_space.spaces)
+
+
+def _default_value(sub_space):
+    if isinstance(sub_space, spaces.Sequence):
+        return list
+    if isinstance(sub_space, spaces.Discrete):
+        return lambda: 0
+    if isinstance(sub_space, spaces.Box):
+        value = float(sub_space.low if sub_space.low.size == 1 else 0)
+        return lambda: value
+    if isinstance(sub_space, spaces.Text):
+        return str
+    return None
+
+
+def compile_observation_space(space) -> dict:
+    '''
+    Flatten a gym Dict space into the table walked by `fill_and_lower_keys`:
+    key -> (lowercased key, default factory, dict spec, sequence item spec).
+    Dict fields have no default factory, their default is the filled dict spec itself.
+    '''
+    if isinstance(space, spaces.Dict):
+        space = space.spaces
+    spec = {}
+    for key, sub_space in space.items():
+        dict_spec = compile_observation_space(sub_space) if isinstance(sub_space, spaces.Dict) else None
+        item_spec = None
+        if isinstance(sub_space, spaces.Sequence) and isinstance(sub_space.feature_space, spaces.Dict):
+            item_spec = compile_observation_space(sub_space.feature_space)
+        spec[key] = (key.lower(), _default_value(sub_space), dict_spec, item_spec)
+    return spec
+
+
+def _fill_items(items: list, spec: dict) -> None:
+    # items of a sequence keep their keys, only missing fields are added (in place)
+    for item in items:
+        if isinstance(item, dict):
+            for key, (_, default, dict_spec, item_spec) in spec.items():
+                if key not in item:
+                    item[key] = default() if default is not None else {}
+                value = item[key]
+                if dict_spec is not None and isinstance(value, dict):
+                    _fill_items([value], dict_spec)
+                elif item_spec is not None and isinstance(value, list):
+                    _fill_items(value, item_spec)
+
+
+def _lower_keys(data: dict) -> dict:
+    new = {}
+    for k, v in data.items():
+        new[k.lower() if isinstance(k, str) else k] = _lower_keys(v) if isinstance(v, dict) else v
+    return new
+
+
+def fill_and_lower_keys(data: dict, spec: dict) -> dict:
+    '''
+    Single pass over an observation: returns a copy of every nested dict with lowercased keys.
+    The fields of the compiled space that are missing are added to `data` itself with their
+    default value, so both carry them. Lists are shared with `data`; dicts inside sequences
+    keep their keys and are filled in place.
+    '''
+    for key, (_, default, _, _) in spec.items():
+        if key not in data:
+            data[key] = default() if default is not None else {}
+    new = {}
+    for k, v in data.items():
+        field = spec.get(k)
+        if field is None:
+            new[k.lower() if isinstance(k, str) else k] = _lower_keys(v) if isinstance(v, dict) else v
+            continue
+        lower_key, _, dict_spec, item_spec = field
+        if isinstance(v, dict):
+            new[lower_key] = fill_and_lower_keys(v, dict_spec) if dict_spec is not None else _lower_keys(v)
+        else:
+            if item_spec is not None and isinstance(v, list):
+                _fill_items(v, item_spec)
+            new[lower_key] = v
+    return new
+
+
+def _debris_name(debris: str) -> str:
+    name = _debris_names.get(debris)
+    if name is None:
+        name = _object_names.get(debris.strip('(O)'), debris)
+        _debris_names[debris] = name
+    return name
+
+
+def preprocess_observation(obs: dict, spec: dict, image_paths) -> dict:
+    '''
+    ### Observation preprocesser
+    Turn a raw observation into the flat, lowercased dict handed to agents: defaults of `spec`
+    are filled, item ids in the surroundings and crops are replaced by names (in place, so
+    `surroundingsdata` carries them too), empty tile fields are dropped from `surroundings` and
+    the summary fields (health, inventory, time, ...) are added.
+
+    `obs` itself ends up filled and carrying the summary fields, as the RL side expects.
+    '''
+    processed = fill_and_lower_keys(obs, spec)
+
+    info_list = []
+    for info in obs["SurroundingsData"]:
+        crop_at_tile = info.get("crop_at_tile")
+        if crop_at_tile and crop_at_tile.get("seed_id") in _object_names:
+            crop_at_tile["seed_name"] = _object_names[crop_at_tile.pop("seed_id")]
+
+        debris = info.get("debris_at_tile")
+        if debris:
+            info["debris_at_tile"] = _debris_name(debris)
+
+        # drop '' and [] fields; the truth test settles most values without a comparison
+        info_list.append({key: value for key, value in info.items() if value or type(value) not in _EMPTY_TYPES})
+
+    crops = obs["Crops"]
+    for crop in crops:
+        crop_id = crop.get("id")
+        if crop_id in _object_names:
+            crop["id"] = _object_names[crop_id]
+
+    player = obs["Player"]
+    game_state = obs["GameState"]
+    farm = obs["Farm"]
+    summary = {
+        'basic_knowledge': list(BASIC_KNOWLEDGE),
+        "health": str(player["Health"]),
+        "energy": str(player["Stamina"]),
+        "money": str(player["Money"]),
+        "location": player["Location"],
+        "position": player["Position"],
+        "facing_direction": DIRECTION_TEXT.get(player["FacingDirection"], 'unknown'),
+        "inventory": player["Inventory"],
+        "chosen_item": player["CurrentInventory"],
+        "time": str(game_state["Time"]),
+        "day": str(game_state["DayOfMonth"]),
+        "season": game_state["Season"],
+        "farm_animals": farm["Animals"],
+        "farm_pets": farm["Pets"],
+        "farm_buildings": farm["Buildings"],
+        "image_paths": image_paths,
+        "surroundings": info_list,
+        "crops": crops,
+        "exits": [],
+        "buildings": obs["Buildings"],
+        "furniture": obs["Furnitures"],
+        "npcs": obs["NPCs"],
+        "shop_counters": obs["ShopCounters"],
+        "current_menu": obs["CurrentMenuData"],
+    }
+    obs.update(summary)
+    processed.update(summary, current_menu=processed["currentmenudata"])
+    return processed
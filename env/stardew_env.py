@@ -13,6 +13,7 @@ sys.path.append(os.path.dirname((os.path.abspath(__file__))))
 import observation
 import actions
 from env.utils.utils import *
+from env.utils.frame_writer import FrameWriter
 import subprocess
 import platform
 from PIL import Image
@@ -30,8 +31,6 @@ STARDEW_APP_PATH = os.getenv("STARDEW_APP_PATH")
 mod_path = STARDEW_APP_PATH
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
-object_id_path = os.path.join(base_dir, 'game_data/Objects.json')
-_object_id_map = json.load(open(object_id_path))["content"]
 
 os_type = platform.system()
 print(f"os_type: {os_type}")
@@ -142,6 +141,34 @@ def get_game_hwnd(original_title):
     return hwnd
 
 
+def launch_game(port: int) -> None:
+    # replace whatever listens on the port with a fresh game and block until its server accepts connections
+    while not is_port_available(port):
+        find_and_kill_process_by_port(range(port, port + 1))
+    while is_port_available(port):
+        if os_type == "Linux":
+            subprocess.Popen(["xvfb-run", "-a", "-s", f"-screen 0 1280x720x24", LAUNCH_PATH, PORT_ARG, str(port), SAMPLE_RATE, "100"],
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL,)
+        elif os_type == "Windows":
+
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = win32con.SW_HIDE
+
+            subprocess.Popen([LAUNCH_PATH, PORT_ARG, str(port), SAMPLE_RATE, "100", "--background"],
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL,
+                             startupinfo=startupinfo)
+
+        elif os_type == "Darwin":
+            subprocess.Popen([LAUNCH_PATH, PORT_ARG, str(port), SAMPLE_RATE, "100"],
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, )
+        action_proxy = actions.ActionProxy(port)
+        action_proxy.wait_for_server()
+
+
 class StarDojo(gym.Env):
     def __init__(
             self, port: int = 5000,
@@ -152,43 +179,40 @@ class StarDojo(gym.Env):
             saved_game_file_name: str = None,
             observe_size: int = 3,
             output_video: bool = False,
-            max_image_storage: int = 2
+            max_image_storage: int = 2,
+            persistent_connection: bool = False,
+            binary_observation: bool = False,
+            delta_observation: bool = False,
+            keyframe_interval: int = 50,
+            image_mode: str = "rgba",
+            image_scale: int = 1,
+            image_crop: tuple = None
         ) -> None:
         super(StarDojo, self).__init__()
         self.new_game = new_game
         self.port = port
+        self.persistent_connection = persistent_connection
+        self.binary_observation = binary_observation
+        # JSON observations patched from per-step deltas, with a full keyframe every keyframe_interval steps
+        self.delta_observation = delta_observation and not binary_observation
+        self.keyframe_interval = keyframe_interval
+        self.obs_state = None
+        self.obs_version = 0
+        self.deltas_since_keyframe = 0
+        # screenshot produced by the mod: rgba, gray, jpeg or none, see ActionProxy.set_image_mode
+        self.image_mode = image_mode
+        self.image_scale = image_scale
+        self.image_crop = image_crop
         if new_game:
-            while not is_port_available(self.port): 
-                find_and_kill_process_by_port(range(self.port, self.port + 1))
-            while is_port_available(self.port):  
-                if os_type == "Linux":
-                    subprocess.Popen(["xvfb-run", "-a", "-s", f"-screen 0 1280x720x24", LAUNCH_PATH, PORT_ARG, str(self.port), SAMPLE_RATE, "100"],
-                                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
-                                     stderr=subprocess.DEVNULL,)
-                elif os_type == "Windows":
-
-                    startupinfo = subprocess.STARTUPINFO()
-                    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                    startupinfo.wShowWindow = win32con.SW_HIDE  
-
-                    subprocess.Popen([LAUNCH_PATH, PORT_ARG, str(self.port), SAMPLE_RATE, "100", "--background"],
-                                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
-                                     stderr=subprocess.DEVNULL,
-                                     startupinfo=startupinfo)
-
-                elif os_type == "Darwin":
-                    subprocess.Popen([LAUNCH_PATH, PORT_ARG, str(self.port), SAMPLE_RATE, "100"],
-                                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
-                                     stderr=subprocess.DEVNULL, )
-                action_proxy = actions.ActionProxy(self.port)
-                action_proxy.wait_for_server()
+            launch_game(self.port)
 
         # time.sleep(1)
 
         self.save_index = save_index
         self.action_space = gym.spaces.MultiDiscrete([2, 2, 8, 150, 36, 5, 1, 200, 200, 1000])
         self.observation_space = observation.get_observation_space()
-        self.action_proxy =  actions.ActionProxy(self.port)
+        self.observation_spec = observation.compile_observation_space(self.observation_space)
+        self.action_proxy =  actions.ActionProxy(self.port, persistent=self.persistent_connection)
         self.is_RL = is_RL
         self.image_save_path = image_save_path
         self.obs = {}
@@ -200,7 +224,7 @@ class StarDojo(gym.Env):
 
         self.output_video_path = f'output_{datetime.datetime.now().strftime("%m-%d %H:%M:%S")}.mp4'  
         self.frame_rate = 30 
-        self.video_writer = None
+        self.frame_writer = FrameWriter(self.output_video_path if output_video else None, self.frame_rate)
         self.output_video = output_video
 
     def reset(
@@ -208,44 +232,93 @@ class StarDojo(gym.Env):
             seed = 42,
             options = None
         ) -> dict:
-        self.action_proxy = actions.ActionProxy(self.port)
+        self.action_proxy.close()
+        self.action_proxy = actions.ActionProxy(self.port, persistent=self.persistent_connection)
         self.action_proxy.set_mmap_reader()
         # We need the following line to seed self.np_random
         super().reset(seed=seed)
 
         self.obs = {}
+        self.obs_state = None
+        self.obs_version = 0
         self.action_proxy.wait_for_server()
+        self.apply_image_mode()
         self.action_proxy.load_game_record(self.saved_game_file_name)
         self.action_proxy.wait_game_start()
 
         return self._get_obs()
 
     def exit(self):
-        if self.video_writer is not None:
-            self.video_writer.release()
-            cv2.destroyAllWindows()
-            self.video_writer = None
+        self.action_proxy.close()
+        # flush pending screenshots and finalize the video
+        self.frame_writer.close()
+
+    def apply_image_mode(self):
+        self.action_proxy.set_image_mode(self.image_mode, self.image_scale, self.image_crop)
+
+    def _observe_message(self) -> str:
+        if self.binary_observation:
+            return f"observe_binary%{self.observe_size}"
+        if self.delta_observation:
+            return f"observe_delta%{self.observe_size}%{self._delta_base_version()}"
+        return "observe_v2%3"
+
+    def _delta_base_version(self) -> int:
+        # asking from version 0 makes the mod send a keyframe
+        if self.obs_state is None or self.deltas_since_keyframe >= self.keyframe_interval:
+            return 0
+        return self.obs_version
+
+    def _patch_obs(self, delta_raw: str) -> dict:
+        delta = json.loads(delta_raw)
+        if not delta["Keyframe"] and delta["BaseVersion"] != self.obs_version:
+            print(f"observation delta based on version {delta['BaseVersion']}, local state is {self.obs_version}, resyncing")
+            delta = json.loads(self.action_proxy.observe_delta(0, self.observe_size))
+        self.obs_state = actions.apply_observation_delta(self.obs_state, delta)
+        self.obs_version = delta["Version"]
+        self.deltas_since_keyframe = 0 if delta["Keyframe"] else self.deltas_since_keyframe + 1
+        # the cached subtrees are shared with the returned observation: copy what _get_obs rewrites
+        obs_json = dict(self.obs_state)
+        obs_json['Player'] = dict(obs_json['Player'])
+        return obs_json
+
+    @staticmethod
+    def _decode_screenshot(obs_json: dict) -> None:
+        # decode the base64 screenshot of a JSON observation into an RGBA/gray map (or JPEG bytes)
+        screen_shot_raw = obs_json['ScreenShot']
+        if screen_shot_raw is None:
+            return
+        screen_shot_raw = base64.b64decode(screen_shot_raw)
+        meta_data = obs_json['MetaData']
+        width, height = meta_data.get('ScreenShotSize') or meta_data['ViewportSize']
+        frame_format = meta_data.get('ScreenShotFormat', actions.FRAME_FORMAT_RGBA)
+        obs_json['ScreenShot'] = actions.decode_screenshot(screen_shot_raw, width, height, frame_format)
 
-    def _get_obs(self, is_rl = False) -> dict:
+    def _get_obs(self, is_rl = False, obs_raw = None) -> dict:
+        '''
+        obs_raw: an observation already fetched with `_observe_message` (e.g. at the end of a batch),
+        otherwise the game is observed here.
+        '''
         # update state
         before = time.time()
-        obs_json = self.action_proxy.observe()
+        if self.binary_observation:
+            # fields arrive as CBOR and the screenshot is a view over the shared frame segment
+            obs_json = obs_raw if obs_raw is not None else self.action_proxy.observe_binary(self.observe_size)
+        elif self.delta_observation:
+            if obs_raw is None:
+                obs_raw = self.action_proxy.observe_delta(self._delta_base_version(), self.observe_size)
+            obs_json = self._patch_obs(obs_raw)
+            self.action_proxy.attach_frame(obs_json)
+        else:
+            obs_json = obs_raw if obs_raw is not None else self.action_proxy.observe()
+            obs_json = json.loads(obs_json)
+            self._decode_screenshot(obs_json)
         after = time.time()
-        obs_json = json.loads(obs_json)
-        # decode RGBA map of screenshot
-        screen_shot_raw = obs_json['ScreenShot']
-        screen_shot_raw = base64.b64decode(screen_shot_raw)
-        viewport_x, viewport_y = obs_json['MetaData']['ViewportSize'][0], obs_json['MetaData']['ViewportSize'][1]
-        screen_shot_np = np.frombuffer(screen_shot_raw, dtype=np.uint8)
-        obs_json['ScreenShot'] = screen_shot_np.reshape(viewport_y, viewport_x, 4)
 
         # format player position
         obs_json['Player']['Position'] = [obs_json['Player']['Position']['X'], obs_json['Player']['Position']['Y']]
 
-        # fill the format of observation
-        observation.fill_observation_space(obs_json, self.observation_space)
-
-        # preprocess the observation json
+        # fill the format of observation and preprocess the observation json in one pass
         obs_json_processed = self.obs_preprocess(obs_json, 3, 3)
 
         if is_rl:
@@ -267,114 +340,29 @@ class StarDojo(gym.Env):
         - obs_x, y is the view range at x, y dirction (x - obs_size_x to x + obs_size_x), recommand 3 - 4
         
         '''
-        if self.image_save_path != None:
+        screen_shot = obs['ScreenShot']
+        # frames read through shared memory are only valid until the next observation
+        copy_frame = self.binary_observation or self.delta_observation
+        if self.image_save_path != None and screen_shot is not None:
             os.makedirs(self.image_save_path, exist_ok=True)
 
             img_name = f"screenshot_{self.port}_{self.step_count}.jpeg"
             img_path = f"{self.image_save_path}/{img_name}"
-            rgb_image = obs['ScreenShot'][:, :, :3].astype(np.uint8) # RGB, NOT A
-            img = Image.fromarray(rgb_image)
             # img = img.resize((640, 320)) #debug only
             # 如果deque已满，获取并删除即将被移除的图片文件
-                
-            if not img_path in self.image_paths and len(self.image_paths) == self.image_paths.maxlen:
-                old_img_path = self.image_paths[0]  # 获取最旧的图片路径
-                if os.path.exists(old_img_path):
-                    os.remove(old_img_path)  # 删除文件
             if not img_path in self.image_paths:
+                old_img_path = None
+                if len(self.image_paths) == self.image_paths.maxlen:
+                    old_img_path = self.image_paths[0]  # 获取最旧的图片路径
                 self.image_paths.append(img_path)
-                img.save(img_path, 'JPEG')
+                # encoded and written in the background, old file removed once the new one is on disk
+                self.frame_writer.save_image(screen_shot, img_path, remove_path=old_img_path, copy=copy_frame)
         else:
             img_path = "" # No img_save_path
-        if self.output_video:
-            rgb_image = obs['ScreenShot'][:, :, :3].astype(np.uint8)
-            if self.video_writer is None:
-                h, w, _ = rgb_image.shape  
-                frame_size = (w, h)
-                fourcc = cv2.VideoWriter.fourcc('M', 'P', '4', 'V')  
-                self.video_writer = cv2.VideoWriter(self.output_video_path, fourcc, self.frame_rate, frame_size)
-
-                
-            rgb_image = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2BGR)
-            self.video_writer.write(rgb_image)
-
-        surroundings = obs["SurroundingsData"]
-        info_list = []
-        for info in surroundings:
-            if info.get("crop_at_tile") is not None and info["crop_at_tile"] != "" and info["crop_at_tile"].get("seed_id") in _object_id_map:
-                info["crop_at_tile"]["seed_name"] = _object_id_map[info["crop_at_tile"]["seed_id"]]["Name"]
-                del info["crop_at_tile"]["seed_id"]
-
-            if info.get("debris_at_tile") is not None and info["debris_at_tile"] != "" and info["debris_at_tile"].strip('(O)') in _object_id_map:
-                info["debris_at_tile"] = _object_id_map[info["debris_at_tile"].strip('(O)')]["Name"]
-
-            new_info = {}
-            for key in list(info.keys()):
-                if info[key] != '' and info[key] != []:  
-                    new_info[key] = info[key]
-            info = new_info
-            info_list.append(info)
-
-        crops = obs["Crops"]
-        for i, crop in enumerate(crops):
-            crop_id = crop.get("id")
-            if crop_id in _object_id_map:
-                crop["id"] = _object_id_map[crop_id]["Name"]
-
-        original_exits = obs["Exits"]
-        exits = []
-        # for exit in original_exits:
-        #     exit_x = exit["position"]["X"]
-        #     exit_y = exit["position"]["Y"]
-        #     if exit_x >= 0 and exit_y >= 0:
-        #         exits.append(exit)
-
-
-        return_dict = obs
-        return_dict.update({
-            'basic_knowledge': [
-                "1. Hoe is used to till the soil, Watering Can is used to water the soil, Pickaxe is used to break rocks, Axe is used to chop trees, Scythe is used to harvest crops.",
-                "2. When you want to go through a door, move in front of it by 1 tile, and interact towards it.",
-                "3. Please go to bed at night (after 18:00) even if your task is not yet complete!",
-                "4. Call interact(direction) with a box, a shipping bin or anything else. Call use(direction) to use an item or tool in your inventory.",
-                #"5. You have to wait multiple days for harvest before you plant crops."
-            ],
-            "health": str(obs["Player"]["Health"]),
-            "energy": str(obs["Player"]["Stamina"]),
-            "money": str(obs["Player"]["Money"]),
-            "location": obs["Player"]["Location"],
-            "position": obs["Player"]["Position"],
-            "facing_direction": utils.get_direction_text(obs["Player"]["FacingDirection"]),
-            "inventory": obs["Player"]["Inventory"],
-            "chosen_item": obs["Player"]["CurrentInventory"],
-            "time": str(obs["GameState"]["Time"]),
-            "day": str(obs["GameState"]["DayOfMonth"]),
-            "season": obs["GameState"]["Season"],
-            "farm_animals": obs["Farm"]["Animals"],
-            "farm_pets": obs["Farm"]["Pets"],
-            "farm_buildings": obs["Farm"]["Buildings"],
-            "image_paths": self.image_paths,
-            "surroundings": info_list,
-            "crops": crops,
-            "exits": exits,
-            "buildings": obs["Buildings"],
-            "furniture": obs["Furnitures"],
-            "npcs": obs["NPCs"],
-            "shop_counters": obs["ShopCounters"],
-            "current_menu": obs["CurrentMenuData"],
-        })
-        
-        def lowercase_keys(d):
-            new = {}
-            for k, v in d.items():
-                new_key = k.lower() if isinstance(k, str) else k
-                if isinstance(v, dict):
-                    new[new_key] = lowercase_keys(v)
-                else:
-                    new[new_key] = v
-            return new
-
-        return lowercase_keys(return_dict)
+        if self.output_video and screen_shot is not None:
+            self.frame_writer.write_video_frame(screen_shot, copy=copy_frame)
+
+        return observation.preprocess_observation(obs, self.observation_spec, self.image_paths)
 
     def step(self, action: list[int]):
         if isinstance(self.action_space, gym.spaces.MultiDiscrete):
@@ -383,8 +371,11 @@ class StarDojo(gym.Env):
         else:
             raise ValueError("Invalid action space type")
 
-        records = actions.convert_discrete_into_commands(action, self.action_proxy, self.is_RL)
-        self.obs = self._get_obs()
+        # the commands and the following observation share one round-trip
+        messages, command_descriptions = actions.convert_discrete_into_messages(action, self.is_RL)
+        _, obs_raw = self.action_proxy.batch(messages, observe=self._observe_message())
+        records = " | ".join(command_descriptions)
+        self.obs = self._get_obs(obs_raw=obs_raw)
         # assert self.observation_space.contains(self.obs)
         info = {
             "records": records
@@ -1,17 +1,54 @@
+import json
 import socket
 import time
 
+from env.connection import MessageSession, TransferStats, recv_until_eof, STATUS_ERROR, SOCKET_RECV_BUFFER, BATCH_PREFIX
+
 
 class InitTaskProxy:
-    def __init__(self, port: int):
+    def __init__(self, port: int, persistent: bool = False):
         self.port = port
         self.timeout = 10
+        self.transfer_stats = TransferStats()
+        self.session = MessageSession(port, stats=self.transfer_stats) if persistent else None
+        # while set, messages are collected here instead of being sent, see record_messages
+        self.recorded_messages = None
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+    def _get_timeout(self, message: str) -> float:
+        if message.startswith(BATCH_PREFIX):
+            batch = json.loads(message[len(BATCH_PREFIX):])
+            return sum(self._get_timeout(m) for m in batch["commands"])
+        if message.startswith("load_game_record") or message.startswith("wait_day_started"):
+            return 60
+        return self.timeout
+
+    def _post_session_message(self, message: str) -> str:
+        try:
+            status, body = self.session.request(message, self._get_timeout(message))
+            if status == STATUS_ERROR:
+                print(f"Error from server: {str(body, 'utf-8')}")
+                return None
+            return str(body, 'utf-8')
+
+        except Exception as e:
+            print(f"Error: {e}")
 
     def _post_message(self, message: str, print_message: bool = False) -> str:
+        if self.recorded_messages is not None:
+            self.recorded_messages.append(message)
+            return None
+        if self.session is not None:
+            return self._post_session_message(message)
+
         try:
             host = '127.0.0.1'
             port = self.port
             client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RECV_BUFFER)
             client_socket.connect((host, port))
             # print("connected to server")
             # if print_message:
@@ -19,22 +56,12 @@ class InitTaskProxy:
 
        
             client_socket.sendall(message.encode('utf-8'))
+            sent_time = time.time()
 
-     
-            response = []
-            while True:
-                data = client_socket.recv(1024)
-                if not data:
-                    break
-                data_block = data.decode('utf-8')
-                response.append(data_block)
-                
-                full_response_tmp = ''.join(response)
-                if full_response_tmp.endswith("<EOF>"):
-                    # print("message sent")
-                    break
+            response, first_byte_time = recv_until_eof(client_socket)
+            self.transfer_stats.record(message, len(response), first_byte_time - sent_time, time.time() - first_byte_time)
 
-            full_response = ''.join(response)[:-5]
+            full_response = response[:-5].decode('utf-8')
             # if print_message:
             # print(f"response from server(sample)：{full_response[:200]}")
             return full_response
@@ -47,6 +74,37 @@ class InitTaskProxy:
             # if 'response' in locals():
             # print(f"connection closed，received： {len(response)} KB")
 
+    def record_messages(self, commands: list) -> list[str]:
+        '''
+        ### Usage
+        Translate init commands such as `add_item_by_name("Coal", 2)` into the messages the
+        proxy would send for them, without sending anything.
+        '''
+        self.recorded_messages = []
+        try:
+            for command in commands:
+                exec("self." + command, {}, {"self": self})
+            return self.recorded_messages
+        finally:
+            self.recorded_messages = None
+
+    def batch(self, messages: list) -> list:
+        '''
+        ### Usage
+        Execute the messages back-to-back in the mod in one round-trip and return one
+        result per message. Each message still waits until the player is ready in the mod,
+        so no sleeps are needed between them.
+        '''
+        response = self._post_message(BATCH_PREFIX + json.dumps({"commands": messages, "observe": None}))
+        if response is None:
+            print(f"batch of {len(messages)} init messages return value is None")
+            return [None] * len(messages)
+        return json.loads(response)["results"]
+
+    def wait_day_started(self, ticks: int = 10) -> None:
+        message = f"wait_day_started%{ticks}"
+        self._post_message(message)
+
     def _wait_for_server(self):
         start_time = time.time()
         host = '127.0.0.1'
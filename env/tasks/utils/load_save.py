@@ -1,11 +1,17 @@
 import os
 import platform
 import shutil
-import time
 
 from .init_task import InitTaskProxy
 
 SAVE_SOURCE = "tasks/saves"
+# ticks to let the world settle after the loaded day has started
+LOAD_SETTLE_TICKS = 10
+
+# save_type -> (save name, {file name: content}), read from SAVE_SOURCE once per process
+_save_templates = {}
+# restored file path -> (size, mtime) right after it was last written from a template
+_restored_files = {}
 
 
 def get_save_path() -> str:
@@ -53,16 +59,60 @@ def copy_save_folder(save_type: str, overwrite: bool = True, port: int = 0):
         print(f"The copy operation fails.")
 
 
-def load_save(proxy: InitTaskProxy, save_type: str, init_commands: list):
-    copy_save_folder(save_type, port=proxy.port)
-    source_path = os.path.join(SAVE_SOURCE, save_type)
-    save_names = os.listdir(source_path)
-    save_name = save_names[0] + "_Port_" + str(proxy.port)
-    proxy.load_game_record(save_name)
-    time.sleep(1)
+def get_save_template(save_type: str) -> tuple[str, dict]:
+    if save_type not in _save_templates:
+        source_path = os.path.join(SAVE_SOURCE, save_type)
+        save_name = os.listdir(source_path)[0]
+        folder = os.path.join(source_path, save_name)
+        files = {}
+        for file_name in os.listdir(folder):
+            with open(os.path.join(folder, file_name), 'rb') as f:
+                files[file_name] = f.read()
+        _save_templates[save_type] = (save_name, files)
+    return _save_templates[save_type]
+
 
+def restore_save_folder(save_type: str, port: int = 0) -> str:
+    '''
+    Same result as `copy_save_folder`, but from the in-memory template: files the game has
+    not touched since the last restore are left alone, the rest are rewritten in place and
+    files the game added (e.g. the `_old` backups) are removed. Returns the save name.
+    '''
+    template_name, files = get_save_template(save_type)
+    save_name = template_name + "_Port_" + str(port)
+    dest_path = os.path.join(get_save_path(), save_name)
+    os.makedirs(dest_path, exist_ok=True)
+
+    targets = {}
+    for file_name, content in files.items():
+        targets[save_name if file_name == template_name else file_name] = content
+    for file_name in os.listdir(dest_path):
+        if file_name not in targets:
+            path = os.path.join(dest_path, file_name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+    for file_name, content in targets.items():
+        path = os.path.join(dest_path, file_name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            if _restored_files.get(path) == (stat.st_size, stat.st_mtime_ns):
+                continue
+        with open(path, 'wb') as f:
+            f.write(content)
+        stat = os.stat(path)
+        _restored_files[path] = (stat.st_size, stat.st_mtime_ns)
+    return save_name
+
+
+def load_save(proxy: InitTaskProxy, save_type: str, init_commands: list):
+    # one round-trip: load, wait for the day to start, then the init commands
+    save_name = restore_save_folder(save_type, port=proxy.port)
+    messages = [f"load_game_record%{save_name}", f"wait_day_started%{LOAD_SETTLE_TICKS}"]
     if init_commands is not None:
-        for command in init_commands:
-            exec("proxy." + command)
-            time.sleep(1)
-    time.sleep(1)
+        messages += proxy.record_messages(init_commands)
+    results = proxy.batch(messages)
+    if results[1] is not True:
+        print(f"The save: {save_name}, did not start a day after loading.")
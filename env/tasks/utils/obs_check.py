@@ -1,147 +1,129 @@
-# Helper function to count
-def count(check_list: list, data_list: list, type: str) -> int:
-    number = 0
+def _count_where(predicate):
+    # number of elements matching predicate(check_list, data)
+    return lambda check_list, data_list: sum(1 for data in data_list if predicate(check_list, data))
+
+
+def _first_where(predicate, value):
+    # value(data) of the first element matching predicate(check_list, data), 0 if there is none
+    def counter(check_list, data_list):
+        for data in data_list:
+            if predicate(check_list, data):
+                return value(data)
+        return 0
+
+    return counter
+
+
+def _count_object_at_inventory(check_list: list, data_list: list) -> int:
+    return sum(data['Quantity'] for data in data_list if data['Name'] in check_list)
+
+
+def _count_animal_friendship(check_list: list, data_list: list) -> int:
+    # without a check list: animals with enough friendship, otherwise the friendship of the first listed one
+    if not check_list:
+        return sum(1 for data in data_list if data['Friendship'] >= 100)
     for data in data_list:
-        if type == "seeds_at_tile":
-            if (data['id'] in check_list) and (data['current_phase'] == 0):
-                number += 1
-        elif type == "watered_crop":
-            if (check_list == [] or data['id'] in check_list) and (data['isWatered']):
-                number += 1
-        elif type == "object_at_inventory":
-            if data['Name'] in check_list:
-                number += data['Quantity']
-        elif type == "opening_building":
-            if (data['type'] in check_list) and (data['isAnimalDoorOpen']):
-                number += 1
-        elif type == "closing_building":
-            if (data['type'] in check_list) and (not data['isAnimalDoorOpen']):
-                number += 1
-        elif type == "touched_animal":
-            if (check_list == [] or data['Type'] in check_list) and (data['isTouched']):
-                number += 1
-        elif type == "full_bowl":
-            if (data['type'] in check_list) and (data['isBowlFull']):
-                number += 1
-        elif type == "animal":
-            if data['Type'] in check_list:
-                number += 1
-        elif type == "animal_friendship":
-            if not check_list and data['Friendship'] >= 100:
-                number += 1
-            elif data['Type'] in check_list:
-                number = data['Friendship']
-                break
-        elif type == "mood":
-            if data['Happiness'] >= 255:
-                number += 1
-        elif type == "profession":
-            if check_list[0] in data:
-                number += 1
-        elif type == "full_bench":
-            if (data['type'] in check_list) and (data['hayNumber'] == 12):
-                number += 1
-        elif type == "building":
-            if data['type'] in check_list:
-                number += 1
-        elif type == "silo":
-            if data['type'] == "Silo":
-                number = data['hayNumber']
-                break
-        elif type == "bundle":
-            if data['name'] in check_list:
-                if data['completed']:
-                    number += 1
-                break
-        elif type == "museum":
-            if data['itemName'] in check_list:
-                number += 1
-                break
-        elif type == "repair":
-            if data['project'] in check_list:
-                if data['completed']:
-                    number += 1
-                break
-        elif type == "repair_all":
-            if not data['completed']:
-                number = 0
-                break
-            number += 1
-            if number == 5:
-                number = 1
-        elif type == "farmhouse":
-            if data['type'] == "Farmhouse":
-                number = data["upgradeLevel"]
-                break
-        elif type == "talk":
-            if data['Name'] in check_list:
-                if data['isTalked']:
-                    number += 1
-                break
-        elif type == "gift":
-            if data['Name'] in check_list:
-                if data['GiftsToday']:
-                    number += 1
-                break
-        elif type == "date":
-            if data in check_list:
-                number += 1
-                break
-        elif type == "propose":
-            if data in check_list:
-                number += 1
-                break
-        elif type == "npc_friendship":
-            if data['Name'] in check_list:
-                number = data['Friendship']
-                break
-        elif type == "help_quest":
-            if data['id'] is None:
-                number += 1
-        elif type == "completed_quest":
-            if data['completed']:
-                number += 1
-        elif type == "story_quest":
-            if data['id'] in check_list:
-                if not data['completed']:
-                    number = 1
-                break
+        if data['Type'] in check_list:
+            return data['Friendship']
+    return 0
 
-    # print(number)
+
+def _count_repair_all(check_list: list, data_list: list) -> int:
+    number = 0
+    for data in data_list:
+        if not data['completed']:
+            return 0
+        number += 1
+        if number == 5:
+            number = 1
     return number
 
 
+# Counter of each count() type, called with the check list and the data list
+COUNTERS = {
+    "seeds_at_tile": _count_where(lambda check_list, data: (data['id'] in check_list) and (data['current_phase'] == 0)),
+    "watered_crop": _count_where(lambda check_list, data: (check_list == [] or data['id'] in check_list) and (data['isWatered'])),
+    "object_at_inventory": _count_object_at_inventory,
+    "opening_building": _count_where(lambda check_list, data: (data['type'] in check_list) and (data['isAnimalDoorOpen'])),
+    "closing_building": _count_where(lambda check_list, data: (data['type'] in check_list) and (not data['isAnimalDoorOpen'])),
+    "touched_animal": _count_where(lambda check_list, data: (check_list == [] or data['Type'] in check_list) and (data['isTouched'])),
+    "full_bowl": _count_where(lambda check_list, data: (data['type'] in check_list) and (data['isBowlFull'])),
+    "animal": _count_where(lambda check_list, data: data['Type'] in check_list),
+    "animal_friendship": _count_animal_friendship,
+    "mood": _count_where(lambda check_list, data: data['Happiness'] >= 255),
+    "profession": _count_where(lambda check_list, data: check_list[0] in data),
+    "full_bench": _count_where(lambda check_list, data: (data['type'] in check_list) and (data['hayNumber'] == 12)),
+    "building": _count_where(lambda check_list, data: data['type'] in check_list),
+    "silo": _first_where(lambda check_list, data: data['type'] == "Silo", lambda data: data['hayNumber']),
+    "bundle": _first_where(lambda check_list, data: data['name'] in check_list, lambda data: 1 if data['completed'] else 0),
+    "museum": _first_where(lambda check_list, data: data['itemName'] in check_list, lambda data: 1),
+    "repair": _first_where(lambda check_list, data: data['project'] in check_list, lambda data: 1 if data['completed'] else 0),
+    "repair_all": _count_repair_all,
+    "farmhouse": _first_where(lambda check_list, data: data['type'] == "Farmhouse", lambda data: data["upgradeLevel"]),
+    "talk": _first_where(lambda check_list, data: data['Name'] in check_list, lambda data: 1 if data['isTalked'] else 0),
+    "gift": _first_where(lambda check_list, data: data['Name'] in check_list, lambda data: 1 if data['GiftsToday'] else 0),
+    "date": _first_where(lambda check_list, data: data in check_list, lambda data: 1),
+    "propose": _first_where(lambda check_list, data: data in check_list, lambda data: 1),
+    "npc_friendship": _first_where(lambda check_list, data: data['Name'] in check_list, lambda data: data['Friendship']),
+    "help_quest": _count_where(lambda check_list, data: data['id'] is None),
+    "completed_quest": _count_where(lambda check_list, data: data['completed']),
+    "story_quest": _first_where(lambda check_list, data: data['id'] in check_list, lambda data: 0 if data['completed'] else 1),
+}
+
+
+# Helper function to count
+def count(check_list: list, data_list: list, type: str) -> int:
+    counter = COUNTERS.get(type)
+    if counter is None:
+        return 0
+    return counter(check_list, data_list)
+
+
+def _key(value):
+    # hashable form of a position or id as sent in the observation, equal values give equal keys
+    if isinstance(value, (list, tuple)):
+        return tuple(_key(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _key(item)) for key, item in value.items()))
+    return value
+
+
+def _index_by(items: list, field: str) -> dict:
+    # items grouped by the key of their field, built once per observation
+    index = {}
+    for item in items:
+        index.setdefault(_key(item.get(field)), []).append(item)
+    return index
+
+
 def surrounding_check(check_list: list, surrounding: list, last_surrounding: list, is_remove: bool, type: str) -> int:
-    number = 0
+    # tiles whose type value entered (or with is_remove, left) check_list at the same position
     if is_remove:
-        for last_tile in last_surrounding:
-            if type in last_tile and last_tile[type] in check_list:
-                position = last_tile["position"]
-                for tile in surrounding:
-                    if tile.get("position") == position and tile.get(type) not in check_list:
-                        number += 1
-                        break
+        before, after = last_surrounding, surrounding
     else:
-        for tile in surrounding:
-            if type in tile and tile[type] in check_list:
-                position = tile["position"]
-                for last_tile in last_surrounding:
-                    if last_tile.get("position") == position and last_tile.get(type) not in check_list:
-                        number += 1
-                        break
+        before, after = surrounding, last_surrounding
+
+    after_by_position = _index_by(after, "position")
+    number = 0
+    for tile in before:
+        if type in tile and tile[type] in check_list:
+            for other_tile in after_by_position.get(_key(tile["position"]), []):
+                if other_tile.get(type) not in check_list:
+                    number += 1
+                    break
 
     # print(number)
     return number
 
 
 def building_moving_check(check_list: list, buildings: list, last_buildings: list, is_change: bool) -> int:
+    buildings_by_id = _index_by(buildings, "id")
     number = 0
     for last_building in last_buildings:
         if last_building["type"] in check_list:
-            building_id = last_building["id"]
             position = last_building["position"]
-            for building in buildings:
-                if building.get("id") == building_id and (building.get("position") != position) == is_change:
+            for building in buildings_by_id.get(_key(last_building["id"]), []):
+                if (building.get("position") != position) == is_change:
                     number += 1
                     break
 
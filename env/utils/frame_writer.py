@@ -0,0 +1,123 @@
+import io
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class FrameWriter:
+    '''
+    ### Usage
+    Persist screenshots and video frames on a background thread so that JPEG encoding,
+    disk writes and video encoding stay off the step path.
+
+    `save_image` and `write_video_frame` return immediately; the writer owns the frame
+    from then on, so callers must not modify it afterwards (pass `copy=True` for frames
+    that are views over shared memory). Jobs run in submission order. The queue is
+    bounded: when the disk falls behind, submitting blocks instead of buffering frames
+    without limit. `flush` waits for everything submitted so far, `close` also finalizes
+    the video.
+
+    `on_image(path, jpeg_bytes)`, when set, receives every screenshot once its file is
+    written, e.g. to hand it to the prompt image cache without reading the file back.
+    '''
+
+    def __init__(self, video_path: str = None, frame_rate: int = 30, max_pending: int = 8, on_image=None):
+        self.video_path = video_path
+        self.frame_rate = frame_rate
+        self.on_image = on_image
+        self.video_writer = None
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+                self.thread.start()
+
+    def _submit(self, job):
+        self._ensure_started()
+        self.jobs.put(job)
+
+    def save_image(self, frame, path: str, remove_path: str = None, copy: bool = False) -> str:
+        '''
+        Write `frame` (RGBA/gray array or JPEG bytes) to `path` as JPEG and delete `remove_path`
+        once it is written. Returns `path` right away.
+        '''
+        if copy and isinstance(frame, np.ndarray):
+            frame = frame.copy()
+        self._submit(("image", frame, path, remove_path))
+        return path
+
+    def write_video_frame(self, frame, copy: bool = False) -> None:
+        if self.video_path is None:
+            raise ValueError("FrameWriter was created without a video path")
+        if copy and isinstance(frame, np.ndarray):
+            frame = frame.copy()
+        self._submit(("video", frame))
+
+    def flush(self) -> None:
+        if self.thread is not None:
+            self.jobs.join()
+
+    def close(self) -> None:
+        if self.thread is not None:
+            self._submit(("close",))
+            self.jobs.join()
+            self.jobs.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            try:
+                if job[0] == "image":
+                    self._write_image(*job[1:])
+                elif job[0] == "video":
+                    self._write_video_frame(job[1])
+                elif self.video_writer is not None:
+                    self.video_writer.release()
+                    self.video_writer = None
+            except Exception as e:
+                print(f"FrameWriter failed on {job[0]} job: {e}")
+            finally:
+                self.jobs.task_done()
+
+    def _write_image(self, frame, path, remove_path):
+        if isinstance(frame, bytes):
+            # already JPEG encoded by the mod
+            jpeg = frame
+        else:
+            img = Image.fromarray(frame if frame.ndim == 2 else frame[:, :, :3]) # RGB, NOT A
+            buffer = io.BytesIO()
+            img.save(buffer, 'JPEG')
+            jpeg = buffer.getvalue()
+        with open(path, 'wb') as f:
+            f.write(jpeg)
+        # after the write, so the cache can tie the image to the identity of the file
+        if self.on_image is not None:
+            self.on_image(path, jpeg)
+        if remove_path is not None and os.path.exists(remove_path):
+            os.remove(remove_path)
+
+    def _write_video_frame(self, frame):
+        if isinstance(frame, bytes):
+            bgr_image = cv2.imdecode(np.frombuffer(frame, dtype=np.uint8), cv2.IMREAD_COLOR)
+        elif frame.ndim == 2:
+            bgr_image = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        else:
+            bgr_image = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+        if self.video_writer is None:
+            h, w, _ = bgr_image.shape
+            fourcc = cv2.VideoWriter.fourcc('M', 'P', '4', 'V')
+            self.video_writer = cv2.VideoWriter(self.video_path, fourcc, self.frame_rate, (w, h))
+        self.video_writer.write(bgr_image)
@@ -0,0 +1,49 @@
+import threading
+from collections import deque
+
+
+class GamePool:
+    '''
+    ### Usage
+    Keep spare game instances running on their own ports so that a reset which needs a
+    fresh game takes an already launched one instead of waiting for a cold start.
+
+    `swap(port)` hands out the oldest spare (waiting for it only if it is still starting)
+    and recycles the returned port in the background: its game is killed and relaunched,
+    after which it is the newest spare. A pool of N spares therefore hides up to N
+    consecutive game launches. Once `close()` has stopped the spares, `swap` relaunches
+    the game on the given port in the foreground, like a reset without a pool.
+
+    ### Paramaters
+    ports: Ports of the spare instances, not shared with any other environment.
+    launch: Callable taking a port that replaces the game on it with a fresh one and
+        returns once the server accepts connections (see `stardew_env.launch_game`).
+    kill: Callable taking a list of ports that stops the games on them.
+    '''
+
+    def __init__(self, ports: list, launch, kill):
+        self.launch = launch
+        self.kill = kill
+        self.spares = deque()
+        for port in ports:
+            self.spares.append((port, self._start(port)))
+
+    def _start(self, port: int) -> threading.Thread:
+        thread = threading.Thread(target=self.launch, args=(port,), name=f"game-launch-{port}", daemon=True)
+        thread.start()
+        return thread
+
+    def swap(self, port: int) -> int:
+        if not self.spares:
+            self.launch(port)
+            return port
+        spare_port, thread = self.spares.popleft()
+        thread.join()
+        self.spares.append((port, self._start(port)))
+        return spare_port
+
+    def close(self) -> None:
+        for _, thread in self.spares:
+            thread.join()
+        self.kill([port for port, _ in self.spares])
+        self.spares.clear()